@@ -1,6 +1,7 @@
 
 # backtest.py
 
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 import numpy as np
@@ -12,14 +13,24 @@ from quant_config import (
     BACKTEST_TOP_N,
     INITIAL_CAPITAL,
     MIN_TRADING_VALUE,
+    BACKTEST_WORKERS,
+    MOMENTUM_SOURCE,
+    MOMENTUM_LOOKBACKS,
+    UNIVERSE_INDEX_ENABLED,
 )
 from data_loader import (
     to_yyyymmdd,
     get_trading_date_on_or_before,
     get_recent_trading_date,
     get_ohlcv,
+    install_rate_limiter,
+    make_shared_rate_state,
 )
 from factor_model import build_factor_table
+from price_panel import PricePanel, load_price_panel
+from trading_calendar import get_calendar
+from universe_index import get_universe_index
+import momentum
 
 
 def _next_year_month(year: int, month: int):
@@ -62,33 +73,130 @@ def build_rebalance_dates(start_date: str, end_date: str | None) -> list[str]:
     return dates
 
 
-def calc_portfolio_return(symbols: list[str], start: str, end: str) -> tuple[float, int]:
-    rets = []
-    used = 0
-    for ticker in symbols:
-        try:
-            df = get_ohlcv(ticker, start, end)
-        except Exception:
-            continue
-        if df is None or df.empty or len(df) < 2:
-            continue
-        entry = float(df["종가"].iloc[0])
-        exit_ = float(df["종가"].iloc[-1])
-        if entry <= 0 or exit_ <= 0:
-            continue
-        r = exit_ / entry - 1.0
-        rets.append(r)
-        used += 1
+def _ticker_period_return(ticker: str, start: str, end: str) -> float | None:
+    """종목별 일봉(수정주가)으로 구간 수익률 계산. 데이터가 부족하거나 가격이 0 이하이면 None."""
+    try:
+        df = get_ohlcv(ticker, start, end)
+    except Exception:
+        return None
+    if df is None or df.empty or len(df) < 2:
+        return None
+    entry = float(df["종가"].iloc[0])
+    exit_ = float(df["종가"].iloc[-1])
+    if entry <= 0 or exit_ <= 0:
+        return None
+    return exit_ / entry - 1.0
+
+
+def period_returns(symbols: list[str], start: str, end: str,
+                   panel: PricePanel | None = None) -> np.ndarray:
+    """종목별 구간 수익률 배열 (계산할 수 없는 종목은 NaN).
+    - panel 이 있으면 배열 인덱싱으로 한 번에 계산하고,
+      상장주식수가 바뀐(분할/증자 등) 종목만 종목별 수정주가 조회로 보정한다.
+    - panel 이 없으면 종목별로 일봉을 조회한다.
+    """
+    if panel is None:
+        rets = [_ticker_period_return(t, start, end) for t in symbols]
+        return np.array([np.nan if r is None else r for r in rets], dtype=float)
+
+    arr, needs_fallback = panel.period_returns(symbols, start, end)
+    for i in np.flatnonzero(needs_fallback):
+        r = _ticker_period_return(symbols[i], start, end)
+        arr[i] = np.nan if r is None else r
+    return arr
+
+
+def calc_portfolio_return(symbols: list[str], start: str, end: str,
+                          panel: PricePanel | None = None) -> tuple[float, int]:
+    """선택 종목 동일비중 구간 수익률 (수익률을 계산할 수 없는 종목은 제외)."""
+    arr = period_returns(symbols, start, end, panel)
+    rets = arr[~np.isnan(arr)]
+
+    used = len(rets)
     if used == 0:
         return 0.0, 0
     return float(np.mean(rets)), used
 
 
-def run_backtest():
+# select_from_factors 가 읽는 팩터 테이블 컬럼 (build_factor_table 이 이것만 계산 -> 종목명 조회 생략)
+SELECT_COLUMNS = ["거래대금", "total_score"]
+
+
+def select_portfolio(reb_date: str) -> list[str] | None:
+    """리밸런싱 날짜의 편입 종목: 유동성 필터 통과 종목 중 total_score 상위 BACKTEST_TOP_N.
+    통과 종목이 없으면 None.
+    """
+    return select_from_factors(build_factor_table(reb_date, columns=SELECT_COLUMNS))
+
+
+def select_from_factors(factors: pd.DataFrame) -> list[str] | None:
+    """이미 만든 팩터 테이블에서 select_portfolio 와 같은 규칙으로 종목을 고른다."""
+    liquid = factors[factors["거래대금"] >= MIN_TRADING_VALUE]
+    if liquid.empty:
+        return None
+    ranked = liquid.sort_values("total_score", ascending=False)
+    selected = ranked.head(BACKTEST_TOP_N)
+    return list(selected.index)
+
+
+def _panel_range(rebalance_dates: list[str]) -> tuple[str, str]:
+    """백테스트 가격 패널 구간: 첫 리밸런싱일의 최장 모멘텀 기간 전 ~ 마지막 리밸런싱일."""
+    start, end = rebalance_dates[0], rebalance_dates[-1]
+    if MOMENTUM_SOURCE == "panel":
+        longest = max(n for n, _ in MOMENTUM_LOOKBACKS.values())
+        start = get_calendar().offset(start, -longest) or start
+    return start, end
+
+
+def load_backtest_panel(rebalance_dates: list[str]) -> tuple[PricePanel, tuple[str, str]]:
+    """가격 패널을 만들고 모멘텀 계산에도 쓰도록 등록한다. (구간 수익률과 모멘텀이 같은 패널 사용)
+    리밸런싱 날짜 유니버스도 인덱스에 미리 넣어 두어 날짜별 팩터 계산(병렬 워커 포함)이 다시 정렬하지 않게 한다.
+    """
+    if UNIVERSE_INDEX_ENABLED:
+        get_universe_index().ensure(rebalance_dates)
+    panel_range = _panel_range(rebalance_dates)
+    panel = load_price_panel(*panel_range)
+    momentum.use_panel(panel, *panel_range)
+    return panel, panel_range
+
+
+def _init_worker(shared_rate_state, panel_range=None):
+    # 모든 워커가 하나의 KRX 호출 한도를 나눠 쓰도록 공유 토큰 버킷을 설치한다.
+    install_rate_limiter(shared_rate_state)
+    # 모멘텀 계산용 패널은 워커마다 한 번만 만든다. (메인 프로세스가 받아둔 스냅샷 캐시를 읽음)
+    if panel_range is not None and MOMENTUM_SOURCE == "panel":
+        momentum.use_panel(load_price_panel(*panel_range), *panel_range)
+
+
+def select_portfolios_parallel(reb_dates: list[str], workers: int,
+                               panel_range: tuple[str, str] | None = None) -> list[list[str] | None]:
+    """리밸런싱 날짜별 종목 선택을 프로세스 풀에서 실행한다. 결과 순서는 reb_dates 순서와 같다."""
+    shared_rate_state = make_shared_rate_state()
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(shared_rate_state, panel_range)) as pool:
+        return list(pool.map(select_portfolio, reb_dates))
+
+
+def run_backtest(workers: int | None = None):
+    """월간 리밸런싱 백테스트.
+    workers > 1 이면 리밸런싱 시점별 종목 선택(팩터 테이블 생성)을 프로세스 풀에서 병렬로 돌리고,
+    구간 수익률 계산과 자산 복리 누적은 날짜 순서대로 진행한다. (순차 실행과 결과 동일)
+    """
+    if workers is None:
+        workers = BACKTEST_WORKERS
+
     rebalance_dates = build_rebalance_dates(BACKTEST_START_DATE, BACKTEST_END_DATE)
     print("[INFO] 리밸런싱 날짜 목록:")
     print(rebalance_dates)
 
+    panel, panel_range = load_backtest_panel(rebalance_dates)
+
+    selections = None
+    if workers > 1:
+        print(f"[INFO] 병렬 모드: 워커 {workers}개로 리밸런싱 시점별 종목 선택")
+        selections = select_portfolios_parallel(rebalance_dates[:-1], workers, panel_range)
+
     equity = INITIAL_CAPITAL
     records: list[dict] = []
 
@@ -98,18 +206,14 @@ def run_backtest():
 
         print(f"\n[INFO] 리밸런싱 {i+1}/{len(rebalance_dates)-1}: {reb_date} -> {next_date}")
 
-        factors = build_factor_table(reb_date)
-        liquid = factors[factors["거래대금"] >= MIN_TRADING_VALUE]
+        symbols = selections[i] if selections is not None else select_portfolio(reb_date)
 
-        if liquid.empty:
+        if symbols is None:
             print("[WARN] 유동성 필터 통과 종목 없음. 수익률 0으로 처리.")
             period_ret = 0.0
             num_used = 0
         else:
-            ranked = liquid.sort_values("total_score", ascending=False)
-            selected = ranked.head(BACKTEST_TOP_N)
-            symbols = list(selected.index)
-            period_ret, num_used = calc_portfolio_return(symbols, reb_date, next_date)
+            period_ret, num_used = calc_portfolio_return(symbols, reb_date, next_date, panel)
 
         equity *= (1.0 + period_ret)
 
@@ -0,0 +1,5 @@
+# 벤치마크에서는 .env 를 읽지 않는다. (가짜 Supabase 는 URL/KEY 를 쓰지 않음)
+
+
+def load_dotenv(*args, **kwargs):
+    return False
@@ -0,0 +1 @@
+# 벤치마크용 오프라인 pykrx 대체 모듈 (benchmarks/fakes 를 sys.path 앞에 두면 진짜 pykrx 대신 로드된다)
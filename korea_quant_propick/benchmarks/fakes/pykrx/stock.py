@@ -0,0 +1,237 @@
+# benchmarks/fakes/pykrx/stock.py
+# 오프라인 pykrx.stock 대체 모듈 (벤치마크 전용)
+# - 합성 시장: 종목 수 / 기간 / 시드를 환경변수로 정하고, 같은 설정이면 항상 같은 데이터를 만든다.
+#     KQP_BENCH_TICKERS (기본 1000, 코스피/코스닥 절반씩), KQP_BENCH_START / KQP_BENCH_END,
+#     KQP_BENCH_SEED, KQP_BENCH_LATENCY (호출당 지연 초, 네트워크 흉내)
+# - 녹화 재생: KQP_BENCH_RECORDED 에 data_loader 캐시 폴더(.krx_cache)를 지정하면
+#   같은 키의 Parquet 파일이 있는 호출은 그 응답을 그대로 돌려주고, 없으면 합성 데이터로 대신한다.
+# - CALLS 에 함수별 호출 횟수를 센다.
+
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+N_TICKERS = int(os.environ.get("KQP_BENCH_TICKERS", "1000"))
+START = os.environ.get("KQP_BENCH_START", "20220103")
+END = os.environ.get("KQP_BENCH_END", "20241231")
+SEED = int(os.environ.get("KQP_BENCH_SEED", "0"))
+LATENCY = float(os.environ.get("KQP_BENCH_LATENCY", "0"))
+RECORDED = os.environ.get("KQP_BENCH_RECORDED")
+
+CALLS: dict[str, int] = {}
+
+
+def _count(name: str):
+    CALLS[name] = CALLS.get(name, 0) + 1
+    if LATENCY:
+        time.sleep(LATENCY)
+
+
+def _recorded(endpoint: str, start: str, end: str, market: str = "", ticker: str = "") -> pd.DataFrame | None:
+    # data_loader._cache_path 와 같은 파일 이름 규칙
+    if not RECORDED:
+        return None
+    path = Path(RECORDED) / endpoint / f"{start}_{end}_{market or '-'}_{ticker or '-'}.parquet"
+    return pd.read_parquet(path) if path.exists() else None
+
+
+class _Market:
+    """합성 시장 데이터. 가격은 float32 배열 (거래일 수 × 종목 수)로 한 번만 만든다."""
+
+    def __init__(self):
+        rng = np.random.default_rng(SEED)
+        days = pd.bdate_range(pd.Timestamp(START), pd.Timestamp(END))
+        days = days[~((days.month == 1) & (days.day == 1))]
+        self.sessions = days
+        self.session_str = np.array(days.strftime("%Y%m%d"))
+        T, M = len(days), N_TICKERS
+
+        half = (M + 1) // 2
+        self.tickers = np.array([f"{i:06d}" for i in range(100000, 100000 + half)]
+                                + [f"{i:06d}" for i in range(200000, 200000 + M - half)])
+        self.market_of = np.where(np.arange(M) < half, "KOSPI", "KOSDAQ")
+        self.names = np.array([f"종목{t}" for t in self.tickers])
+        self.sectors = np.array([f"업종{i % 20}" for i in range(M)])
+
+        rets = rng.normal(0.0003, 0.02, size=(T, M)).astype(np.float32)
+        base = rng.uniform(1_000, 150_000, M).astype(np.float32)
+        self.close = np.round(np.exp(np.cumsum(rets, axis=0)) * base).astype(np.float32)
+        self.base_shares = rng.integers(1_000_000, 500_000_000, M).astype(np.float64)
+        self.volume = rng.integers(10_000, 5_000_000, size=(T, M)).astype(np.float32)
+
+        # 500종목마다 하나씩 중간에 2:1 분할, 300종목마다 하나씩 기간 1/3 지점에 신규 상장
+        self.split_row = np.full(M, T, dtype=int)
+        self.split_row[::500] = T // 2
+        for k in np.flatnonzero(self.split_row < T):
+            self.close[T // 2:, k] = np.round(self.close[T // 2:, k] / 2)
+        self.listed_row = np.zeros(M, dtype=int)
+        self.listed_row[7::300] = T // 3
+
+        self.eps = rng.normal(2_000, 3_000, M)
+        self.bps = np.abs(rng.normal(30_000, 10_000, M)) + 1
+        self.dps = np.maximum(rng.normal(500, 700, M), 0)
+
+    def shares(self, row: int, cols: np.ndarray) -> np.ndarray:
+        return self.base_shares[cols] * np.where(row >= self.split_row[cols], 2, 1)
+
+    def row(self, date) -> int | None:
+        i = int(np.searchsorted(self.session_str, str(date)))
+        if i < len(self.session_str) and self.session_str[i] == str(date):
+            return i
+        return None
+
+    def row_on_or_after(self, date) -> int:
+        return int(np.searchsorted(self.session_str, str(date), side="left"))
+
+    def row_on_or_before(self, date) -> int:
+        return int(np.searchsorted(self.session_str, str(date), side="right")) - 1
+
+    def columns(self, market: str, row: int | None = None) -> np.ndarray:
+        cols = np.arange(N_TICKERS) if market == "ALL" else np.flatnonzero(self.market_of == market)
+        if row is not None:
+            cols = cols[self.listed_row[cols] <= row]
+        return cols
+
+
+_market: _Market | None = None
+
+
+def _m() -> _Market:
+    global _market
+    if _market is None:
+        _market = _Market()
+    return _market
+
+
+def _frame(data: dict, index, index_name: str = "티커") -> pd.DataFrame:
+    return pd.DataFrame(data, index=pd.Index(index, name=index_name))
+
+
+def get_market_cap(date, market="KOSPI"):
+    _count("get_market_cap")
+    rec = _recorded("market_cap", str(date), str(date), market=market)
+    if rec is not None:
+        return rec
+    m = _m()
+    i = m.row(date)
+    if i is None:
+        cols = m.columns(market)
+        return _frame({c: np.zeros(len(cols), dtype=np.int64)
+                       for c in ["종가", "시가총액", "거래량", "거래대금", "상장주식수"]}, m.tickers[cols])
+    cols = m.columns(market, i)
+    c = m.close[i, cols].astype(np.float64)
+    shares = m.shares(i, cols)
+    vol = m.volume[i, cols].astype(np.float64)
+    return _frame({
+        "종가": c.astype(np.int64),
+        "시가총액": (c * shares).astype(np.int64),
+        "거래량": vol.astype(np.int64),
+        "거래대금": (c * vol).astype(np.int64),
+        "상장주식수": shares.astype(np.int64),
+    }, m.tickers[cols])
+
+
+def get_market_fundamental(date, market="KOSPI"):
+    _count("get_market_fundamental")
+    rec = _recorded("market_fundamental", str(date), str(date), market=market)
+    if rec is not None:
+        return rec
+    m = _m()
+    i = m.row(date)
+    if i is None:
+        i = m.row_on_or_before(date)
+    i = max(i, 0)
+    cols = m.columns(market, i)
+    c = m.close[i, cols].astype(np.float64)
+    eps, bps, dps = m.eps[cols], m.bps[cols], m.dps[cols]
+    return _frame({
+        "BPS": bps.round(),
+        "PER": np.where(eps > 0, (c / np.where(eps == 0, 1, eps)).round(2), 0.0),
+        "PBR": (c / bps).round(2),
+        "EPS": eps.round(),
+        "DIV": (dps / c * 100).round(2),
+        "DPS": dps.round(),
+    }, m.tickers[cols])
+
+
+def get_market_price_change(fromdate, todate, market="KOSPI"):
+    _count("get_market_price_change")
+    rec = _recorded("market_price_change", str(fromdate), str(todate), market=market)
+    if rec is not None:
+        return rec
+    m = _m()
+    a, b = m.row_on_or_after(fromdate), m.row_on_or_before(todate)
+    cols = m.columns(market, a)
+    o = m.close[a, cols].astype(np.float64) * m.shares(a, cols) / m.shares(b, cols)
+    c = m.close[b, cols].astype(np.float64)
+    vol = m.volume[b, cols].astype(np.float64)
+    return _frame({
+        "종목명": m.names[cols],
+        "시가": o,
+        "종가": c,
+        "변동폭": c - o,
+        "등락률": ((c / o - 1) * 100).round(2),
+        "거래량": vol,
+        "거래대금": vol * c,
+    }, m.tickers[cols])
+
+
+def get_market_ohlcv_by_date(fromdate, todate, ticker, freq="d", adjusted=True, name_display=False):
+    _count("get_market_ohlcv_by_date")
+    rec = _recorded("ohlcv_by_date", str(fromdate), str(todate), ticker=ticker)
+    if rec is not None:
+        return rec
+    m = _m()
+    k = int(np.flatnonzero(m.tickers == ticker)[0])
+    a = max(m.row_on_or_after(fromdate), m.listed_row[k])
+    b = m.row_on_or_before(todate) + 1
+    c = m.close[a:b, k].astype(np.float64)
+    if adjusted and m.split_row[k] < len(m.sessions):
+        # 마지막 날 기준 수정주가: 분할 전 가격을 절반으로
+        c = np.where(np.arange(a, b) < m.split_row[k], c / 2, c)
+    return _frame({"시가": c, "고가": c, "저가": c, "종가": c, "거래량": m.volume[a:b, k]},
+                  m.sessions[a:b], index_name="날짜")
+
+
+def get_index_ohlcv_by_date(fromdate, todate, ticker, freq="d", name_display=True):
+    _count("get_index_ohlcv_by_date")
+    rec = _recorded("index_ohlcv_by_date", str(fromdate), str(todate), ticker=ticker)
+    if rec is not None:
+        return rec
+    m = _m()
+    a, b = m.row_on_or_after(fromdate), m.row_on_or_before(todate) + 1
+    c = m.close[a:b].mean(axis=1, dtype=np.float64)
+    v = m.volume[a:b].sum(axis=1, dtype=np.float64)
+    return _frame({"시가": c, "고가": c, "저가": c, "종가": c, "거래량": v, "거래대금": v * c},
+                  m.sessions[a:b], index_name="날짜")
+
+
+def get_market_ticker_name(ticker):
+    _count("get_market_ticker_name")
+    m = _m()
+    return m.names[np.flatnonzero(m.tickers == ticker)[0]]
+
+
+def get_market_sector_classifications(date, market):
+    _count("get_market_sector_classifications")
+    rec = _recorded("sector_classifications", str(date), str(date), market=market)
+    if rec is not None:
+        return rec
+    m = _m()
+    i = m.row(date)
+    if i is None:
+        return pd.DataFrame()
+    cols = m.columns(market, i)
+    c = m.close[i, cols].astype(np.float64)
+    return _frame({
+        "종목명": m.names[cols],
+        "업종명": m.sectors[cols],
+        "종가": c,
+        "대비": 0,
+        "등락률": 0.0,
+        "시가총액": c * m.shares(i, cols),
+    }, m.tickers[cols], index_name="종목코드")
@@ -0,0 +1,127 @@
+# benchmarks/fakes/supabase
+# 오프라인 Supabase 클라이언트 대체 모듈 (벤치마크 전용)
+# - upload_to_supabase 가 쓰는 만큼만 구현: table().select/eq/in_/limit/insert/upsert, rpc, storage.list/upload
+# - 데이터는 메모리(DB, STORAGE)에 저장하고, 요청(왕복) 횟수를 CALLS 에 남긴다.
+# - stock_rankings 의 (strategy_number, ref_date, ticker) 유니크 인덱스를 흉내낸다.
+
+CALLS: list[tuple] = []
+DB: list[dict] = []
+STORAGE: dict[str, bytes] = {}
+
+
+def reset():
+    CALLS.clear()
+    DB.clear()
+    STORAGE.clear()
+
+
+def _key(row: dict) -> tuple:
+    return str(row.get("strategy_number")), str(row.get("ref_date")), row.get("ticker")
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    def __init__(self, table: str):
+        self.table = table
+        self.filters = []
+        self.op = "select"
+        self.payload = None
+        self.row_limit = None
+
+    def select(self, columns="*"):
+        self.op = "select"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda r: str(r.get(column)) == str(value))
+        return self
+
+    def in_(self, column, values):
+        values = set(map(str, values))
+        self.filters.append(lambda r: str(r.get(column)) in values)
+        return self
+
+    def limit(self, n):
+        self.row_limit = n
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = "insert", list(rows)
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.op, self.payload = "upsert", list(rows)
+        return self
+
+    def execute(self):
+        CALLS.append(("table", self.table, self.op))
+        if self.op in ("insert", "upsert"):
+            index = {_key(r): i for i, r in enumerate(DB)}
+            for row in self.payload:
+                i = index.get(_key(row))
+                if i is None:
+                    index[_key(row)] = len(DB)
+                    DB.append(row)
+                elif self.op == "insert":
+                    raise Exception("duplicate key value violates unique constraint")
+                else:
+                    DB[i] = row
+            return _Response(self.payload)
+        rows = [r for r in DB if all(f(r) for f in self.filters)]
+        # PostgREST 기본 최대 응답 행 수
+        return _Response(rows[: self.row_limit or 1000])
+
+
+class _RPC:
+    def __init__(self, fn: str, params: dict):
+        self.fn = fn
+        self.params = params
+
+    def execute(self):
+        CALLS.append(("rpc", self.fn))
+        if self.fn != "get_distinct_strategies":
+            raise Exception(f"unknown function {self.fn}")
+        seen = {}
+        for r in DB:
+            if str(r.get("ref_date")) == str(self.params.get("query_date")):
+                seen[int(r["strategy_number"])] = r.get("strategy_name")
+        return _Response([{"strategy_number": k, "strategy_name": v} for k, v in sorted(seen.items())])
+
+
+class _Bucket:
+    def __init__(self, name: str):
+        self.name = name
+
+    def list(self, path=None, options=None):
+        CALLS.append(("storage", "list", path))
+        folder = path or ""
+        return [{"name": p.rpartition("/")[2]} for p in STORAGE if p.rpartition("/")[0] == folder]
+
+    def upload(self, path, file, file_options=None):
+        CALLS.append(("storage", "upload", path))
+        STORAGE[path] = file.read() if hasattr(file, "read") else bytes(file)
+        return {"Key": path}
+
+
+class _Storage:
+    def from_(self, name: str):
+        return _Bucket(name)
+
+
+class Client:
+    def __init__(self):
+        self.storage = _Storage()
+
+    def table(self, name: str):
+        return _Query(name)
+
+    def rpc(self, fn: str, params: dict | None = None):
+        return _RPC(fn, params or {})
+
+
+def create_client(url, key) -> Client:
+    return Client()
@@ -0,0 +1,246 @@
+# benchmarks/run_benchmarks.py
+# 오프라인 벤치마크: KRX / Supabase 없이 파이프라인 단계별 실행 시간, 최대 메모리, 외부 호출 수를 잰다.
+# - benchmarks/fakes 의 가짜 pykrx / supabase / dotenv 를 진짜 모듈보다 먼저 로드한다.
+# - 종목 수별로 별도 프로세스에서 실행하고(임시 폴더 + 빈 캐시), baselines.json 과 비교해 느려진 단계를 표시한다.
+#
+# 사용법 (korea_quant_propick 폴더에서):
+#   python benchmarks/run_benchmarks.py                       # 1k / 2.5k / 10k 종목, 기준값과 비교
+#   python benchmarks/run_benchmarks.py --sizes 1000          # 일부 규모만
+#   python benchmarks/run_benchmarks.py --update-baseline     # 현재 결과를 기준값으로 저장 (시간은 규모별 3회 실행)
+#
+# 기준값은 실행한 머신에 따라 다르므로, 비교는 같은 머신에서 만든 baselines.json 으로 해야 의미가 있다.
+# 규모마다 두 번 나눠 실행한다.
+# - 시간: 실제 설정(동시 조회/업로드) 그대로, tracemalloc 없이 (여러 번 실행하면 가장 빠른 시간)
+# - 메모리: KRX 동시 조회·업로드를 1개로 줄이고 tracemalloc 으로 단계별 최대 할당량을 잰다.
+#   (동시 실행하면 스레드 순서에 따라 최대 메모리가 실행마다 수십 % 달라지지만, 순차 실행에서는 매번 같은 값이 나와
+#    한 번만 재고 허용 폭을 좁게 둔다)
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+
+BENCH_DIR = Path(__file__).resolve().parent
+PACKAGE_DIR = BENCH_DIR.parent
+FAKES_DIR = BENCH_DIR / "fakes"
+BASELINE_FILE = BENCH_DIR / "baselines.json"
+
+DEFAULT_SIZES = [1000, 2500, 10000]
+BASELINE_REPEAT = 3
+AS_OF = "20240628"
+BACKTEST_RANGE = ("20240102", "20240628")
+
+# 회귀 판정: 기준값보다 비율·절대값 둘 다 넘게 늘었을 때만 (작은 단계의 측정 잡음 무시)
+TIME_TOLERANCE = 0.25
+MIN_TIME_DELTA_SEC = 0.05
+MEMORY_TOLERANCE = 0.1        # 메모리는 순차 실행으로 재므로 실행 간 차이가 없다
+MIN_MEMORY_DELTA_MB = 1.0
+
+
+# ---------------------------------------------------------------------------
+# 자식 프로세스: 한 규모에 대해 모든 단계 실행
+# ---------------------------------------------------------------------------
+
+def _call_count() -> int:
+    from pykrx import stock
+    import supabase
+    return sum(stock.CALLS.values()) + len(supabase.CALLS)
+
+
+def _measure(results: dict, name: str, fn, memory: bool):
+    """memory=False 면 실행 시간만, True 면 tracemalloc 최대 할당량만 잰다. (호출 수는 둘 다)"""
+    calls_before = _call_count()
+    if memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn()
+    seconds = time.perf_counter() - t0
+    result = {"calls": _call_count() - calls_before}
+    if memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["peak_mb"] = round(peak / 2**20, 2)
+    else:
+        result["seconds"] = round(seconds, 4)
+    results[name] = result
+    return out
+
+
+def run_stages(size: int, work_dir: str, memory: bool = False) -> dict:
+    os.environ["KQP_BENCH_TICKERS"] = str(size)
+    sys.path[:0] = [str(FAKES_DIR), str(PACKAGE_DIR)]
+    os.chdir(work_dir)
+
+    # data_loader 등이 설정값을 가져가기 전에 캐시 위치와 속도 제한을 벤치마크용으로 바꾼다.
+    import quant_config
+    quant_config.CACHE_DIR = os.path.join(work_dir, ".krx_cache")
+    quant_config.KRX_MAX_CALLS_PER_SEC = 1e9
+    quant_config.KRX_RATE_BURST = 10**9
+    if memory:
+        quant_config.KRX_FETCH_WORKERS = 1
+
+    import supabase
+    import factor_model
+    import rank_main
+    import backtest
+    import upload_to_supabase
+    from strategy_engine import STRATEGY_INFO
+
+    upload_to_supabase.is_weekend = lambda: False
+    if memory:
+        upload_to_supabase.UPLOAD_WORKERS = 1
+    backtest.BACKTEST_START_DATE, backtest.BACKTEST_END_DATE = BACKTEST_RANGE
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+
+    results: dict = {}
+
+    def measure(name, fn):
+        return _measure(results, name, fn, memory)
+
+    df_raw = measure("build_factor_table_cold", lambda: factor_model.build_factor_table(AS_OF))
+    df_raw = measure("build_factor_table_warm", lambda: factor_model.build_factor_table(AS_OF))
+    measure("refresh_factor_table", lambda: factor_model.refresh_factor_table(df_raw, AS_OF))
+    df = measure("enrich_table", lambda: rank_main.enrich_table(df_raw))
+    measure("apply_strategy", lambda: [rank_main.apply_strategy(df, c) for c in STRATEGY_INFO])
+    ranked = measure("run_all_strategies",
+                     lambda: rank_main.run_all_strategies(df, AS_OF, timestamp, save_csv=True))
+    supabase.reset()
+    measure("upload_and_insert", upload_to_supabase.upload_and_insert)
+    supabase.reset()
+    measure("upload_frames", lambda: upload_to_supabase.upload_frames(ranked))
+    measure("run_backtest", lambda: backtest.run_backtest(workers=1))
+    return results
+
+
+# ---------------------------------------------------------------------------
+# 부모 프로세스: 규모별 실행, 기준값 비교/저장
+# ---------------------------------------------------------------------------
+
+def run_size(size: int, memory: bool = False) -> dict:
+    """한 규모를 새 프로세스에서 실행한다. memory=True 면 메모리 측정용(순차 실행) 실행."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(FAKES_DIR), str(PACKAGE_DIR), env.get("PYTHONPATH", "")])
+    with tempfile.TemporaryDirectory(prefix="kqp_bench_") as work_dir:
+        out_file = os.path.join(work_dir, "result.json")
+        proc = subprocess.run(
+            [sys.executable, str(Path(__file__).resolve()), "--child", str(size), "--output", out_file,
+             *(["--memory"] if memory else [])],
+            env=env, cwd=work_dir, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(proc.stdout[-4000:])
+            print(proc.stderr[-4000:])
+            raise RuntimeError(f"벤치마크 실행 실패 (종목 {size}개)")
+        with open(out_file, encoding="utf-8") as f:
+            return json.load(f)
+
+
+def merge_runs(time_runs: list[dict], memory_runs: list[dict]) -> dict:
+    """시간 측정 실행들의 단계별 최소 시간 + 메모리 측정 실행들의 최대 메모리, 호출 수는 전체 최대."""
+    merged = {}
+    for stage in time_runs[0]:
+        merged[stage] = {
+            "seconds": min(r[stage]["seconds"] for r in time_runs),
+            "peak_mb": max(r[stage]["peak_mb"] for r in memory_runs),
+            "calls": max(r[stage]["calls"] for r in time_runs + memory_runs),
+        }
+    return merged
+
+
+def compare(result: dict, baseline: dict | None) -> list[str]:
+    """기준값 대비 느려짐/메모리 증가/호출 수 증가 목록."""
+    if not baseline:
+        return []
+    problems = []
+    for stage, cur in result.items():
+        base = baseline.get(stage)
+        if base is None:
+            continue
+        if cur["seconds"] > base["seconds"] * (1 + TIME_TOLERANCE) and \
+                cur["seconds"] - base["seconds"] > MIN_TIME_DELTA_SEC:
+            problems.append(f"{stage}: 시간 {base['seconds']:.3f}s -> {cur['seconds']:.3f}s")
+        if cur["peak_mb"] > base["peak_mb"] * (1 + MEMORY_TOLERANCE) and \
+                cur["peak_mb"] - base["peak_mb"] > MIN_MEMORY_DELTA_MB:
+            problems.append(f"{stage}: 메모리 {base['peak_mb']:.1f}MB -> {cur['peak_mb']:.1f}MB")
+        if cur["calls"] > base["calls"]:
+            problems.append(f"{stage}: 외부 호출 {base['calls']} -> {cur['calls']}")
+    return problems
+
+
+def _print_table(size: int, result: dict, baseline: dict | None):
+    print(f"\n=== 종목 {size:,}개 ===")
+    print(f"{'단계':<26}{'시간(s)':>10}{'기준':>10}{'메모리(MB)':>12}{'기준':>10}{'호출':>8}{'기준':>8}")
+    for stage, cur in result.items():
+        base = (baseline or {}).get(stage, {})
+        print(f"{stage:<26}{cur['seconds']:>10.3f}{base.get('seconds', float('nan')):>10.3f}"
+              f"{cur['peak_mb']:>12.1f}{base.get('peak_mb', float('nan')):>10.1f}"
+              f"{cur['calls']:>8}{base.get('calls', '-'):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Korea Quant ProPick 오프라인 벤치마크")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="종목 수 (규모별로 실행)")
+    parser.add_argument("--update-baseline", action="store_true", help="결과를 baselines.json 에 저장")
+    parser.add_argument("--repeat", type=int, default=None,
+                        help=f"규모별 시간 측정 반복 횟수 (기본 1, --update-baseline 이면 {BASELINE_REPEAT})")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    parser.add_argument("--memory", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        result = run_stages(args.child, os.getcwd(), memory=args.memory)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    baselines = {}
+    if BASELINE_FILE.exists():
+        with open(BASELINE_FILE, encoding="utf-8") as f:
+            baselines = json.load(f)
+
+    repeat = args.repeat or (BASELINE_REPEAT if args.update_baseline else 1)
+    regressions = []
+    for size in args.sizes:
+        print(f"[INFO] 종목 {size:,}개 규모 실행 중... ({repeat}회)")
+        # 메모리 측정 실행은 순차 실행이라 결과가 매번 같으므로 한 번만 돌린다.
+        result = merge_runs([run_size(size) for _ in range(repeat)], [run_size(size, memory=True)])
+        baseline = baselines.get(str(size))
+        _print_table(size, result, baseline)
+        if args.update_baseline:
+            baselines[str(size)] = result
+        else:
+            regressions += [f"[{size}] {p}" for p in compare(result, baseline)]
+
+    if args.update_baseline:
+        baselines["_meta"] = {
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "as_of": AS_OF,
+            "backtest_range": list(BACKTEST_RANGE),
+            "repeat": repeat,
+        }
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, ensure_ascii=False, indent=2)
+        print(f"\n[INFO] 기준값을 {BASELINE_FILE} 에 저장했습니다.")
+        return
+
+    if regressions:
+        print("\n[WARN] 기준값 대비 회귀:")
+        for r in regressions:
+            print(f"  - {r}")
+        sys.exit(1)
+    print("\n[INFO] 기준값 대비 회귀 없음")
+
+
+if __name__ == "__main__":
+    main()
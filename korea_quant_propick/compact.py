@@ -0,0 +1,177 @@
+# compact.py
+# 팩터 테이블 메모리 절약 표현 (여러 날짜의 테이블/점수를 메모리에 들고 있을 때 사용)
+# - 라벨 컬럼(시장 / 종목명 / 시총구간 / 리스크구간 / 스타일) -> category
+# - 정수 컬럼은 값 범위가 int32 에 들어가면 int32 (종가, 대부분의 거래량)
+# - 티커 문자열 인덱스 -> ticker_meta 의 int32 코드 인덱스, 종목코드 컬럼은 인덱스에서 다시 만들 수 있으므로 뺀다
+# - COMPACT_DTYPES 면 점수·비율 실수 컬럼도 float32 (시가총액·거래대금처럼 큰 금액 컬럼은 정밀도 때문에 그대로 둔다)
+# - 출력(CSV/업로드/화면) 직전에 expand_table() 로 지금 스키마(티커 인덱스, 원래 컬럼 순서·dtype)로 되돌린다.
+#   float32 를 쓰지 않으면 원래 값 그대로 돌아오고, float32 로 줄인 컬럼만 유효숫자 7자리로 반올림된 값이 된다.
+# - 코드는 프로세스 안에서만 쓴다. (파일에는 티커 문자열로 저장)
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from quant_config import COMPACT_DTYPES
+
+
+# 값의 종류가 정해진 라벨 컬럼은 카테고리 순서를 고정해 날짜가 달라도 같은 dtype 이 되게 한다.
+LABEL_CATEGORIES = {
+    "시장": ["KOSPI", "KOSDAQ"],
+    "시총구간": ["초대형주(10조↑)", "대형주(5~10조)", "중형주(1~5조)", "소형주(1조↓)", "알수없음"],
+    "리스크구간": ["저위험", "중위험", "고위험", "알수없음"],
+    "스타일": ["가치주", "밸류/균형형", "모멘텀주", "모멘텀/균형형", "퀄리티/배당주", "퀄리티/균형형"],
+    "종목명": None,
+}
+
+# float32(유효숫자 7자리)로 줄이면 값이 달라지는 큰 금액/수량 컬럼
+WIDE_NUMERIC_COLUMNS = ["종가", "시가총액", "거래량", "거래대금", "상장주식수"]
+
+INT32_MIN, INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+
+# 고정 카테고리 dtype 은 한 번만 만든다. (CategoricalDtype 생성·검증이 작은 테이블에서는 변환보다 비싸다)
+LABEL_DTYPES = {col: pd.CategoricalDtype(cats) for col, cats in LABEL_CATEGORIES.items() if cats}
+
+CODE_INDEX_NAME = "code"
+DERIVED_COLUMNS = ["종목코드"]   # 인덱스(티커)에서 다시 만드는 컬럼
+
+
+def _to_category(s: pd.Series, col: str) -> pd.Categorical:
+    # 문자열 컬럼에 pd.Categorical 을 바로 쓰면 느려서 코드를 직접 만든다.
+    values = s.to_numpy(dtype=object)
+    dtype = LABEL_DTYPES.get(col)
+    if dtype is not None:
+        codes = dtype.categories.get_indexer(values)
+        extra = pd.Index(values[(codes < 0) & pd.notna(values)]).unique()
+        if not len(extra):
+            return pd.Categorical.from_codes(codes, dtype=dtype)
+        # 정해진 카테고리 밖의 값이 있으면 뒤에 붙인다.
+        return pd.Categorical(values, categories=list(dtype.categories) + sorted(extra))
+    codes, uniques = pd.factorize(values)
+    return pd.Categorical.from_codes(codes, categories=uniques)
+
+
+def encode_tickers(tickers) -> np.ndarray:
+    """티커 배열 -> ticker_meta int32 코드 배열 (처음 보는 티커는 새 코드를 붙인다)."""
+    # ticker_meta 는 data_loader(pykrx)를 불러오므로 코드가 필요할 때만 import (rank_main 은 가볍게 import 되어야 함)
+    from ticker_meta import get_ticker_meta
+    return get_ticker_meta().assign_codes(pd.Index(tickers).astype(str))
+
+
+def decode_tickers(codes) -> np.ndarray:
+    """int32 코드 배열 -> 티커 배열."""
+    from ticker_meta import get_ticker_meta
+    tickers = get_ticker_meta().tickers_for(codes)
+    if pd.isna(tickers).any():
+        raise RuntimeError("종목 메타데이터에 없는 코드가 있어 티커로 되돌릴 수 없습니다.")
+    return tickers
+
+
+def compact_table(df: pd.DataFrame, float32: bool = COMPACT_DTYPES) -> pd.DataFrame:
+    """팩터 테이블(build_factor_table / enrich_table / 전략 랭킹 결과) -> 메모리 절약 표현.
+
+    원래 스키마(인덱스 이름, 컬럼 순서, dtype)는 df.attrs["schema"] 에 남겨 expand_table 에서 쓴다.
+    float32 면 WIDE_NUMERIC_COLUMNS 외 실수 컬럼을 float32 로 줄인다.
+    """
+    codes = encode_tickers(df.index)
+
+    schema = {
+        "index_name": df.index.name,
+        "columns": list(df.columns),
+        "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
+    }
+
+    out = {}
+    for col in df.columns:
+        if col in DERIVED_COLUMNS:
+            continue
+        s = df[col]
+        if col in LABEL_CATEGORIES:
+            out[col] = _to_category(s, col)
+        elif float32 and s.dtype == np.float64 and col not in WIDE_NUMERIC_COLUMNS:
+            out[col] = s.to_numpy(dtype=np.float32)
+        elif s.dtype == np.int64 and len(s) and INT32_MIN <= s.min() and s.max() <= INT32_MAX:
+            out[col] = s.to_numpy(dtype=np.int32)
+        else:
+            out[col] = s.to_numpy()
+
+    compact = pd.DataFrame(out, index=pd.Index(codes, name=CODE_INDEX_NAME))
+    compact.attrs["schema"] = schema
+    return compact
+
+
+def is_compact(df: pd.DataFrame) -> bool:
+    """compact_table 결과(코드 인덱스 + 스키마)인지."""
+    return df.index.name == CODE_INDEX_NAME and "schema" in df.attrs
+
+
+def for_output(df: pd.DataFrame) -> pd.DataFrame:
+    """출력 직전 변환: compact 표현이면 expand_table, 아니면 그대로."""
+    return expand_table(df) if is_compact(df) else df
+
+
+def _widen_float32(values: np.ndarray) -> np.ndarray:
+    """float32 -> float64. 최단 10진 표현을 거쳐 넓혀 CSV 에 4.949999809265137 같은 꼬리가 붙지 않게 한다. (4.95 -> 4.95)"""
+    return values.astype(str).astype(np.float64)
+
+
+def expand_table(compact: pd.DataFrame, schema: dict | None = None) -> pd.DataFrame:
+    """compact_table 결과 -> 원래 스키마의 팩터 테이블 (출력 직전에 호출)."""
+    schema = schema or compact.attrs.get("schema") or {}
+    dtypes = schema.get("dtypes", {})
+
+    index = pd.Index(decode_tickers(compact.index.to_numpy()), name=schema.get("index_name", "티커"))
+    # attrs 가 남아 있으면 컬럼을 꺼낼 때마다 pandas 가 스키마를 deepcopy 하므로 attrs 없는 얕은 복사본에서 꺼낸다.
+    plain = compact.copy(deep=False)
+    plain.attrs = {}
+
+    data = {}
+    for col, values in plain.items():
+        target = dtypes.get(col)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            data[col] = values.astype(target or object).array
+        elif values.dtype == np.float32:
+            data[col] = _widen_float32(values.to_numpy()).astype(target or np.float64)
+        elif values.dtype == np.int32 and target:
+            data[col] = values.to_numpy().astype(target)
+        else:
+            data[col] = values.array
+
+    if "종목코드" in dtypes:
+        # enrich_table 과 같은 규칙 (6자리 0패딩 문자열)
+        data["종목코드"] = pd.Series(index.astype(str).str.zfill(6)).astype(dtypes["종목코드"]).array
+
+    columns = [c for c in schema.get("columns", data) if c in data]
+    return pd.DataFrame(data, index=index, columns=columns + [c for c in data if c not in columns])
+
+
+def stack_tables(tables: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """{날짜: compact_table 결과} -> (날짜, code) 인덱스 하나의 긴 테이블.
+
+    라벨 카테고리는 합집합으로 맞춰 category dtype 을 유지한다. (pd.concat 은 카테고리가 다르면 object 로 바꿈)
+    날짜별 테이블은 unstack_table(long, 날짜) 로 다시 꺼낸다.
+    """
+    dates = list(tables)
+    frames = [tables[d].copy(deep=False) for d in dates]
+    if not frames:
+        return pd.DataFrame()
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            merged = union_categoricals([f[col].array for f in frames], ignore_order=True).categories
+            for f in frames:
+                f[col] = f[col].cat.set_categories(merged)
+    long = pd.concat(frames, axis=0, keys=dates, names=["날짜", CODE_INDEX_NAME])
+    long.attrs["schema"] = frames[0].attrs.get("schema", {})
+    return long
+
+
+def unstack_table(long: pd.DataFrame, date: str) -> pd.DataFrame:
+    """stack_tables 결과에서 한 날짜의 compact 테이블을 꺼낸다."""
+    table = long.xs(date, level="날짜")
+    table.attrs["schema"] = long.attrs.get("schema", {})
+    return table
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    """인덱스·문자열 내용까지 포함한 DataFrame 메모리 (MB)."""
+    return float(df.memory_usage(index=True, deep=True).sum()) / 2**20
@@ -1,20 +1,348 @@
 
 # data_loader.py
 
+import json
+import multiprocessing
+import os
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from pathlib import Path
 
 import numpy as np
 import pandas as pd
 from pykrx import stock
 
-from quant_config import UNIVERSE_SIZE_PER_MARKET, MONTHS_3, MONTHS_12
+try:
+    # pykrx 가 requests 로 KRX 에 접속하므로 보통은 함께 설치되어 있다.
+    from requests import RequestException
+except ImportError:
+    RequestException = ConnectionError
+
+from quant_config import (
+    UNIVERSE_SIZE_PER_MARKET,
+    UNIVERSE_INDEX_ENABLED,
+    MONTHS_3,
+    MONTHS_12,
+    CACHE_ENABLED,
+    CACHE_DIR,
+    CACHE_TODAY_TTL_SECONDS,
+    KRX_MAX_CALLS_PER_SEC,
+    KRX_RATE_BURST,
+    KRX_FETCH_WORKERS,
+    KRX_MAX_RETRIES,
+    KRX_BACKOFF_BASE_SEC,
+    KRX_CIRCUIT_FAIL_THRESHOLD,
+    KRX_CIRCUIT_COOLDOWN_SEC,
+)
+from instrumentation import bind_stage, frame_nbytes, is_active, record_call, stage
 
 
 def to_yyyymmdd(d: datetime) -> str:
     return d.strftime("%Y%m%d")
 
 
+# ---------------------------------------------------------------------------
+# KRX 호출 속도 제한 (토큰 버킷)
+# - 프로세스 안에서는 threading.Lock 으로 공유
+# - 백테스트 병렬 모드처럼 여러 프로세스가 같은 한도를 나눠 써야 할 때는
+#   make_shared_rate_state() 로 만든 상태를 각 워커에서 install_rate_limiter() 로 설치한다.
+# ---------------------------------------------------------------------------
+
+class RateLimiter:
+    def __init__(self, calls_per_sec: float, burst: int = 1, shared_state=None):
+        self.rate = float(calls_per_sec)
+        self.burst = max(1, int(burst))
+        if shared_state is None:
+            self._lock = threading.Lock()
+            self._state = [float(self.burst), time.monotonic()]  # [남은 토큰, 마지막 갱신 시각]
+        else:
+            self._lock, self._state = shared_state
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens = min(self.burst, self._state[0] + (now - self._state[1]) * self.rate)
+                self._state[1] = now
+                if tokens >= 1.0:
+                    self._state[0] = tokens - 1.0
+                    return
+                self._state[0] = tokens
+                wait = (1.0 - tokens) / self.rate
+            time.sleep(wait)
+
+
+def make_shared_rate_state(burst: int = KRX_RATE_BURST):
+    """프로세스 간에 공유할 토큰 버킷 상태 (Lock, [토큰, 시각])."""
+    state = multiprocessing.Array("d", [float(burst), time.monotonic()], lock=False)
+    return multiprocessing.Lock(), state
+
+
+_rate_limiter = RateLimiter(KRX_MAX_CALLS_PER_SEC, KRX_RATE_BURST)
+
+
+def install_rate_limiter(shared_state=None):
+    """현재 프로세스의 KRX 호출 제한기를 교체한다. (프로세스 풀 initializer 용)"""
+    global _rate_limiter
+    _rate_limiter = RateLimiter(KRX_MAX_CALLS_PER_SEC, KRX_RATE_BURST, shared_state)
+
+
+class KrxUnavailableError(RuntimeError):
+    """연속 실패로 회로 차단기가 열려 KRX 호출을 잠시 막고 있을 때 발생."""
+
+
+# 재시도 / 회로 차단 대상: 네트워크·응답 형식 오류만 (KeyError, 휴장일 빈 응답 같은 결정적 실패는 바로 올린다)
+TRANSIENT_ERRORS = (RequestException, ConnectionError, TimeoutError, json.JSONDecodeError)
+
+
+class CircuitBreaker:
+    """연속 실패가 threshold 회 이상이면 cooldown 초 동안 호출을 바로 실패시킨다.
+    cooldown 이 지나면 한 호출만 시험으로 통과시키고(half-open), 성공하면 다시 닫힌다.
+    """
+
+    def __init__(self, threshold: int, cooldown_sec: float):
+        self.threshold = threshold
+        self.cooldown_sec = cooldown_sec
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial = False        # half-open 시험 호출 진행 중
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.cooldown_sec - (time.monotonic() - self._opened_at)
+            if remaining > 0:
+                raise KrxUnavailableError(
+                    f"KRX 호출이 연속 {self._failures}회 실패해 {remaining:.0f}초 동안 차단 중입니다.")
+            if self._trial:
+                raise KrxUnavailableError("KRX 호출 차단 해제 전 시험 호출이 진행 중입니다.")
+            self._trial = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial = False
+            if self._failures >= self.threshold:
+                if self._opened_at is None:
+                    print(f"[WARN] KRX 호출 연속 {self._failures}회 실패: {self.cooldown_sec:.0f}초 동안 호출을 차단합니다.")
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """시험 호출이 네트워크와 무관한 이유로 끝났을 때: 상태는 그대로 두고 다음 호출이 다시 시험하게 한다."""
+        with self._lock:
+            self._trial = False
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+
+_circuit_breaker = CircuitBreaker(KRX_CIRCUIT_FAIL_THRESHOLD, KRX_CIRCUIT_COOLDOWN_SEC)
+
+
+def _krx_call(fn, *args, **kwargs):
+    """pykrx 네트워크 호출은 이 함수를 거친다.
+    - 토큰 버킷 속도 제한
+    - 네트워크·응답 형식 오류(TRANSIENT_ERRORS)는 지수 백오프로 최대 KRX_MAX_RETRIES 회 재시도
+    - 연속 실패가 쌓이면 회로 차단기가 열려 일정 시간 바로 실패
+    - 그 밖의 예외(잘못된 날짜 등 결정적 실패)는 재시도·차단 집계 없이 바로 올린다
+    """
+    last_error: Exception | None = None
+    for attempt in range(KRX_MAX_RETRIES + 1):
+        _circuit_breaker.before_call()
+        _rate_limiter.acquire()
+        try:
+            result = fn(*args, **kwargs)
+        except TRANSIENT_ERRORS as e:
+            last_error = e
+            _circuit_breaker.record_failure()
+            if attempt == KRX_MAX_RETRIES or _circuit_breaker.is_open:
+                break
+            delay = KRX_BACKOFF_BASE_SEC * (2 ** attempt) * random.uniform(0.5, 1.0)
+            print(f"[WARN] KRX 호출 실패({e}), {delay:.1f}초 후 재시도 ({attempt + 1}/{KRX_MAX_RETRIES})")
+            time.sleep(delay)
+            continue
+        except Exception:
+            _circuit_breaker.release()
+            raise
+        _circuit_breaker.record_success()
+        return result
+    raise last_error
+
+
+# ---------------------------------------------------------------------------
+# 동시 조회: 서로 독립적인 요청(코스피/코스닥, 기간별 등락률 등)을 스레드 풀에서 함께 실행
+# 실제 호출 간격은 위의 전역 토큰 버킷이 조절한다.
+# ---------------------------------------------------------------------------
+
+_fetch_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_worker_state = threading.local()
+
+
+def _mark_fetch_worker():
+    _worker_state.in_pool = True
+
+
+def _get_fetch_executor() -> ThreadPoolExecutor:
+    global _fetch_executor
+    with _executor_lock:
+        if _fetch_executor is None:
+            _fetch_executor = ThreadPoolExecutor(max_workers=KRX_FETCH_WORKERS,
+                                                 thread_name_prefix="krx-fetch",
+                                                 initializer=_mark_fetch_worker)
+        return _fetch_executor
+
+
+def _reset_fetch_executor_after_fork():
+    # fork 로 만든 자식 프로세스(백테스트 병렬 워커)에는 부모의 풀 스레드가 따라오지 않으므로 새로 만든다.
+    global _fetch_executor, _executor_lock
+    _fetch_executor = None
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_fetch_executor_after_fork)
+
+
+def run_concurrently(*funcs) -> list:
+    """인자 없는 함수들을 동시에 실행하고 결과를 같은 순서의 리스트로 돌려준다.
+    하나라도 예외가 나면 그 예외를 그대로 올린다.
+    (풀 워커 안에서 다시 호출되면 교착을 피하기 위해 순서대로 실행)
+    """
+    if len(funcs) <= 1 or KRX_FETCH_WORKERS <= 1 or getattr(_worker_state, "in_pool", False):
+        return [f() for f in funcs]
+    executor = _get_fetch_executor()
+    futures = [executor.submit(bind_stage(f)) for f in funcs]
+    return [f.result() for f in futures]
+
+
+# ---------------------------------------------------------------------------
+# pykrx 응답 로컬 캐시 (Parquet)
+# - 키: 엔드포인트 / 조회 구간(start~end) / 시장 / 티커
+# - 조회 구간의 마지막 날이 지난 뒤에 받아둔 데이터는 확정 데이터이므로 만료 없음
+# - 그 외(오늘 장중 데이터 등)는 CACHE_TODAY_TTL_SECONDS 이후 다시 받는다
+# ---------------------------------------------------------------------------
+
+def _cache_path(endpoint: str, start: str, end: str, market: str = "", ticker: str = "") -> Path:
+    key = "_".join([start, end, market or "-", ticker or "-"])
+    return Path(CACHE_DIR) / endpoint / f"{key}.parquet"
+
+
+def _is_cache_fresh(path: Path, end: str) -> bool:
+    fetched_at = datetime.fromtimestamp(path.stat().st_mtime)
+    if to_yyyymmdd(fetched_at) > end:
+        return True
+    age = (datetime.now() - fetched_at).total_seconds()
+    return age < CACHE_TODAY_TTL_SECONDS
+
+
+def _traced_krx_call(endpoint: str, fetch):
+    """_krx_call + 계측 (엔드포인트별 호출 수 / 응답 크기 / 지연시간, 속도 제한 대기·재시도 포함)."""
+    if not is_active():
+        return _krx_call(fetch)
+    t0 = time.perf_counter()
+    try:
+        df = _krx_call(fetch)
+    except Exception:
+        record_call(f"pykrx.{endpoint}", time.perf_counter() - t0, ok=False)
+        raise
+    record_call(f"pykrx.{endpoint}", time.perf_counter() - t0, frame_nbytes(df))
+    return df
+
+
+def _cached_fetch(endpoint: str, fetch, start: str, end: str,
+                  market: str = "", ticker: str = "", refresh: bool = False) -> pd.DataFrame:
+    """pykrx 호출 결과를 Parquet 파일로 캐시한다. 예외는 캐시하지 않고 그대로 올린다.
+    refresh 면 캐시를 읽지 않고 새로 받아 캐시를 덮어쓴다. (장중 갱신용)
+    """
+    if not CACHE_ENABLED:
+        return _traced_krx_call(endpoint, fetch)
+
+    path = _cache_path(endpoint, start, end, market, ticker)
+    if not refresh and path.exists() and _is_cache_fresh(path, end):
+        try:
+            t0 = time.perf_counter()
+            df = pd.read_parquet(path)
+            if is_active():
+                record_call(f"pykrx.{endpoint}", time.perf_counter() - t0, frame_nbytes(df), cache_hit=True)
+            return df
+        except Exception:
+            # 손상된 캐시 파일은 무시하고 다시 받는다.
+            pass
+
+    df = _traced_krx_call(endpoint, fetch)
+    if isinstance(df, pd.DataFrame):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            df.to_parquet(tmp)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"[WARN] 캐시 저장 실패 ({endpoint} {start}~{end} {market}{ticker}): {e}")
+            if tmp.exists():
+                tmp.unlink()
+    return df
+
+
+def fetch_market_cap(date: str, market: str = "KOSPI", refresh: bool = False) -> pd.DataFrame:
+    return _cached_fetch("market_cap",
+                         lambda: stock.get_market_cap(date, market=market),
+                         date, date, market=market, refresh=refresh)
+
+
+def fetch_market_fundamental(date: str, market: str = "KOSPI") -> pd.DataFrame:
+    return _cached_fetch("market_fundamental",
+                         lambda: stock.get_market_fundamental(date, market=market),
+                         date, date, market=market)
+
+
+def fetch_market_price_change(start: str, end: str, market: str = "KOSPI", refresh: bool = False) -> pd.DataFrame:
+    return _cached_fetch("market_price_change",
+                         lambda: stock.get_market_price_change(start, end, market=market),
+                         start, end, market=market, refresh=refresh)
+
+
+def fetch_ohlcv_by_date(start: str, end: str, ticker: str) -> pd.DataFrame:
+    return _cached_fetch("ohlcv_by_date",
+                         lambda: stock.get_market_ohlcv_by_date(start, end, ticker),
+                         start, end, ticker=ticker)
+
+
+def fetch_sector_classifications(date: str, market: str = "KOSPI") -> pd.DataFrame:
+    return _cached_fetch("sector_classifications",
+                         lambda: stock.get_market_sector_classifications(date, market),
+                         date, date, market=market)
+
+
+def fetch_ticker_name(ticker: str) -> str:
+    # pykrx 가 전체 종목 목록을 한 번 받아 메모리에 들고 있으므로 캐시/속도 제한 없이 호출한다.
+    t0 = time.perf_counter()
+    name = stock.get_market_ticker_name(ticker)
+    record_call("pykrx.ticker_name", time.perf_counter() - t0)
+    return name
+
+
+def fetch_index_ohlcv_by_date(start: str, end: str, index_ticker: str) -> pd.DataFrame:
+    return _cached_fetch("index_ohlcv_by_date",
+                         lambda: stock.get_index_ohlcv_by_date(start, end, index_ticker, name_display=False),
+                         start, end, ticker=index_ticker)
+
+
 def _is_valid_cap_frame(df: pd.DataFrame) -> bool:
     """시가총액 데이터프레임이 '진짜 영업일'인지 판별.
     - df가 비어 있지 않고
@@ -33,13 +361,13 @@ def _is_valid_cap_frame(df: pd.DataFrame) -> bool:
     return total > 0.0
 
 
-def get_trading_date_on_or_before(date_str: str, max_back_days: int = 10) -> str:
-    """입력 날짜 기준, 이전으로 거슬러 올라가며 '시가총액 합계 > 0' 인 첫 영업일을 찾는다."""
+def _probe_trading_date_on_or_before(date_str: str, max_back_days: int) -> str:
+    """거래일 캘린더를 쓸 수 없을 때의 예비 경로: 하루씩 거슬러 올라가며 시가총액 프레임을 확인한다."""
     d = datetime.strptime(date_str, "%Y%m%d")
     for _ in range(max_back_days):
         ds = to_yyyymmdd(d)
         try:
-            df = stock.get_market_cap(ds)
+            df = fetch_market_cap(ds)
             if _is_valid_cap_frame(df):
                 return ds
         except Exception:
@@ -48,24 +376,34 @@ def get_trading_date_on_or_before(date_str: str, max_back_days: int = 10) -> str
     raise RuntimeError(f"{date_str} 기준 {max_back_days}일 이내 유효한 영업일(시가총액>0)을 찾지 못했습니다.")
 
 
+def get_trading_date_on_or_before(date_str: str, max_back_days: int = 10) -> str:
+    """입력 날짜 기준, 같은 날 또는 그 이전의 첫 영업일을 거래일 캘린더에서 찾는다."""
+    # trading_calendar 가 data_loader 의 fetch 함수를 쓰므로 순환 import 를 피하려고 여기서 import
+    from trading_calendar import get_calendar
+
+    try:
+        ds = get_calendar().on_or_before(date_str)
+    except Exception as e:
+        print(f"[WARN] 거래일 캘린더 조회 실패, 일자별 탐색으로 대체합니다: {e}")
+        return _probe_trading_date_on_or_before(date_str, max_back_days)
+
+    d = datetime.strptime(date_str, "%Y%m%d")
+    if ds is None or (d - datetime.strptime(ds, "%Y%m%d")).days >= max_back_days:
+        raise RuntimeError(f"{date_str} 기준 {max_back_days}일 이내 유효한 영업일(시가총액>0)을 찾지 못했습니다.")
+    return ds
+
+
+@stage("trading_date")
 def get_recent_trading_date(max_back_days: int = 10) -> str:
     """오늘 기준 가장 가까운 '진짜 영업일' 찾기.
-    - 그냥 오늘 날짜로 get_market_cap 호출하면
-      장 시작 전에는 시가총액/거래대금이 전부 0으로 나오는 경우가 있어
-      그런 날은 스킵하고 전일로 한 칸씩 뒤로 가면서 찾는다.
+    - 장 시작 전에는 오늘 데이터가 아직 없으므로 캘린더에 오늘이 들어가지 않고,
+      자연스럽게 전 영업일이 선택된다.
     """
-    today = datetime.today()
-    for i in range(max_back_days):
-        d = today - timedelta(days=i)
-        ds = to_yyyymmdd(d)
-        try:
-            df = stock.get_market_cap(ds)
-            if _is_valid_cap_frame(df):
-                return ds
-        except Exception:
-            time.sleep(0.1)
-            continue
-    raise RuntimeError(f"최근 {max_back_days}일 안에 유효한 시가총액 데이터를 찾지 못했습니다.")
+    today = to_yyyymmdd(datetime.today())
+    try:
+        return get_trading_date_on_or_before(today, max_back_days=max_back_days)
+    except RuntimeError:
+        raise RuntimeError(f"최근 {max_back_days}일 안에 유효한 시가총액 데이터를 찾지 못했습니다.") from None
 
 
 def percentile_rank(series: pd.Series, higher_is_better: bool = True) -> pd.Series:
@@ -80,28 +418,139 @@ def percentile_rank(series: pd.Series, higher_is_better: bool = True) -> pd.Seri
     return ranks
 
 
-def get_universe(as_of: str) -> pd.DataFrame:
-    kospi_cap = stock.get_market_cap(as_of, market="KOSPI")
-    kospi_cap = kospi_cap.sort_values("시가총액", ascending=False).head(UNIVERSE_SIZE_PER_MARKET)
-    kospi_cap["시장"] = "KOSPI"
+RANK_NA_POLICIES = ("median", "keep", "worst")
+
 
-    kosdaq_cap = stock.get_market_cap(as_of, market="KOSDAQ")
-    kosdaq_cap = kosdaq_cap.sort_values("시가총액", ascending=False).head(UNIVERSE_SIZE_PER_MARKET)
-    kosdaq_cap["시장"] = "KOSDAQ"
+def rank_matrix(values, higher_is_better=True, na_policy="median", groups=None) -> np.ndarray:
+    """(종목 수 × 팩터 수) 행렬을 컬럼별 백분위 순위(0~1)로 한 번에 바꾼다. (percentile_rank 의 행렬 버전)
 
-    universe = pd.concat([kospi_cap, kosdaq_cap], axis=0)
+    - higher_is_better: bool 하나 또는 컬럼별 bool 목록
+    - na_policy: 문자열 하나 또는 컬럼별 목록 (inf 는 결측으로 본다)
+        median : 결측을 (그룹) 중앙값으로 채운 뒤 순위. 전부 결측이면 0.5 (percentile_rank 와 같은 값)
+        keep   : 결측은 결측으로 두고 나머지끼리 순위
+        worst  : 결측을 가장 나쁜 값으로 보고 순위 (결측끼리는 동순위)
+    - groups: 행별 그룹 라벨(예: 시장). 주면 그룹 안에서 따로 순위를 매긴다.
+    동순위는 평균 순위 (pandas rank(method="average", pct=True) 와 같은 값)
+    """
+    X = np.array(values, dtype=float)
+    vector = X.ndim == 1
+    if vector:
+        X = X[:, None]
+    n, k = X.shape
+    higher = np.broadcast_to(np.asarray(higher_is_better, dtype=bool), (k,))
+    policies = np.broadcast_to(np.asarray(na_policy, dtype=object), (k,))
+    unknown = set(policies) - set(RANK_NA_POLICIES)
+    if unknown:
+        raise ValueError(f"na_policy 는 {RANK_NA_POLICIES} 중 하나여야 합니다: {sorted(unknown)}")
+
+    if groups is None:
+        g = np.zeros(n, dtype=np.intp)
+    else:
+        g, uniques = pd.factorize(np.asarray(groups, dtype=object))
+        g = np.where(g < 0, len(uniques), g)   # 그룹 라벨이 없는 행끼리 한 그룹
+    n_groups = int(g.max()) + 1 if n else 0
+
+    X[np.isinf(X)] = np.nan
+    valid = ~np.isnan(X)
+
+    # 그룹별로: 순위 분모(keep 이면 결측 아닌 종목 수, 나머지는 그룹 종목 수),
+    # median 정책 컬럼의 결측은 그룹 중앙값으로 채움 (전부 결측이면 나중에 0.5)
+    keep_cols = policies == "keep"
+    median_cols = policies == "median"
+    counts = np.empty((n_groups, k))
+    all_missing = np.zeros((n_groups, k), dtype=bool)
+    for gi in range(n_groups):
+        rows = np.flatnonzero(g == gi) if n_groups > 1 else slice(None)
+        group_valid = valid[rows]
+        n_valid = group_valid.sum(axis=0)
+        counts[gi] = np.where(keep_cols, n_valid, group_valid.shape[0])
+        all_missing[gi] = median_cols & (n_valid == 0)
+        for j in np.flatnonzero(median_cols & (n_valid > 0) & (n_valid < group_valid.shape[0])):
+            col = X[rows, j]
+            col[~group_valid[:, j]] = np.median(col[group_valid[:, j]])
+            X[rows, j] = col
+
+    X[:, ~higher] = -X[:, ~higher]
+    worst_cols = policies == "worst"
+    X[:, worst_cols] = np.where(np.isnan(X[:, worst_cols]), -np.inf, X[:, worst_cols])
+
+    # 컬럼별 정렬 (결측은 맨 뒤, 동순위는 평균을 내므로 안정 정렬일 필요 없음), 그룹이 있으면 그룹 순으로 다시 안정 정렬
+    order = np.argsort(X, axis=0)
+    if n_groups > 1:
+        order = np.take_along_axis(order, np.argsort(g[order], axis=0, kind="stable"), axis=0)
+    S = np.take_along_axis(X, order, axis=0)
+    G = g[order]
+
+    # 같은 값 구간 [start, end] 의 평균 순위 = (start + end) / 2 - 그룹 시작 위치 + 1
+    pos = np.broadcast_to(np.arange(n)[:, None], (n, k))
+    group_start = np.ones((n, k), dtype=bool)
+    group_start[1:] = G[1:] != G[:-1]
+    block_start = group_start.copy()
+    block_start[1:] |= S[1:] != S[:-1]
+    block_end = np.ones((n, k), dtype=bool)
+    block_end[:-1] = block_start[1:]
+    start = np.maximum.accumulate(np.where(block_start, pos, 0), axis=0)
+    end = np.minimum.accumulate(np.where(block_end, pos, n - 1)[::-1], axis=0)[::-1]
+    first = np.maximum.accumulate(np.where(group_start, pos, 0), axis=0)
+    avg_rank = (start + end) / 2 - first + 1
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pct = avg_rank / counts[G, np.arange(k)]
+
+    ranks = np.empty((n, k))
+    np.put_along_axis(ranks, order, pct, axis=0)
+    ranks[np.isnan(X)] = np.nan
+    if all_missing.any():
+        ranks[all_missing[g]] = 0.5
+    return ranks[:, 0] if vector else ranks
+
+
+def top_by_market_cap(cap: pd.DataFrame, n: int = UNIVERSE_SIZE_PER_MARKET) -> pd.DataFrame:
+    """시가총액 상위 n 종목 (get_universe / universe_index 가 같은 규칙을 쓰도록 한 곳에 둔다)."""
+    return cap.sort_values("시가총액", ascending=False).head(n)
+
+
+@stage("universe")
+def get_universe(as_of: str, names: bool = True) -> pd.DataFrame:
+    """코스피/코스닥 시가총액 상위 종목. names=False 면 종목명 조회(names 단계)를 건너뛴다."""
+    caps = run_concurrently(
+        lambda: fetch_market_cap(as_of, market="KOSPI"),
+        lambda: fetch_market_cap(as_of, market="KOSDAQ"),
+    )
+
+    # ticker_meta / universe_index 가 data_loader 의 fetch 함수를 쓰므로 순환 import 를 피하려고 여기서 import
+    from ticker_meta import get_ticker_meta
+    from universe_index import get_universe_index
+
+    # 유니버스 인덱스에 있는 날짜면 다시 정렬하지 않고 저장된 구성 종목(시가총액 순)을 그대로 꺼낸다.
+    members = get_universe_index().members(as_of) if UNIVERSE_INDEX_ENABLED else None
+
+    frames = []
+    for market, cap in zip(["KOSPI", "KOSDAQ"], caps):
+        pos = cap.index.get_indexer(members.index[members["시장"] == market]) if members is not None else None
+        if pos is not None and (pos >= 0).all():
+            top = cap.iloc[pos]
+        else:
+            top = top_by_market_cap(cap)
+        top["시장"] = market
+        frames.append(top)
+
+    universe = pd.concat(frames, axis=0)
     universe.index.name = "티커"
 
-    names = {ticker: stock.get_market_ticker_name(ticker)
-             for ticker in universe.index}
-    universe["종목명"] = pd.Series(names)
+    if names:
+        with stage("names"):
+            universe["종목명"] = get_ticker_meta().names_for(universe.index, as_of)
 
     return universe
 
 
+@stage("fundamentals")
 def get_fundamentals(as_of: str) -> pd.DataFrame:
-    kospi_fund = stock.get_market_fundamental(as_of, market="KOSPI")
-    kosdaq_fund = stock.get_market_fundamental(as_of, market="KOSDAQ")
+    kospi_fund, kosdaq_fund = run_concurrently(
+        lambda: fetch_market_fundamental(as_of, market="KOSPI"),
+        lambda: fetch_market_fundamental(as_of, market="KOSDAQ"),
+    )
 
     kospi_fund["시장"] = "KOSPI"
     kosdaq_fund["시장"] = "KOSDAQ"
@@ -111,23 +560,47 @@ def get_fundamentals(as_of: str) -> pd.DataFrame:
     return fund
 
 
-def get_price_change_pct(start: str, end: str, market: str) -> pd.Series:
-    df = stock.get_market_price_change(start, end, market=market)
+@stage("price_snapshot")
+def get_price_snapshot(as_of: str) -> pd.DataFrame:
+    """as_of 코스피/코스닥 전종목 시가총액 스냅샷(종가/시가총액/거래량/거래대금/상장주식수)을 캐시 없이 새로 받는다.
+    장중 증분 갱신(factor_model.refresh_factor_table)용. 받은 스냅샷은 캐시에도 덮어써 가격 패널과 값을 맞춘다.
+    """
+    kospi_cap, kosdaq_cap = run_concurrently(
+        lambda: fetch_market_cap(as_of, market="KOSPI", refresh=True),
+        lambda: fetch_market_cap(as_of, market="KOSDAQ", refresh=True),
+    )
+    snap = pd.concat([kospi_cap, kosdaq_cap], axis=0)
+    snap = snap[~snap.index.duplicated(keep="first")]
+    snap.index.name = "티커"
+    return snap
+
+
+def get_price_change_pct(start: str, end: str, market: str, refresh: bool = False) -> pd.Series:
+    df = fetch_market_price_change(start, end, market=market, refresh=refresh)
     return df["등락률"]
 
 
+@stage("momentum")
 def get_momentum(as_of: str,
                  months_3: int = MONTHS_3,
-                 months_12: int = MONTHS_12) -> pd.DataFrame:
+                 months_12: int = MONTHS_12,
+                 refresh: bool = False) -> pd.DataFrame:
     as_of_dt = datetime.strptime(as_of, "%Y%m%d")
 
     start_3m = to_yyyymmdd(as_of_dt - timedelta(days=30 * months_3))
     start_12m = to_yyyymmdd(as_of_dt - timedelta(days=30 * months_12))
 
+    markets = ["KOSPI", "KOSDAQ"]
+    # 시장 × 기간 4개 요청을 한 번에 보낸다.
+    changes = run_concurrently(*[
+        (lambda m=market, start=start: get_price_change_pct(start, as_of, market=m, refresh=refresh))
+        for market in markets
+        for start in (start_3m, start_12m)
+    ])
+
     mom_frames = []
-    for market in ["KOSPI", "KOSDAQ"]:
-        mom3 = get_price_change_pct(start_3m, as_of, market=market)
-        mom12 = get_price_change_pct(start_12m, as_of, market=market)
+    for i, market in enumerate(markets):
+        mom3, mom12 = changes[2 * i], changes[2 * i + 1]
         df = pd.DataFrame({"mom_3m": mom3, "mom_12m": mom12})
         df["시장"] = market
         mom_frames.append(df)
@@ -138,5 +611,5 @@ def get_momentum(as_of: str,
 
 
 def get_ohlcv(ticker: str, start: str, end: str) -> pd.DataFrame:
-    df = stock.get_market_ohlcv_by_date(start, end, ticker)
+    df = fetch_ohlcv_by_date(start, end, ticker)
     return df
@@ -1,6 +1,9 @@
 
 # factor_model.py
 
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
 import numpy as np
 import pandas as pd
 
@@ -9,81 +12,226 @@ from quant_config import (
     WEIGHT_QUALITY,
     WEIGHT_MOMENTUM,
     WEIGHT_LOW_RISK,
+    MOMENTUM_SOURCE,
+    MOMENTUM_LOOKBACKS,
+    KRX_FETCH_WORKERS,
 )
 from data_loader import (
     get_universe,
     get_fundamentals,
     get_momentum,
-    percentile_rank,
+    get_price_snapshot,
+    rank_matrix,
 )
+from momentum import get_panel_momentum, refresh_day
+from instrumentation import bind_stage, stage
+
+
+# 값이 낮을수록 좋은 팩터 (PER, PBR)
+RANK_LOWER_IS_BETTER = ("PER", "PBR")
+
+RANK_INPUTS = ("PER", "PBR", "DIV", "ROE", "MOM3", "MOM12", "SIZE", "LIQ")
+# 장중에 값이 바뀌는 팩터 / 시가총액 스냅샷 컬럼 (refresh_factor_table 에서 이것만 다시 계산)
+PRICE_RANK_INPUTS = ("MOM3", "MOM12", "SIZE", "LIQ")
+PRICE_COLUMNS = ["종가", "시가총액", "거래량", "거래대금", "상장주식수"]
+
+# ---------------------------------------------------------------------------
+# 팩터 테이블 컬럼 의존 그래프
+# - 점수 -> 순위 입력(또는 다른 점수), 순위 입력 -> 원천 컬럼, 원천 컬럼 -> 수집 단계
+# - build_factor_table(as_of, columns=[...]) 는 요청 컬럼에서 거슬러 올라가 필요한 수집/계산만 한다.
+# - 유니버스(시가총액 스냅샷)는 행 집합이라 항상 받는다. 그래프에 없는 컬럼을 요청하면 전체를 만든다.
+# ---------------------------------------------------------------------------
+SCORE_INPUTS: dict[str, tuple[str, ...]] = {
+    "value_score": ("PER", "PBR", "DIV"),
+    "quality_score": ("ROE", "DIV"),
+    "momentum_score": ("MOM3", "MOM12"),
+    "risk_score": ("SIZE", "LIQ"),
+    "total_score": ("value_score", "quality_score", "momentum_score", "risk_score"),
+}
+PRICE_SCORES = ("momentum_score", "risk_score", "total_score")
+
+RANK_INPUT_COLUMNS: dict[str, tuple[str, ...]] = {
+    "PER": ("PER",),
+    "PBR": ("PBR",),
+    "DIV": ("DIV",),
+    "ROE": ("EPS", "BPS"),
+    "MOM3": ("mom_3m",),
+    "MOM12": ("mom_12m",),
+    "SIZE": ("시가총액",),
+    "LIQ": ("거래대금",),
+}
+
+UNIVERSE_COLUMNS = ("시장", *PRICE_COLUMNS)
+# 모멘텀 단계가 만드는 컬럼 (MOMENTUM_LOOKBACKS 의 추가 기간은 panel 방식에서만 계산)
+MOMENTUM_COLUMNS = ("mom_3m", "mom_12m", *MOMENTUM_LOOKBACKS) if MOMENTUM_SOURCE == "panel" else ("mom_3m", "mom_12m")
+COLUMN_SOURCES: dict[str, str] = {
+    "종목명": "names",
+    **{col: "fundamentals" for col in ("BPS", "PER", "PBR", "EPS", "DIV", "DPS")},
+    **{col: "momentum" for col in MOMENTUM_COLUMNS},
+}
+ALL_SOURCES = frozenset({"names", "fundamentals", "momentum"})
+
+
+class FactorPlan(NamedTuple):
+    """요청 컬럼을 만들기 위해 필요한 수집 단계 / 순위 입력 / 점수 (계산 순서대로)."""
+    sources: frozenset
+    rank_inputs: tuple[str, ...]
+    scores: tuple[str, ...]
+
+
+def plan_factor_table(columns=None) -> FactorPlan:
+    """요청 컬럼 -> FactorPlan. columns 가 None 이면 전체 테이블."""
+    if columns is None:
+        return FactorPlan(ALL_SOURCES, RANK_INPUTS, tuple(SCORE_INPUTS))
+
+    scores, inputs, sources = set(), set(), set()
+
+    def need_score(name: str):
+        if name in scores:
+            return
+        scores.add(name)
+        for dep in SCORE_INPUTS[name]:
+            if dep in SCORE_INPUTS:
+                need_score(dep)
+            else:
+                inputs.add(dep)
+
+    def need_column(col: str):
+        if col in COLUMN_SOURCES:
+            sources.add(COLUMN_SOURCES[col])
+        elif col not in UNIVERSE_COLUMNS:
+            # 그래프에 없는 컬럼(수집 결과에만 있는 컬럼 등)은 어느 단계에서 오는지 모르므로 전부 받는다.
+            sources.update(ALL_SOURCES)
+
+    for col in columns:
+        if col in SCORE_INPUTS:
+            need_score(col)
+        else:
+            need_column(col)
+    for name in inputs:
+        for col in RANK_INPUT_COLUMNS[name]:
+            need_column(col)
+    return FactorPlan(
+        frozenset(sources),
+        tuple(name for name in RANK_INPUTS if name in inputs),
+        tuple(name for name in SCORE_INPUTS if name in scores),
+    )
 
 
-def build_factor_table(as_of: str) -> pd.DataFrame:
+def _fetch_inputs(as_of: str, sources=ALL_SOURCES) -> tuple[pd.DataFrame, pd.DataFrame | None, pd.DataFrame | None]:
+    """유니버스 / 펀더멘털 / 모멘텀을 동시에 수집한다. sources 에 없는 단계는 건너뛰고 None.
+    (각 함수 안의 코스피·코스닥 요청은 data_loader 의 공용 조회 풀에서 다시 동시에 나간다)
+    KRX_FETCH_WORKERS 가 1 이면 세 단계도 순서대로 실행한다.
+    모멘텀은 MOMENTUM_SOURCE 에 따라 로컬 가격 패널(panel) 또는 KRX 기간 등락률(krx)로 계산한다.
+    """
+    momentum_fn = get_panel_momentum if MOMENTUM_SOURCE == "panel" else get_momentum
+    with ThreadPoolExecutor(max_workers=3 if KRX_FETCH_WORKERS > 1 else 1, thread_name_prefix="factor-input") as pool:
+        universe = pool.submit(bind_stage(get_universe), as_of, names="names" in sources)
+        fund = pool.submit(bind_stage(get_fundamentals), as_of) if "fundamentals" in sources else None
+        mom = pool.submit(bind_stage(momentum_fn), as_of) if "momentum" in sources else None
+        return (universe.result(),
+                fund.result() if fund is not None else None,
+                mom.result() if mom is not None else None)
+
+
+@stage("build_factor_table")
+def build_factor_table(as_of: str, columns=None) -> pd.DataFrame:
+    """기준일 팩터 테이블. columns 를 주면 그 컬럼에 필요한 수집/순위/점수만 계산한다.
+    (유니버스 컬럼은 항상 포함, 나머지 컬럼은 전체 테이블과 값이 같다)
+    """
+    plan = plan_factor_table(columns)
     print(f"[INFO] 기준일 {as_of} 데이터 수집 중...")
 
-    universe = get_universe(as_of)
-    fund = get_fundamentals(as_of)
-    mom = get_momentum(as_of)
+    df, fund, mom = _fetch_inputs(as_of, plan.sources)
 
-    df = universe.join(fund, how="left", rsuffix="_fund")
+    if fund is not None:
+        df = df.join(fund, how="left", rsuffix="_fund")
 
-    mom_to_join = mom.drop(columns=["시장"], errors="ignore")
-    df = df.join(mom_to_join, how="left")
+    if mom is not None:
+        mom_to_join = mom.drop(columns=["시장"], errors="ignore")
+        df = df.join(mom_to_join, how="left")
 
     if "시장_fund" in df.columns:
         df = df.drop(columns=["시장_fund"])
 
-    per = df["PER"].copy()
-    per_clean = per.replace({0: np.nan})
-    per_rank = percentile_rank(per_clean, higher_is_better=False)
-
-    pbr = df["PBR"].copy()
-    pbr_clean = pbr.replace({0: np.nan})
-    pbr_rank = percentile_rank(pbr_clean, higher_is_better=False)
-
-    div = df["DIV"].copy()
-    div_rank = percentile_rank(div, higher_is_better=True)
-
-    value_score = (0.5 * per_rank + 0.3 * pbr_rank + 0.2 * div_rank) * 100
-
-    eps = df["EPS"].copy()
-    bps = df["BPS"].replace({0: np.nan})
-    roe_proxy = eps / bps
-    roe_rank = percentile_rank(roe_proxy, higher_is_better=True)
+    # 순위를 매길 팩터를 (종목 수 × 팩터 수) 행렬 하나로 모아 rank_matrix 한 번으로 백분위 순위를 구한다.
+    if plan.rank_inputs:
+        _set_scores(df, _rank_inputs(df, plan.rank_inputs), plan.scores)
 
-    quality_score = (0.7 * roe_rank + 0.3 * div_rank) * 100
+    return df
 
-    mom3 = df["mom_3m"]
-    mom12 = df["mom_12m"]
 
-    mom3_rank = percentile_rank(mom3, higher_is_better=True)
-    mom12_rank = percentile_rank(mom12, higher_is_better=True)
+def _rank_inputs(df: pd.DataFrame, names) -> dict[str, np.ndarray]:
+    """팩터 이름 -> 백분위 순위 배열. 요청한 팩터만 한 행렬로 모아 rank_matrix 한 번으로 계산한다."""
+    bps = df["BPS"].replace({0: np.nan}) if "ROE" in names else None
+    inputs = {
+        "PER": lambda: df["PER"].replace({0: np.nan}),
+        "PBR": lambda: df["PBR"].replace({0: np.nan}),
+        "DIV": lambda: df["DIV"],
+        "ROE": lambda: df["EPS"] / bps,            # ROE 근사치
+        "MOM3": lambda: df["mom_3m"],
+        "MOM12": lambda: df["mom_12m"],
+        "SIZE": lambda: df["시가총액"],
+        "LIQ": lambda: df["거래대금"],
+    }
+    ranks = rank_matrix(
+        np.column_stack([inputs[name]().to_numpy(dtype=float, na_value=np.nan) for name in names]),
+        higher_is_better=[name not in RANK_LOWER_IS_BETTER for name in names],
+    )
+    return dict(zip(names, ranks.T))
+
+
+def _score(df: pd.DataFrame, ranks: dict[str, np.ndarray], name: str) -> np.ndarray:
+    if name == "value_score":
+        return (0.5 * ranks["PER"] + 0.3 * ranks["PBR"] + 0.2 * ranks["DIV"]) * 100
+    if name == "quality_score":
+        return (0.7 * ranks["ROE"] + 0.3 * ranks["DIV"]) * 100
+    if name == "momentum_score":
+        return (0.4 * ranks["MOM3"] + 0.6 * ranks["MOM12"]) * 100
+    if name == "risk_score":
+        risk_proxy = 1 - (0.7 * ranks["SIZE"] + 0.3 * ranks["LIQ"])
+        risk_proxy = np.clip(risk_proxy, 0, 1)
+        return risk_proxy * 100
+    # total_score: 다른 점수는 df 에 이미 있는 값을 쓴다.
+    return (
+        WEIGHT_VALUE * df["value_score"].to_numpy() +
+        WEIGHT_QUALITY * df["quality_score"].to_numpy() +
+        WEIGHT_MOMENTUM * df["momentum_score"].to_numpy() +
+        WEIGHT_LOW_RISK * (100 - df["risk_score"].to_numpy())
+    )
 
-    momentum_score = (0.4 * mom3_rank + 0.6 * mom12_rank) * 100
 
-    marcap = df["시가총액"]
-    trading_value = df["거래대금"]
+def _set_scores(df: pd.DataFrame, ranks: dict[str, np.ndarray], names):
+    """점수들을 SCORE_INPUTS 순서(의존 순서)대로 계산해 df 에 넣는다. 목록에 없는 점수는 df 에 있는 값을 쓴다."""
+    for name in names:
+        df[name] = _score(df, ranks, name)
 
-    size_rank = percentile_rank(marcap, higher_is_better=True)
-    liq_rank = percentile_rank(trading_value, higher_is_better=True)
 
-    risk_proxy = 1 - (0.7 * size_rank + 0.3 * liq_rank)
-    risk_proxy = risk_proxy.clip(0, 1)
-    risk_score = risk_proxy * 100
+@stage("refresh_factor_table")
+def refresh_factor_table(df: pd.DataFrame, as_of: str) -> pd.DataFrame:
+    """장중 증분 갱신: build_factor_table(as_of) 결과(enrich_table 결과도 가능)의 가격 의존 부분만 다시 계산한다.
 
-    total_score = (
-        WEIGHT_VALUE * value_score +
-        WEIGHT_QUALITY * quality_score +
-        WEIGHT_MOMENTUM * momentum_score +
-        WEIGHT_LOW_RISK * (100 - risk_score)
-    )
+    - 시가총액 스냅샷 2회(코스피/코스닥)만 새로 받아 PRICE_COLUMNS 를 바꾸고 모멘텀을 다시 계산
+      (panel 방식은 메모리 패널의 as_of 행만 교체, krx 방식은 기간 등락률 4회 재조회)
+    - 펀더멘털·종목명·유니버스 구성은 그대로 두고, 순위는 PRICE_RANK_INPUTS 만, 점수는 PRICE_SCORES 만 다시 계산
+    - 같은 스냅샷이면 전체를 다시 만든 것과 값이 같다. 단 유니버스(시가총액 상위 종목)와 행 순서는 처음 만들 때 기준으로 유지
+    """
+    snap = get_price_snapshot(as_of)
+    df = df.copy()
+    for col in PRICE_COLUMNS:
+        if col in snap.columns:
+            df[col] = snap[col].reindex(df.index).to_numpy()
 
-    df["value_score"] = value_score
-    df["quality_score"] = quality_score
-    df["momentum_score"] = momentum_score
-    df["risk_score"] = risk_score
-    df["total_score"] = total_score
+    if MOMENTUM_SOURCE == "panel":
+        refresh_day(as_of, snap)
+        mom = get_panel_momentum(as_of)
+    else:
+        mom = get_momentum(as_of, refresh=True)
+    mom = mom.drop(columns=["시장"], errors="ignore").reindex(df.index)
+    for col in mom.columns:
+        df[col] = mom[col].to_numpy()
 
+    _set_scores(df, _rank_inputs(df, PRICE_RANK_INPUTS), PRICE_SCORES)
     return df
 
 
@@ -153,3 +301,83 @@ def make_stock_comment(row: pd.Series) -> str:
             parts.append(f"- 3개월 수익률 {mom3:.1f}%: 단기 움직임 크지 않음")
 
     return "\n".join(parts)
+
+
+def _fmt(values: np.ndarray, spec: str) -> np.ndarray:
+    return np.array([format(v, spec) for v in values], dtype=object)
+
+
+def _col(df: pd.DataFrame, name: str, default=np.nan) -> np.ndarray:
+    if name in df.columns:
+        return df[name].to_numpy()
+    return np.full(len(df), default, dtype=object if isinstance(default, str) else float)
+
+
+def make_stock_comments(df: pd.DataFrame) -> pd.Series:
+    """make_stock_comment 의 일괄 버전. 같은 문구를 DataFrame 전체에 대해 한 번에 만든다."""
+    n = len(df)
+    if n == 0:
+        return pd.Series([], index=df.index, dtype=object)
+
+    name = _col(df, "종목명", "")
+    market = _col(df, "시장", "")
+    per = _col(df, "PER").astype(float)
+    pbr = _col(df, "PBR").astype(float)
+    div = _col(df, "DIV").astype(float)
+    mom3 = _col(df, "mom_3m").astype(float)
+    mom12 = _col(df, "mom_12m").astype(float)
+    marcap = _col(df, "시가총액").astype(float)
+    total = _col(df, "total_score").astype(float)
+    ticker = df.index.to_numpy()
+
+    lines = np.full((n, 7), None, dtype=object)
+
+    with np.errstate(invalid="ignore"):
+        lines[:, 0] = ("[" + _fmt(name, "") + "(" + _fmt(ticker, "") + ") / " + _fmt(market, "")
+                       + "] 종합점수 " + _fmt(total, ".1f") + "점")
+
+        cap_txt = "- 시가총액 " + _fmt(marcap / 1e12, ".2f") + "조: "
+        lines[:, 1] = np.where(
+            np.isnan(marcap), None,
+            np.select([marcap >= 5e12, marcap >= 1e12],
+                      [cap_txt + "대형주", cap_txt + "중대형주"],
+                      cap_txt + "중소형주"))
+
+        per_txt = "- PER " + _fmt(per, ".1f") + "배: "
+        lines[:, 2] = np.where(
+            (per > 0) & ~np.isnan(per),
+            np.select([per < 10, per > 30],
+                      [per_txt + "이익 대비 저평가 구간", per_txt + "이익 대비 고평가 구간 가능성"],
+                      per_txt + "적정~보통 밸류에이션"),
+            "- PER 데이터가 없거나 적자 상태")
+
+        pbr_txt = "- PBR " + _fmt(pbr, ".2f") + "배: "
+        lines[:, 3] = np.where(
+            np.isnan(pbr), None,
+            np.select([pbr < 1, pbr > 3],
+                      [pbr_txt + "장부가 대비 저평가(1배 미만)", pbr_txt + "장부가 대비 프리미엄 구간"],
+                      pbr_txt + "보통 수준"))
+
+        div_txt = "- 배당수익률 " + _fmt(div, ".1f") + "%: "
+        lines[:, 4] = np.where(
+            np.isnan(div), None,
+            np.select([div >= 4, div > 0],
+                      [div_txt + "배당 매력 높음", div_txt + "배당 지급 중"],
+                      "- 배당 없음 또는 매우 낮음"))
+
+        mom12_txt = "- 12개월 수익률 " + _fmt(mom12, ".1f") + "%: "
+        lines[:, 5] = np.where(
+            np.isnan(mom12), None,
+            np.select([mom12 > 30, mom12 < -20],
+                      [mom12_txt + "강한 상승 추세", mom12_txt + "뚜렷한 하락 추세"],
+                      mom12_txt + "중립~보통 수준"))
+
+        mom3_txt = "- 3개월 수익률 " + _fmt(mom3, ".1f") + "%: "
+        lines[:, 6] = np.where(
+            np.isnan(mom3), None,
+            np.select([mom3 > 15, mom3 < -10],
+                      [mom3_txt + "단기 모멘텀 양호", mom3_txt + "단기 조정 국면"],
+                      mom3_txt + "단기 움직임 크지 않음"))
+
+    comments = ["\n".join(line for line in row if line is not None) for row in lines]
+    return pd.Series(comments, index=df.index, dtype=object)
@@ -0,0 +1,327 @@
+# instrumentation.py
+# 파이프라인 단계별 계측 (실행 시간 / CPU 시간 / 최대 메모리 / 외부 호출 통계) + 실행별 JSON 기록
+# - start_run() ~ finish_run() 사이에서만 기록하고, 그 밖에서는 stage()/track_call() 이 아무 일도 하지 않는다.
+# - stage(name) 은 중첩 가능하며, 같은 부모 아래 같은 이름의 단계는 하나로 합쳐 횟수와 합계를 쌓는다.
+# - 외부 호출(pykrx / Supabase)은 호출한 쪽의 현재 단계에 엔드포인트별 횟수·바이트·지연시간으로 쌓인다.
+#   스레드 풀로 넘기는 함수는 bind_stage() 로 감싸면 넘긴 쪽 단계로 기록된다.
+# - 메모리는 기본적으로 프로세스 RSS 최고치(getrusage, 거의 비용 없음)를 쓰고,
+#   TRACE_PYTHON_MEMORY = True 면 tracemalloc 으로 단계별 Python 메모리 최대치도 잰다 (느려짐).
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from quant_config import INSTRUMENTATION_ENABLED, TRACE_DIR, TRACE_PYTHON_MEMORY
+
+
+def _max_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 는 KB, macOS 는 바이트 단위
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+class _Stage:
+    """같은 부모 아래 같은 이름으로 실행된 단계들의 누적 기록."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.wall_sec = 0.0
+        self.cpu_sec = 0.0
+        self.max_rss_mb = None
+        self.rss_growth_mb = None
+        self.py_peak_mb = None
+        self.calls: dict[str, dict] = {}
+        self.children: dict[str, "_Stage"] = {}
+
+    def child(self, name: str) -> "_Stage":
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = _Stage(name)
+        return node
+
+    def to_dict(self) -> dict:
+        out = {
+            "name": self.name,
+            "count": self.count,
+            "wall_sec": round(self.wall_sec, 4),
+            "cpu_sec": round(self.cpu_sec, 4),
+            "max_rss_mb": _round(self.max_rss_mb),
+            "rss_growth_mb": _round(self.rss_growth_mb),
+        }
+        if self.py_peak_mb is not None:
+            out["py_peak_mb"] = _round(self.py_peak_mb)
+        if self.calls:
+            out["calls"] = {k: _call_dict(v) for k, v in sorted(self.calls.items())}
+        if self.children:
+            out["stages"] = [c.to_dict() for c in self.children.values()]
+        return out
+
+
+def _round(v):
+    return None if v is None else round(v, 2)
+
+
+def _call_dict(stats: dict) -> dict:
+    out = dict(stats)
+    out["seconds"] = round(out["seconds"], 4)
+    out["max_seconds"] = round(out["max_seconds"], 4)
+    return out
+
+
+def _max(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+
+class _Run:
+    def __init__(self, name: str, meta: dict):
+        self.name = name
+        self.meta = dict(meta)
+        self.started = datetime.now()
+        self.root = _Stage(name)
+        self.t0 = time.perf_counter()
+        self.cpu0 = time.process_time()
+        self.rss0 = _max_rss_mb()
+        self.active_peaks: list[list[float]] = []   # tracemalloc 사용 시 진행 중인 단계들의 최대치
+
+
+_lock = threading.Lock()
+_run: _Run | None = None
+_current: ContextVar[_Stage | None] = ContextVar("kqp_stage", default=None)
+
+
+def is_active() -> bool:
+    return _run is not None
+
+
+# ---------------------------------------------------------------------------
+# 실행 단위
+# ---------------------------------------------------------------------------
+
+def start_run(name: str, **meta):
+    """계측 시작. INSTRUMENTATION_ENABLED 가 False 면 아무것도 기록하지 않는다."""
+    global _run
+    if not INSTRUMENTATION_ENABLED:
+        return
+    _run = _Run(name, meta)
+    _current.set(_run.root)
+    if TRACE_PYTHON_MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def annotate(**meta):
+    """실행 기록의 meta 에 값을 추가한다. (예: 기준일)"""
+    if _run is not None:
+        _run.meta.update(meta)
+
+
+def finish_run(path: str | Path | None = None) -> Path | None:
+    """계측을 끝내고 JSON 기록을 저장한다. 저장한 경로를 돌려준다."""
+    global _run
+    run = _run
+    if run is None:
+        return None
+    _run = None
+    _current.set(None)
+
+    root = run.root
+    root.count = 1
+    root.wall_sec = time.perf_counter() - run.t0
+    root.cpu_sec = time.process_time() - run.cpu0
+    root.max_rss_mb = _max_rss_mb()
+    if root.max_rss_mb is not None and run.rss0 is not None:
+        root.rss_growth_mb = root.max_rss_mb - run.rss0
+    if tracemalloc.is_tracing():
+        root.py_peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+    trace = {
+        "run": run.name,
+        "started": run.started.isoformat(timespec="seconds"),
+        "pid": os.getpid(),
+        "meta": run.meta,
+        "endpoints": _endpoint_totals(root),
+        "stages": root.to_dict(),
+    }
+
+    if path is None:
+        path = Path(TRACE_DIR) / f"trace_{run.name}_{run.started:%Y%m%d%H%M%S}.json"
+    path = Path(path)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace, f, ensure_ascii=False, indent=2, default=str)
+    except Exception as e:
+        print(f"[WARN] 실행 기록 저장 실패: {e}")
+        return None
+
+    parts = [f"{c.name} {c.wall_sec:.1f}s" for c in root.children.values()]
+    print(f"[INFO] 실행 기록: {path} (총 {root.wall_sec:.1f}s / " + ", ".join(parts) + ")")
+    return path
+
+
+def _endpoint_totals(root: _Stage) -> dict:
+    totals: dict[str, dict] = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        for endpoint, stats in node.calls.items():
+            total = totals.setdefault(endpoint, _new_call_stats())
+            for key in ("count", "errors", "cache_hits", "bytes", "seconds"):
+                total[key] += stats[key]
+            total["max_seconds"] = max(total["max_seconds"], stats["max_seconds"])
+        stack.extend(node.children.values())
+    return {k: _call_dict(v) for k, v in sorted(totals.items())}
+
+
+# ---------------------------------------------------------------------------
+# 단계
+# ---------------------------------------------------------------------------
+
+def _fold_python_peak(run: _Run):
+    """진행 중인 모든 단계에 지금까지의 tracemalloc 최대치를 반영하고 최대치를 초기화한다."""
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    for slot in run.active_peaks:
+        slot[0] = max(slot[0], peak)
+    tracemalloc.reset_peak()
+
+
+@contextmanager
+def stage(name: str):
+    """with stage("momentum"): ...  (데코레이터로도 사용 가능)"""
+    run = _run
+    if run is None:
+        yield
+        return
+
+    parent = _current.get() or run.root
+    with _lock:
+        node = parent.child(name)
+    token = _current.set(node)
+
+    tracing = tracemalloc.is_tracing()
+    peak_slot = [0.0]
+    if tracing:
+        with _lock:
+            _fold_python_peak(run)
+            run.active_peaks.append(peak_slot)
+    rss0 = _max_rss_mb()
+    t0 = time.perf_counter()
+    cpu0 = time.process_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - t0
+        cpu = time.process_time() - cpu0
+        rss1 = _max_rss_mb()
+        _current.reset(token)
+        with _lock:
+            if tracing and tracemalloc.is_tracing():
+                _fold_python_peak(run)
+                run.active_peaks.remove(peak_slot)
+                node.py_peak_mb = _max(node.py_peak_mb, peak_slot[0])
+            node.count += 1
+            node.wall_sec += wall
+            node.cpu_sec += cpu
+            node.max_rss_mb = _max(node.max_rss_mb, rss1)
+            if rss0 is not None and rss1 is not None:
+                node.rss_growth_mb = _max(node.rss_growth_mb, rss1 - rss0)
+
+
+def bind_stage(fn):
+    """다른 스레드에서 실행될 함수를 지금 단계에 묶는다. (그 안의 외부 호출/하위 단계가 이 단계 아래로 기록됨)"""
+    if _run is None:
+        return fn
+    parent = _current.get()
+
+    def run(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return run
+
+
+# ---------------------------------------------------------------------------
+# 외부 호출
+# ---------------------------------------------------------------------------
+
+def _new_call_stats() -> dict:
+    return {"count": 0, "errors": 0, "cache_hits": 0, "bytes": 0, "seconds": 0.0, "max_seconds": 0.0}
+
+
+def record_call(endpoint: str, seconds: float = 0.0, nbytes: int = 0,
+                ok: bool = True, cache_hit: bool = False):
+    """엔드포인트 호출 1회를 현재 단계에 기록한다. (cache_hit 이면 네트워크 없이 로컬 캐시에서 읽은 것)"""
+    run = _run
+    if run is None:
+        return
+    node = _current.get() or run.root
+    with _lock:
+        stats = node.calls.get(endpoint)
+        if stats is None:
+            stats = node.calls[endpoint] = _new_call_stats()
+        stats["count"] += 1
+        stats["errors"] += 0 if ok else 1
+        stats["cache_hits"] += 1 if cache_hit else 0
+        stats["bytes"] += int(nbytes)
+        stats["seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+
+class _Call:
+    __slots__ = ("bytes",)
+
+    def __init__(self):
+        self.bytes = 0
+
+
+@contextmanager
+def track_call(endpoint: str):
+    """with track_call("supabase.upsert") as call: ...; call.bytes = 보낸/받은 바이트 수"""
+    call = _Call()
+    if _run is None:
+        yield call
+        return
+    ok = False
+    t0 = time.perf_counter()
+    try:
+        yield call
+        ok = True
+    finally:
+        record_call(endpoint, time.perf_counter() - t0, call.bytes, ok=ok)
+
+
+def frame_nbytes(df) -> int:
+    """DataFrame 메모리 크기 (문자열 내용은 세지 않는 얕은 측정이라 비용이 거의 없다)."""
+    try:
+        return int(df.memory_usage(index=True, deep=False).sum())
+    except Exception:
+        return 0
+
+
+def json_nbytes(data) -> int:
+    try:
+        return len(json.dumps(data, default=str))
+    except Exception:
+        return 0
@@ -0,0 +1,95 @@
+# momentum.py
+# 로컬 가격 패널 기반 모멘텀 엔진
+# - price_panel 의 수정종가 패널 하나로 여러 기간 모멘텀을 한 번에 계산한다.
+# - 기간은 trading_calendar 기준 정확한 거래일 수 (21 = 1개월, 252 = 12개월),
+#   "12-1" 처럼 최근 구간을 건너뛰는 모멘텀도 (시작, 제외) 쌍으로 지정한다.
+# - 패널은 거래일별 스냅샷 캐시로 만들므로, 기간을 늘려도 추가 네트워크 호출이 없다.
+
+import numpy as np
+import pandas as pd
+
+from quant_config import MOMENTUM_LOOKBACKS
+from instrumentation import stage
+from price_panel import PricePanel, load_price_panel
+from trading_calendar import get_calendar
+
+
+_panel: PricePanel | None = None
+_panel_range: tuple[str, str] | None = None
+
+
+def use_panel(panel: PricePanel, start: str, end: str):
+    """이미 만든 패널(start ~ end)을 모멘텀 계산에 재사용하도록 등록한다. (백테스트용)"""
+    global _panel, _panel_range
+    _panel = panel
+    _panel_range = (start, end)
+
+
+def _panel_for(start: str, end: str) -> PricePanel:
+    """start ~ end 를 덮는 패널. 등록된 패널이 덮지 못하면 그 패널은 버리고 start ~ end 만으로 새로 만든다.
+    (구간을 합쳐 키우지 않으므로 메모리의 패널은 최장 모멘텀 기간 또는 등록한 백테스트 구간을 넘지 않는다)
+    """
+    global _panel, _panel_range
+    if _panel is not None and _panel_range[0] <= start and end <= _panel_range[1]:
+        return _panel
+    _panel = _panel_range = None  # 새 패널을 읽는 동안 이전 패널을 같이 들고 있지 않도록 먼저 놓는다.
+    use_panel(load_price_panel(start, end), start, end)
+    return _panel
+
+
+def refresh_day(date: str, snapshot: pd.DataFrame) -> bool:
+    """등록된 패널에 date 가 있으면 그 행을 새 스냅샷으로 바꾼다. (장중 갱신용)
+
+    패널이 없으면 다음 계산 때 캐시(get_price_snapshot 이 덮어쓴 스냅샷)로 새로 만들어지므로 할 일이 없다.
+    """
+    if _panel is None:
+        return False
+    return _panel.replace_day(date, snapshot)
+
+
+def momentum_from_panel(panel: PricePanel, as_of: str,
+                        lookbacks: dict[str, tuple[int, int]] = MOMENTUM_LOOKBACKS) -> pd.DataFrame:
+    """as_of 기준 기간별 수익률(%) 테이블 (index=티커, columns=lookbacks 키).
+
+    기준일은 패널에서 as_of 당일 또는 그 이전의 마지막 날이고,
+    (n, skip) 기간 수익률 = skip 거래일 전 수정종가 / n 거래일 전 수정종가 - 1.
+    해당 날짜에 가격이 없는 종목(미상장/거래정지)은 NaN.
+    """
+    names = list(lookbacks)
+    end_row = int(np.searchsorted(panel.dates, as_of, side="right")) - 1
+    if end_row < 0 or not names:
+        return pd.DataFrame(index=pd.Index([], name="티커"), columns=names, dtype=float)
+
+    cal = get_calendar()
+    base = panel.dates[end_row]
+    row_of = {d: i for i, d in enumerate(panel.dates)}
+
+    def row(n):
+        d = cal.offset(base, -n) if n else base
+        return row_of.get(d, -1)
+
+    start_rows = np.array([row(n) for n, _ in lookbacks.values()])
+    end_rows = np.array([row(skip) for _, skip in lookbacks.values()])
+
+    adj = panel.adjusted_close()
+    # (기간 수 × 종목 수) 배열 한 번으로 계산, 패널에 없는 날짜는 NaN
+    start_px = np.where((start_rows >= 0)[:, None], adj[np.maximum(start_rows, 0)], np.nan)
+    end_px = np.where((end_rows >= 0)[:, None], adj[np.maximum(end_rows, 0)], np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rets = np.where(start_px > 0, (end_px / start_px - 1.0) * 100, np.nan)
+
+    mom = pd.DataFrame(np.round(rets, 2).T, index=pd.Index(panel.tickers, name="티커"), columns=names)
+    # 기준일에 거래되지 않은 종목은 뺀다.
+    return mom[~np.isnan(adj[end_row])]
+
+
+@stage("momentum")
+def get_panel_momentum(as_of: str,
+                       lookbacks: dict[str, tuple[int, int]] = MOMENTUM_LOOKBACKS) -> pd.DataFrame:
+    """data_loader.get_momentum 의 패널 버전 (mom_3m / mom_12m 외 설정된 모든 기간 포함)."""
+    cal = get_calendar()
+    base = cal.on_or_before(as_of)
+    longest = max(n for n, _ in lookbacks.values())
+    start = cal.offset(base, -longest) or base
+    panel = _panel_for(start, base)
+    return momentum_from_panel(panel, as_of, lookbacks)
@@ -0,0 +1,324 @@
+# panel_store.py
+# 과거 시장 패널 저장소 (메모리 맵 numpy 배열, 일자 × 종목)
+# - 필드마다 고정 레이아웃 .npy 파일 하나 (종가 / 거래량 / 거래대금 / 시가총액 / 상장주식수 / PER / PBR / DIV / EPS / BPS / 시장)
+#   + 날짜·티커 목록 index.json 을 CACHE_DIR/PANEL_STORE_DIR 에 둔다.
+# - 하루 한 번 update() 로 마지막 저장일 다음 거래일부터 새 거래일 행만 덧붙인다.
+#   (시가총액·펀더멘털 스냅샷은 data_loader 캐시를 그대로 쓰므로 이미 받아둔 날짜는 파일만 읽는다)
+# - 읽을 때는 np.load(mmap_mode="r") 로 열어 복사 없이 슬라이스만 넘긴다.
+#   price_panel.load_price_panel 이 저장소가 덮는 구간이면 여기서 바로 패널을 만들므로,
+#   백테스트와 병렬 워커가 스냅샷 수천 개를 다시 읽고 합치지 않고 바로 시작한다.
+# - 갱신은 한 프로세스에서만 한다. (읽기는 여러 프로세스가 동시에 해도 됨)
+#
+# 실행: python panel_store.py [--start 20170101] [--end 20240628]
+
+import argparse
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from quant_config import CACHE_DIR, PANEL_STORE_DIR, PANEL_STORE_START, PANEL_STORE_CLOSE_HHMM
+from data_loader import fetch_market_cap, fetch_market_fundamental, run_concurrently, to_yyyymmdd
+from price_panel import PANEL_MARKETS, PricePanel
+from trading_calendar import get_calendar
+
+
+INDEX_FILE = "index.json"
+STORE_VERSION = 2              # 2: 펀더멘털 필드를 float32 로 저장
+
+# 저장 필드명 -> 스냅샷 컬럼명 (PricePanel 필드명 close / volume / shares 와 같은 이름을 쓴다)
+STORE_FIELDS = {
+    "close": "종가",
+    "volume": "거래량",
+    "value": "거래대금",
+    "marcap": "시가총액",
+    "shares": "상장주식수",
+    "PER": "PER",
+    "PBR": "PBR",
+    "DIV": "DIV",
+    "EPS": "EPS",
+    "BPS": "BPS",
+}
+# float32 로 저장하는 필드 (펀더멘털은 패널 계산에 쓰지 않고 cross_section 조회용이라 정밀도보다 크기가 중요)
+# 종가 / 거래량 / 거래대금 / 시가총액 / 상장주식수는 백테스트 결과가 바뀌지 않도록 float64 로 둔다.
+FLOAT32_FIELDS = ("PER", "PBR", "DIV", "EPS", "BPS")
+# 시장 필드 (int8): 0 = 해당 날짜 스냅샷에 없음
+MARKET_FIELD = "market"
+MARKET_CODES = {market: i + 1 for i, market in enumerate(PANEL_MARKETS)}
+
+MIN_DATE_CAPACITY = 512
+MIN_TICKER_CAPACITY = 4096
+APPEND_BATCH_DAYS = 64          # 한 번에 동시에 받을 거래일 수 (받은 뒤 인덱스 저장)
+
+
+def _field_dtype(name: str):
+    if name == MARKET_FIELD:
+        return np.int8
+    return np.float32 if name in FLOAT32_FIELDS else np.float64
+
+
+def _fill_value(name: str):
+    return 0 if name == MARKET_FIELD else np.nan
+
+
+class PanelStore:
+    """dates × tickers 고정 레이아웃 메모리 맵 배열 묶음.
+
+    배열 파일은 (날짜 용량 × 티커 용량) 크기로 미리 잡아 두고 앞쪽 len(dates) × len(tickers) 만 유효하다.
+    티커 열 순서는 처음 본 순서이며 한 번 붙은 열 번호는 바뀌지 않는다. 용량이 모자라면 두 배로 다시 만든다.
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path) if path is not None else Path(CACHE_DIR) / PANEL_STORE_DIR
+        self._lock = threading.Lock()
+        self._maps: dict[str, np.ndarray] = {}
+        self._load_index()
+
+    # ------------------------------------------------------------------
+    # 인덱스 / 파일
+    # ------------------------------------------------------------------
+    def _load_index(self):
+        index = {}
+        index_path = self.path / INDEX_FILE
+        self._index_mtime = index_path.stat().st_mtime if index_path.exists() else None
+        if index_path.exists():
+            try:
+                with open(index_path, encoding="utf-8") as f:
+                    index = json.load(f)
+                if index.get("version") != STORE_VERSION:
+                    print(f"[WARN] 패널 저장소 버전이 달라 새로 만듭니다: {index.get('version')}")
+                    index = {}
+            except Exception as e:
+                print(f"[WARN] 패널 저장소 인덱스를 읽지 못해 새로 만듭니다: {e}")
+                index = {}
+        self.dates = np.asarray(index.get("dates", []), dtype=object)
+        self.tickers = np.asarray(index.get("tickers", []), dtype=object)
+        self.first_rows = np.asarray(index.get("first_rows", []), dtype=np.int64)   # 티커가 처음 나온 행
+        self.capacity = tuple(index.get("capacity", (0, 0)))
+        self._ticker_index = pd.Index(self.tickers)
+        self._maps = {}
+
+    def _save_index(self):
+        index = {
+            "version": STORE_VERSION,
+            "dates": list(self.dates),
+            "tickers": list(self.tickers),
+            "first_rows": self.first_rows.tolist(),
+            "capacity": list(self.capacity),
+            "fields": {name: np.dtype(_field_dtype(name)).str for name in self.field_names},
+        }
+        tmp = self.path / f"{INDEX_FILE}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp, self.path / INDEX_FILE)
+        self._index_mtime = (self.path / INDEX_FILE).stat().st_mtime
+
+    @property
+    def field_names(self) -> list[str]:
+        return list(STORE_FIELDS) + [MARKET_FIELD]
+
+    def _file(self, name: str) -> Path:
+        return self.path / f"{name}.npy"
+
+    def _map(self, name: str, writable: bool = False) -> np.ndarray:
+        key = f"{name}:{'w' if writable else 'r'}"
+        arr = self._maps.get(key)
+        if arr is None:
+            arr = np.load(self._file(name), mmap_mode="r+" if writable else "r")
+            self._maps[key] = arr
+        return arr
+
+    def _allocate(self, date_capacity: int, ticker_capacity: int):
+        """용량을 늘린 배열 파일을 새로 만들고 기존 값을 옮긴다. (열려 있는 읽기 맵은 이전 파일을 계속 본다)"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        for name in self.field_names:
+            tmp = self.path / f"{name}.npy.{os.getpid()}.tmp"
+            arr = np.lib.format.open_memmap(tmp, mode="w+", dtype=_field_dtype(name),
+                                            shape=(date_capacity, ticker_capacity))
+            arr[:] = _fill_value(name)
+            if self._file(name).exists() and all(self.capacity):
+                old = self._map(name)
+                arr[:old.shape[0], :old.shape[1]] = old
+            arr.flush()
+            del arr
+            os.replace(tmp, self._file(name))
+        self._maps = {}
+        self.capacity = (date_capacity, ticker_capacity)
+
+    # ------------------------------------------------------------------
+    # 조회
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def reload_if_changed(self):
+        """다른 프로세스가 update 로 덧붙였으면 인덱스를 다시 읽는다."""
+        index_path = self.path / INDEX_FILE
+        mtime = index_path.stat().st_mtime if index_path.exists() else None
+        if mtime != self._index_mtime:
+            self._load_index()
+
+    def covers(self, start: str, end: str) -> bool:
+        """start ~ end 의 모든 거래일 행이 저장소에 있으면 True. (중간에 빠진 거래일이 있으면 False)"""
+        self.reload_if_changed()
+        if not len(self.dates):
+            return False
+        sessions = get_calendar().sessions_between(start, end)
+        return bool(sessions) and bool(np.isin(sessions, self.dates.astype(str)).all())
+
+    def row_range(self, start: str, end: str) -> tuple[int, int]:
+        r0 = int(np.searchsorted(self.dates, start, side="left"))
+        r1 = int(np.searchsorted(self.dates, end, side="right"))
+        return r0, r1
+
+    def array(self, name: str, start: str | None = None, end: str | None = None) -> np.ndarray:
+        """name 필드의 (날짜 × 티커) 읽기 전용 메모리 맵 뷰 (복사 없음)."""
+        r0, r1 = self.row_range(start or "", end or "99999999")
+        return self._map(name)[r0:r1, :len(self.tickers)]
+
+    def panel(self, start: str, end: str, fields=("close", "volume", "shares")) -> PricePanel:
+        """start ~ end 구간 PricePanel (배열은 메모리 맵 뷰, 복사 없음).
+
+        티커 열은 구간 끝까지 한 번이라도 나온 종목 (열이 처음 본 순서라 앞쪽 연속 구간으로 자를 수 있다).
+        구간 전에 상장폐지된 종목 열은 전부 NaN 으로 남는다.
+        """
+        r0, r1 = self.row_range(start, end)
+        n = int(np.searchsorted(self.first_rows, r1, side="left"))
+        arrays = {name: self._map(name)[r0:r1, :n] for name in fields}
+        return PricePanel(self.dates[r0:r1], self.tickers[:n], arrays)
+
+    def cross_section(self, date: str) -> pd.DataFrame:
+        """한 거래일의 전종목 값 (index=티커, 컬럼=스냅샷 컬럼명 + 시장). 그 날 스냅샷에 없던 종목은 뺀다."""
+        rows = np.flatnonzero(self.dates == date)
+        if not len(rows):
+            raise RuntimeError(f"패널 저장소에 없는 날짜입니다: {date}")
+        n = len(self.tickers)
+        market = self._map(MARKET_FIELD)[rows[0], :n]
+        present = market > 0
+        df = pd.DataFrame({col: self._map(name)[rows[0], :n][present] for name, col in STORE_FIELDS.items()},
+                          index=pd.Index(self.tickers[present], name="티커"))
+        names = np.array([""] + list(PANEL_MARKETS), dtype=object)
+        df["시장"] = names[market[present]]
+        return df
+
+    # ------------------------------------------------------------------
+    # 갱신
+    # ------------------------------------------------------------------
+    def _snapshot(self, ds: str) -> pd.DataFrame | None:
+        """ds 의 코스피/코스닥 시가총액 + 펀더멘털 스냅샷. 아직 유효하지 않은 날(종가 전부 0)은 None, 조회 실패는 예외."""
+        frames = []
+        for market in PANEL_MARKETS:
+            cap = fetch_market_cap(ds, market=market)
+            if cap is None or cap.empty or not (cap["종가"] > 0).any():
+                continue
+            fund = fetch_market_fundamental(ds, market=market)
+            snap = cap.reindex(columns=[c for c in STORE_FIELDS.values() if c in cap.columns])
+            for col in ["PER", "PBR", "DIV", "EPS", "BPS"]:
+                snap[col] = fund[col].reindex(snap.index) if fund is not None and col in fund.columns else np.nan
+            snap[MARKET_FIELD] = MARKET_CODES[market]
+            frames.append(snap)
+        if not frames:
+            return None
+        snap = pd.concat(frames, axis=0)
+        return snap[~snap.index.duplicated(keep="first")]
+
+    def _append(self, ds: str, snap: pd.DataFrame):
+        new = pd.Index(snap.index).difference(self._ticker_index, sort=False)
+        if len(new):
+            self.tickers = np.concatenate([self.tickers, np.asarray(new, dtype=object)])
+            self.first_rows = np.concatenate([self.first_rows, np.full(len(new), len(self.dates), dtype=np.int64)])
+            self._ticker_index = pd.Index(self.tickers)
+
+        need = (len(self.dates) + 1, len(self.tickers))
+        if need[0] > self.capacity[0] or need[1] > self.capacity[1]:
+            self._allocate(*[max(minimum, cap * 2 if n > cap else cap, n)
+                             for n, cap, minimum in zip(need, self.capacity, (MIN_DATE_CAPACITY, MIN_TICKER_CAPACITY))])
+
+        cols = self._ticker_index.get_indexer(snap.index)
+        row = len(self.dates)
+        for name in self.field_names:
+            col = STORE_FIELDS.get(name, name)
+            arr = self._map(name, writable=True)
+            arr[row, :] = _fill_value(name)
+            if col in snap.columns:
+                arr[row, cols] = snap[col].to_numpy(dtype=_field_dtype(name), na_value=_fill_value(name))
+        self.dates = np.append(self.dates, ds).astype(object)
+
+    def _flush(self):
+        for key, arr in self._maps.items():
+            if key.endswith(":w"):
+                arr.flush()
+        self._save_index()
+
+    def update(self, end: str | None = None, start: str = PANEL_STORE_START) -> int:
+        """마지막 저장일 다음 거래일 ~ end 를 덧붙인다. 덧붙인 거래일 수를 돌려준다.
+
+        end 기본값은 마지막으로 장이 끝난 거래일 (오늘은 PANEL_STORE_CLOSE_HHMM 이후에만 포함).
+        저장소가 비어 있으면 start 부터 만든다. 조회에 실패하거나 스냅샷이 아직 비어 있는 날(장 시작 전 등)을 만나면
+        그 날짜 전까지만 저장하고 멈춘다. (행은 뒤에만 덧붙이므로 건너뛰면 다시 채울 수 없다. 다음 update 에서 그 날짜부터 받음)
+        """
+        with self._lock:
+            cal = get_calendar()
+            if end is None:
+                now = datetime.now()
+                today = to_yyyymmdd(now)
+                end = today if now.strftime("%H%M") >= PANEL_STORE_CLOSE_HHMM else to_yyyymmdd(now - timedelta(days=1))
+            begin = start if not len(self.dates) else self.dates[-1]
+            sessions = [ds for ds in cal.sessions_between(begin, end) if not len(self.dates) or ds > self.dates[-1]]
+            if not sessions:
+                return 0
+            print(f"[INFO] 패널 저장소 갱신: {sessions[0]} ~ {sessions[-1]} ({len(sessions)} 거래일)")
+
+            appended = 0
+            for i in range(0, len(sessions), APPEND_BATCH_DAYS):
+                batch = sessions[i:i + APPEND_BATCH_DAYS]
+                results = run_concurrently(*[(lambda ds=ds: self._fetch_or_error(ds)) for ds in batch])
+                for ds, (snap, error) in zip(batch, results):
+                    if error is not None or snap is None:
+                        reason = f"조회 실패: {error}" if error is not None else "스냅샷이 비어 있음"
+                        print(f"[WARN] {ds} {reason} - 이 날짜 전까지만 저장하고 패널 저장소 갱신을 멈춥니다.")
+                        if appended:
+                            self._flush()
+                        return appended
+                    self._append(ds, snap)
+                    appended += 1
+                if appended:
+                    self._flush()
+            return appended
+
+    def _fetch_or_error(self, ds: str):
+        try:
+            return self._snapshot(ds), None
+        except Exception as e:
+            return None, e
+
+
+_store: PanelStore | None = None
+
+
+def get_panel_store() -> PanelStore:
+    global _store
+    if _store is None:
+        _store = PanelStore()
+    return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="과거 시장 패널 저장소 갱신 (하루 한 번 실행)")
+    parser.add_argument("--start", default=PANEL_STORE_START, help="저장소가 비어 있을 때 시작일 (YYYYMMDD)")
+    parser.add_argument("--end", default=None, help="마지막 날짜 (기본: 마지막으로 장이 끝난 거래일)")
+    args = parser.parse_args()
+
+    store = get_panel_store()
+    appended = store.update(end=args.end, start=args.start)
+    if len(store):
+        print(f"[INFO] 패널 저장소: {store.dates[0]} ~ {store.dates[-1]} ({len(store)} 거래일 × {len(store.tickers)} 종목), "
+              f"{appended} 거래일 추가")
+
+
+if __name__ == "__main__":
+    main()
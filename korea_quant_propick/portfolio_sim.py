@@ -0,0 +1,373 @@
+# portfolio_sim.py
+# 일별 포트폴리오 시뮬레이터
+# - 일별 수정종가 패널 위에서 리밸런싱 주기(daily / weekly / monthly)마다 목표 비중으로 맞추고,
+#   그 사이에는 종목별 가격 변화에 따라 비중이 흘러가도록(drift) 계산해 일별 자산 곡선을 만든다.
+# - 리밸런싱 때 회전율(매수+매도 비중 합)에 수수료, 매도 비중에 거래세를 적용한다.
+# - 가중 방식: equal(동일비중) / score(total_score 비례) / inverse_vol(최근 변동성 역수)
+# - 날짜·구간 반복 없이 누적 성장률 배열 하나로 계산한다.
+#   (구간 s 안의 t일 가치 = 현금 + Σ 비중 × C[t] / C[리밸런싱일], C = 종목별 누적 (1 + 일수익률))
+# - 리밸런싱 날짜별 total_score 는 점수 캐시(SIM_SCORE_CACHE_DIR)에 모아 두고, 캐시에 없는 날짜만 팩터 테이블을 만든다.
+#   메모리에서는 종목을 ticker_meta int32 코드로 들고 있다. (COMPACT_DTYPES 면 점수도 float32)
+
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from quant_config import (
+    BACKTEST_START_DATE,
+    BACKTEST_END_DATE,
+    BACKTEST_TOP_N,
+    BACKTEST_WORKERS,
+    CACHE_DIR,
+    COMPACT_DTYPES,
+    INITIAL_CAPITAL,
+    MIN_TRADING_VALUE,
+    MOMENTUM_SOURCE,
+    MOMENTUM_LOOKBACKS,
+    SIM_REBALANCE_FREQ,
+    SIM_WEIGHTING,
+    SIM_COMMISSION_RATE,
+    SIM_SELL_TAX_RATE,
+    SIM_VOL_LOOKBACK,
+    SIM_SCORE_CACHE_ENABLED,
+    SIM_SCORE_CACHE_DIR,
+    UNIVERSE_INDEX_ENABLED,
+)
+from data_loader import get_recent_trading_date, make_shared_rate_state
+from factor_model import build_factor_table
+from price_panel import PricePanel, load_price_panel
+from trading_calendar import get_calendar
+from backtest import SELECT_COLUMNS, build_rebalance_dates, _init_worker
+from result_cache import is_final, result_fingerprint
+from compact import decode_tickers, encode_tickers
+from universe_index import get_universe_index
+import momentum
+
+
+REBALANCE_FREQS = ("daily", "weekly", "monthly")
+SCORE_DTYPE = np.float32 if COMPACT_DTYPES else np.float64   # 메모리에 보관하는 날짜별 점수 dtype
+WEIGHTING_SCHEMES = ("equal", "score", "inverse_vol")
+TRADING_DAYS_PER_YEAR = 252
+
+
+class SimResult(NamedTuple):
+    dates: np.ndarray            # 시뮬레이션 거래일 (첫 리밸런싱일 ~ 마지막 날)
+    equity: np.ndarray           # 일별 자산 (리밸런싱일은 비용 차감 후)
+    daily_returns: np.ndarray    # 일별 수익률 (첫날 0)
+    rebalance_dates: np.ndarray
+    turnover: np.ndarray         # 리밸런싱별 회전율 (매수+매도 비중 합, 첫 매수는 1)
+    costs: np.ndarray            # 리밸런싱별 비용 (자산 대비 비율)
+
+
+# ---------------------------------------------------------------------------
+# 리밸런싱 일정
+# ---------------------------------------------------------------------------
+
+def rebalance_schedule(start_date: str, end_date: str, freq: str = SIM_REBALANCE_FREQ) -> list[str]:
+    """daily: 모든 거래일 / weekly: 주별 첫 거래일 / monthly: backtest 와 같은 월별 날짜."""
+    if freq not in REBALANCE_FREQS:
+        raise ValueError(f"지원하지 않는 리밸런싱 주기: {freq}")
+    if freq == "monthly":
+        return build_rebalance_dates(start_date, end_date)
+    sessions = get_calendar().sessions_between(start_date, end_date)
+    if freq == "daily":
+        return sessions
+    weeks = pd.to_datetime(sessions, format="%Y%m%d").to_period("W")
+    first = ~pd.Series(weeks).duplicated().to_numpy()
+    return [d for d, f in zip(sessions, first) if f]
+
+
+# ---------------------------------------------------------------------------
+# 배열 계산
+# ---------------------------------------------------------------------------
+
+def daily_returns(panel: PricePanel) -> np.ndarray:
+    """일별 수익률 (거래일 수 × 종목 수). 거래정지일은 직전 가격을 이어 쓰고, 가격이 없으면 0."""
+    adj = pd.DataFrame(panel.adjusted_close()).ffill().to_numpy()
+    rets = np.zeros_like(adj)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rets[1:] = adj[1:] / adj[:-1] - 1.0
+    return np.where(np.isfinite(rets), rets, 0.0)
+
+
+def trailing_volatility(returns: np.ndarray, rows: np.ndarray, lookback: int = SIM_VOL_LOOKBACK) -> np.ndarray:
+    """각 리밸런싱 행 직전 lookback 거래일 일수익률 표준편차 (리밸런싱 수 × 종목 수)."""
+    # 누적합으로 구간 합/제곱합을 한 번에 구한다.
+    csum = np.vstack([np.zeros(returns.shape[1]), np.cumsum(returns, axis=0)])
+    csq = np.vstack([np.zeros(returns.shape[1]), np.cumsum(returns ** 2, axis=0)])
+    hi = rows + 1
+    lo = np.maximum(hi - lookback, 1)   # 첫 행(수익률 0)은 제외
+    n = (hi - lo)[:, None].astype(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (csum[hi] - csum[lo]) / n
+        var = (csq[hi] - csq[lo]) / n - mean ** 2
+        vol = np.sqrt(np.maximum(var, 0.0) * n / (n - 1))
+    return np.where(n >= 2, vol, np.nan)
+
+
+def target_weights(scores: np.ndarray, top_n: int = BACKTEST_TOP_N, scheme: str = SIM_WEIGHTING,
+                   vol: np.ndarray | None = None) -> np.ndarray:
+    """점수 행렬(리밸런싱 수 × 종목 수, NaN = 편입 불가) -> 목표 비중 행렬.
+    행마다 점수 상위 top_n 종목을 고르고 scheme 에 따라 비중을 나눈다. 고를 종목이 없으면 전부 현금."""
+    if scheme not in WEIGHTING_SCHEMES:
+        raise ValueError(f"지원하지 않는 가중 방식: {scheme}")
+    n_rows, n_cols = scores.shape
+    eligible = np.isfinite(scores)
+    selected = np.zeros_like(eligible)
+    k = min(top_n, n_cols)
+    if k > 0:
+        key = np.where(eligible, -scores, np.inf)
+        top = np.argpartition(key, k - 1, axis=1)[:, :k]
+        np.put_along_axis(selected, top, True, axis=1)
+        selected &= eligible
+
+    if scheme == "score":
+        raw = np.where(selected, np.clip(scores, 0, None), 0.0)
+    elif scheme == "inverse_vol":
+        if vol is None:
+            raise ValueError("inverse_vol 가중에는 vol 이 필요합니다.")
+        with np.errstate(divide="ignore"):
+            inv = np.where(selected & (vol > 0), 1.0 / vol, np.nan)
+        # 변동성을 모르는 종목은 같은 날 편입 종목 평균값으로 채운다.
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)   # 편입 종목이 없는 행 (전부 NaN)
+            fill = np.nanmean(inv, axis=1, keepdims=True)
+        raw = np.where(selected, np.where(np.isnan(inv), fill, inv), 0.0)
+        raw = np.nan_to_num(raw)
+    else:
+        raw = selected.astype(float)
+
+    total = raw.sum(axis=1, keepdims=True)
+    # score / inverse_vol 비중을 만들 수 없는 날은 동일비중으로 대체
+    equal = selected / np.maximum(selected.sum(axis=1, keepdims=True), 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weights = np.where(total > 0, raw / total, equal)
+    return weights
+
+
+def simulate(returns: np.ndarray, rebalance_rows: np.ndarray, weights: np.ndarray,
+             initial_capital: float = INITIAL_CAPITAL,
+             commission_rate: float = SIM_COMMISSION_RATE,
+             sell_tax_rate: float = SIM_SELL_TAX_RATE) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """일별 자산 곡선 계산.
+
+    returns: 일별 수익률 (T × n), rebalance_rows: 리밸런싱 행 번호(오름차순, R개), weights: 목표 비중 (R × n)
+    리밸런싱은 해당 날짜 종가에 체결, 비용 = 수수료율 × 회전율 + 거래세율 × 매도 비중.
+    반환값: (첫 리밸런싱 행부터의 일별 자산, 리밸런싱별 회전율, 리밸런싱별 비용률)
+    """
+    a = np.asarray(rebalance_rows)
+    growth = np.cumprod(1.0 + returns, axis=0)                   # C[t]
+    # 리밸런싱일 누적 성장률이 0 이하/NaN 인 종목(가격 0 이후 등)은 살 수 없으므로 그 비중은 현금으로 둔다.
+    held = np.isfinite(growth[a]) & (growth[a] > 0)
+    W = np.where(held, np.asarray(weights, dtype=float), 0.0)
+    cash = 1.0 - W.sum(axis=1)
+    P = np.divide(W, growth[a], out=np.zeros_like(W), where=held)  # 구간 시작 대비 보유 수량
+
+    t = np.arange(a[0], len(returns))
+    seg = np.searchsorted(a, t, side="left") - 1                  # t일이 속한(끝나는) 구간, 첫 리밸런싱일은 -1
+    seg_c = np.maximum(seg, 0)
+    rel = cash[seg_c] + np.einsum("ij,ij->i", P[seg_c], growth[t])
+    rel[seg < 0] = 1.0
+
+    # 리밸런싱 직전 비중(drift 된 비중)과 회전율
+    prev = np.vstack([np.zeros((1, W.shape[1])), P[:-1] * growth[a[1:]]])
+    prev_total = np.concatenate([[1.0], rel[a[1:] - a[0]]])
+    pre = prev / prev_total[:, None]
+    diff = W - pre
+    turnover = np.abs(diff).sum(axis=1)
+    sells = np.clip(-diff, 0, None).sum(axis=1)
+    costs = commission_rate * turnover + sell_tax_rate * sells
+
+    # 리밸런싱 직후 자산 = 초기자본 × Π(직전 구간 배수 × (1 - 비용))
+    seg_mult = np.concatenate([[1.0], rel[a[1:] - a[0]]])
+    post = initial_capital * np.cumprod(seg_mult * (1.0 - costs))
+    equity = np.where(seg < 0, post[0], post[seg_c] * rel)
+    equity[a - a[0]] = post
+    return equity, turnover, costs
+
+
+def performance_summary(result: SimResult) -> dict[str, float]:
+    eq = result.equity
+    days = (datetime.strptime(result.dates[-1], "%Y%m%d") - datetime.strptime(result.dates[0], "%Y%m%d")).days
+    years = days / 365.0 if days > 0 else 0.0
+    total_return = eq[-1] / INITIAL_CAPITAL - 1.0
+    cagr = (eq[-1] / INITIAL_CAPITAL) ** (1.0 / years) - 1.0 if years > 0 else float("nan")
+    peak = np.maximum.accumulate(np.concatenate([[INITIAL_CAPITAL], eq]))[1:]
+    mdd = float((eq / peak - 1.0).min())
+    r = result.daily_returns[1:]
+    vol = float(r.std(ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR)) if len(r) > 1 else float("nan")
+    sharpe = float(r.mean() * TRADING_DAYS_PER_YEAR / vol) if vol and vol > 0 else float("nan")
+    return {
+        "total_return": float(total_return),
+        "cagr": float(cagr),
+        "mdd": mdd,
+        "volatility": vol,
+        "sharpe": sharpe,
+        "avg_turnover": float(result.turnover.mean()),
+        "annual_turnover": float(result.turnover.sum() / years) if years > 0 else float("nan"),
+        "total_cost": float(result.costs.sum()),
+    }
+
+
+# ---------------------------------------------------------------------------
+# 팩터 점수 -> 시뮬레이션
+# ---------------------------------------------------------------------------
+
+def _rebalance_scores(reb_date: str) -> pd.Series:
+    """리밸런싱 날짜의 유동성 필터 통과 종목 total_score (index=티커). (backtest.select_portfolio 와 같은 필터)"""
+    factors = build_factor_table(reb_date, columns=SELECT_COLUMNS)
+    liquid = factors[factors["거래대금"] >= MIN_TRADING_VALUE]
+    return liquid["total_score"].astype(float)
+
+
+def _score_cache_path() -> Path:
+    # 시뮬레이션/기간 설정은 날짜별 점수에 영향이 없으므로 지문에서 뺀다.
+    return Path(CACHE_DIR) / SIM_SCORE_CACHE_DIR / f"{result_fingerprint(ignore=('SIM_', 'BACKTEST_'))}.parquet"
+
+
+def _compact_scores(scores: pd.Series) -> pd.Series:
+    """index=티커 점수 -> index=종목 코드(int32), 값은 SCORE_DTYPE."""
+    return pd.Series(scores.to_numpy(dtype=SCORE_DTYPE), index=pd.Index(encode_tickers(scores.index), name="code"))
+
+
+def _load_score_cache(path: Path) -> dict[str, pd.Series]:
+    if not SIM_SCORE_CACHE_ENABLED or not path.exists():
+        return {}
+    try:
+        df = pd.read_parquet(path)
+    except Exception as e:
+        print(f"[WARN] 점수 캐시를 읽지 못해 다시 계산합니다 ({path}): {e}")
+        return {}
+    codes = pd.Index(encode_tickers(df["티커"]), name="code")
+    values = df["total_score"].to_numpy(dtype=SCORE_DTYPE)
+    return {d: pd.Series(values[rows], index=codes[rows])
+            for d, rows in df.groupby("date", sort=False).indices.items()}
+
+
+def _save_score_cache(path: Path, scores: dict[str, pd.Series]):
+    """확정된 날짜의 점수만 (티커 문자열로) 저장하고, 지문이 다른 이전 캐시 파일은 지운다."""
+    frames = [pd.DataFrame({"티커": decode_tickers(s.index), "total_score": s.to_numpy(dtype=float)}).assign(date=d)
+              for d, s in scores.items() if is_final(d)]
+    if not frames:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp")
+    try:
+        pd.concat(frames, ignore_index=True)[["date", "티커", "total_score"]].to_parquet(tmp, index=False)
+        tmp.replace(path)
+    except Exception as e:
+        print(f"[WARN] 점수 캐시 저장 실패 ({path}): {e}")
+        tmp.unlink(missing_ok=True)
+        return
+    for old in path.parent.glob("*.parquet"):
+        if old != path:
+            old.unlink(missing_ok=True)
+
+
+def collect_scores(reb_dates: list[str], panel_range: tuple[str, str],
+                   workers: int = BACKTEST_WORKERS) -> dict[str, pd.Series]:
+    """리밸런싱 날짜 -> 유동성 필터 통과 종목 total_score (index=종목 코드, _compact_scores).
+    점수 캐시에 있는 날짜는 그대로 쓰고, 없는 날짜만 팩터 테이블을 만들어 계산한 뒤 캐시에 더한다.
+    (weight_sweep 처럼 날짜별 점수를 한 번만 모으므로 daily/weekly 를 번갈아 돌려도 다시 계산하지 않는다)
+    """
+    path = _score_cache_path()
+    cached = _load_score_cache(path)
+    missing = [d for d in dict.fromkeys(reb_dates) if d not in cached]
+    if len(missing) < len(reb_dates):
+        print(f"[INFO] 점수 캐시 사용: {len(reb_dates) - len(missing)}개 날짜, 새로 계산: {len(missing)}개")
+    if UNIVERSE_INDEX_ENABLED and missing:
+        get_universe_index().ensure(missing)
+
+    if workers > 1 and len(missing) > 1:
+        print(f"[INFO] 병렬 모드: 워커 {workers}개로 리밸런싱 시점별 점수 계산")
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(make_shared_rate_state(), panel_range)) as pool:
+            computed = list(pool.map(_rebalance_scores, missing))
+    else:
+        computed = [_rebalance_scores(d) for d in missing]
+
+    scores = {**cached, **{d: _compact_scores(s) for d, s in zip(missing, computed)}}
+    if SIM_SCORE_CACHE_ENABLED and missing:
+        _save_score_cache(path, scores)
+    return scores
+
+
+def _panel_range(start: str, end: str) -> tuple[str, str]:
+    lookback = SIM_VOL_LOOKBACK
+    if MOMENTUM_SOURCE == "panel":
+        lookback = max(lookback, max(n for n, _ in MOMENTUM_LOOKBACKS.values()))
+    return get_calendar().offset(start, -lookback) or start, end
+
+
+def run_simulation(freq: str = SIM_REBALANCE_FREQ, scheme: str = SIM_WEIGHTING,
+                   start_date: str = BACKTEST_START_DATE, end_date: str | None = BACKTEST_END_DATE,
+                   workers: int = BACKTEST_WORKERS) -> SimResult:
+    if end_date is None:
+        end_date = get_recent_trading_date()
+    reb_dates = rebalance_schedule(start_date, end_date, freq)
+    if not reb_dates:
+        raise RuntimeError("리밸런싱 날짜가 없습니다. 기간을 확인해주세요.")
+    print(f"[INFO] 시뮬레이션: {freq} 리밸런싱 {len(reb_dates)}회, 가중 {scheme}")
+
+    panel_range = _panel_range(reb_dates[0], end_date)
+    panel = load_price_panel(*panel_range)
+    momentum.use_panel(panel, *panel_range)
+
+    score_by_date = collect_scores(reb_dates, panel_range, workers)
+    score_list = [score_by_date[d] for d in reb_dates]
+
+    # 리밸런싱일 -> 패널 행 (패널에 없는 날은 직전 행)
+    rows = np.searchsorted(panel.dates, reb_dates, side="right") - 1
+    scores = np.full((len(reb_dates), len(panel.tickers)), np.nan)
+    for i, s in enumerate(score_list):
+        cols = panel.columns_for(decode_tickers(s.index))
+        ok = cols >= 0
+        scores[i, cols[ok]] = s.to_numpy()[ok]
+    # 리밸런싱일에 가격이 없는 종목은 담을 수 없다.
+    scores[np.isnan(panel.adjusted_close()[rows])] = np.nan
+
+    returns = daily_returns(panel)
+    vol = trailing_volatility(returns, rows) if scheme == "inverse_vol" else None
+    weights = target_weights(scores, BACKTEST_TOP_N, scheme, vol)
+
+    # 같은 행으로 모인 리밸런싱(패널 누락일)은 마지막 것만 쓴다.
+    keep = np.append(rows[1:] != rows[:-1], True)
+    rows, weights = rows[keep], weights[keep]
+
+    equity, turnover, costs = simulate(returns, rows, weights)
+    daily = np.concatenate([[0.0], equity[1:] / equity[:-1] - 1.0])
+    result = SimResult(panel.dates[rows[0]:], equity, daily, panel.dates[rows], turnover, costs)
+    _print_summary(result, freq, scheme)
+
+    outfile = f"portfolio_sim_{freq}_{scheme}_{start_date}_{end_date}.csv"
+    pd.DataFrame({"date": result.dates, "equity": result.equity, "daily_return": result.daily_returns}) \
+        .to_csv(outfile, encoding="utf-8-sig", index=False)
+    print(f"[INFO] 일별 자산 곡선을 {outfile} 로 저장했습니다.")
+    return result
+
+
+def _print_summary(result: SimResult, freq: str, scheme: str):
+    m = performance_summary(result)
+    print("\n==============================")
+    print("=== 일별 시뮬레이션 결과 요약 ===")
+    print("==============================\n")
+    print(f"기간                   : {result.dates[0]} ~ {result.dates[-1]} ({len(result.dates)} 거래일)")
+    print(f"리밸런싱 / 가중        : {freq} {len(result.rebalance_dates)}회 / {scheme}")
+    print(f"비용                   : 수수료 {SIM_COMMISSION_RATE*100:.3f}% (매수·매도), 거래세 {SIM_SELL_TAX_RATE*100:.2f}% (매도)")
+    print(f"최종 자본              : {result.equity[-1]:,.0f}원")
+    print(f"총 수익률              : {m['total_return']*100:,.2f}%")
+    print(f"연복리 수익률(CAGR)    : {m['cagr']*100:,.2f}%")
+    print(f"최대낙폭(MDD, 일별)    : {m['mdd']*100:,.2f}%")
+    print(f"연 변동성 / 샤프       : {m['volatility']*100:,.2f}% / {m['sharpe']:.2f}")
+    print(f"평균 회전율(회당)      : {m['avg_turnover']*100:,.1f}%  (연 {m['annual_turnover']*100:,.0f}%)")
+    print(f"누적 비용              : {m['total_cost']*100:,.2f}%")
+
+
+if __name__ == "__main__":
+    run_simulation()
@@ -0,0 +1,208 @@
+# price_panel.py
+# 백테스트용 일자 × 종목 가격/거래량 패널
+# - 거래일마다 코스피/코스닥 전종목 시가총액 스냅샷(종가/거래량/상장주식수)을 받아
+#   (거래일 수 × 종목 수) numpy 배열로 쌓는다. 스냅샷은 data_loader 캐시를 그대로 사용한다.
+# - 리밸런싱 구간 수익률은 종목별 HTTP 호출 대신 배열 인덱싱으로 한 번에 계산한다.
+# - 상장주식수 변화로 분할/병합/무상증자를 찾아 수정종가(adjusted_close)도 만든다. (모멘텀 계산용)
+# - COMPACT_DTYPES 면 종가/거래량을 float32 로 보관한다. (상장주식수는 분할 비율 계산 정밀도 때문에 float64 유지)
+
+import numpy as np
+import pandas as pd
+
+from quant_config import COMPACT_DTYPES, PANEL_STORE_ENABLED
+from data_loader import fetch_market_cap, run_concurrently
+from trading_calendar import get_calendar
+
+
+PANEL_MARKETS = ("KOSPI", "KOSDAQ")
+
+# 패널 필드명 -> 시가총액 스냅샷 컬럼명
+PANEL_FIELDS = {
+    "close": "종가",
+    "volume": "거래량",
+    "shares": "상장주식수",
+}
+
+# compact 모드에서 float32 로 줄이는 필드 (종가는 2^24 미만 정수라 float32 로도 정확하다)
+COMPACT_FIELDS = ("close", "volume")
+
+
+class PricePanel:
+    """dates(YYYYMMDD) × tickers 배열 묶음. 해당 일자에 스냅샷에 없던 종목은 NaN."""
+
+    def __init__(self, dates, tickers, fields: dict[str, np.ndarray]):
+        self.dates = np.asarray(dates, dtype=object)
+        self.tickers = np.asarray(tickers, dtype=object)
+        self.fields = fields
+        self._ticker_index = pd.Index(self.tickers)
+        self._adjusted_close = None
+
+    @property
+    def close(self) -> np.ndarray:
+        return self.fields["close"]
+
+    @property
+    def volume(self) -> np.ndarray:
+        return self.fields["volume"]
+
+    @property
+    def shares(self) -> np.ndarray:
+        return self.fields["shares"]
+
+    def adjusted_close(self) -> np.ndarray:
+        """마지막 날 기준 수정종가.
+
+        상장주식수가 r배로 바뀐 날 중 종가도 그만큼 움직인 날(분할/병합/무상증자)만
+        이전 가격을 r로 나눠 맞춘다. 유상증자처럼 주가가 따라 움직이지 않은 변화는 무시한다.
+        중간에 값이 빈 날(거래정지 등)은 직전 값과 비교한다.
+        """
+        if self._adjusted_close is None:
+            close = pd.DataFrame(self.close).ffill().to_numpy()
+            shares = pd.DataFrame(self.shares).ffill().to_numpy()
+            factor = np.ones_like(close)
+            if len(close) > 1:
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    r = shares[1:] / shares[:-1]
+                    raw_gap = np.abs(np.log(close[:-1] / close[1:]))
+                    adj_gap = np.abs(np.log(close[:-1] / (close[1:] * r)))
+                    is_split = (r != 1) & (adj_gap < raw_gap)
+                factor[1:] = np.where(is_split, r, 1.0)
+            # t 이후에 일어난 조정 계수의 누적곱으로 나눈다.
+            later = np.ones_like(factor)
+            later[:-1] = np.cumprod(factor[::-1], axis=0)[::-1][1:]
+            self._adjusted_close = (self.close / later).astype(self.close.dtype, copy=False)
+        return self._adjusted_close
+
+    def replace_day(self, date: str, snapshot: pd.DataFrame) -> bool:
+        """date 행을 새 시가총액 스냅샷(index=티커)으로 바꾼다. (장중 갱신용, 패널에 없는 신규 종목은 무시)
+
+        패널에 date 가 없거나 스냅샷이 아직 유효하지 않으면(종가 전부 0) 바꾸지 않고 False.
+        """
+        rows = np.flatnonzero(self.dates == date)
+        if not len(rows) or snapshot is None or snapshot.empty or not (snapshot["종가"] > 0).any():
+            return False
+        snapshot = snapshot[~snapshot.index.duplicated(keep="first")]
+        for name, col in PANEL_FIELDS.items():
+            arr = self.fields[name]
+            if not arr.flags.writeable:
+                # DataFrame 에서 꺼낸 배열은 읽기 전용일 수 있어 처음 바꿀 때 한 번 복사한다.
+                arr = self.fields[name] = arr.copy()
+            arr[rows[0]] = snapshot[col].astype(float).reindex(self._ticker_index).to_numpy()
+        self._adjusted_close = None
+        return True
+
+    def compact(self) -> "PricePanel":
+        """종가/거래량을 float32 로 줄인 패널 (종가·거래량·상장주식수 패널 기준 메모리 1/3 감소, 이미 float32 면 그대로).
+        배열을 새로 만들므로 panel_store 메모리 맵 패널에는 쓰지 않는다. (파일 전체를 RAM 으로 복사하게 된다)
+        """
+        fields = {name: (arr.astype(np.float32) if name in COMPACT_FIELDS else arr)
+                  for name, arr in self.fields.items()}
+        return PricePanel(self.dates, self.tickers, fields)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(arr.nbytes for arr in self.fields.values())
+
+    def row_range(self, start: str, end: str) -> tuple[int, int]:
+        """start ~ end (양끝 포함) 에 해당하는 행 구간 [lo, hi)."""
+        lo = int(np.searchsorted(self.dates, start, side="left"))
+        hi = int(np.searchsorted(self.dates, end, side="right"))
+        return lo, hi
+
+    def columns_for(self, tickers) -> np.ndarray:
+        """티커 배열 -> 열 번호 배열 (패널에 없는 티커는 -1)."""
+        return self._ticker_index.get_indexer(pd.Index(list(tickers)))
+
+    def period_returns(self, tickers, start: str, end: str) -> tuple[np.ndarray, np.ndarray]:
+        """구간 첫 종가 대비 마지막 종가 수익률을 종목별로 계산한다.
+
+        반환값:
+        - rets: 수익률 배열. 데이터가 2일 미만이거나 종가가 0 이하이면 NaN (기존 스킵 규칙과 동일)
+        - needs_fallback: 패널만으로는 수정주가 기준 수익률과 같다고 보장할 수 없는 종목
+          (패널에 없는 종목, 구간 중 상장주식수가 바뀐 종목 = 분할/병합/증자 가능성)
+        """
+        cols = self.columns_for(tickers)
+        k = len(cols)
+        known = cols >= 0
+        lo, hi = self.row_range(start, end)
+        if k == 0 or hi <= lo:
+            return np.full(k, np.nan), ~known
+
+        safe_cols = np.where(known, cols, 0)
+        close = self.close[lo:hi][:, safe_cols]
+        shares = self.shares[lo:hi][:, safe_cols]
+
+        present = ~np.isnan(close) & known[None, :]
+        count = present.sum(axis=0)
+        n_days = close.shape[0]
+        first = present.argmax(axis=0)
+        last = n_days - 1 - present[::-1].argmax(axis=0)
+
+        idx = np.arange(k)
+        entry = close[first, idx]
+        exit_ = close[last, idx]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            valid = (count >= 2) & (entry > 0) & (exit_ > 0)
+            rets = np.where(valid, exit_ / entry - 1.0, np.nan)
+
+        share_changed = (count >= 2) & (shares[first, idx] != shares[last, idx])
+        needs_fallback = ~known | share_changed
+        return rets, needs_fallback
+
+
+def load_price_panel(start: str, end: str, markets=PANEL_MARKETS, compact: bool = COMPACT_DTYPES) -> PricePanel:
+    """start ~ end 사이 모든 거래일의 전종목 스냅샷으로 패널을 만든다. (compact 면 float32 패널)
+    PANEL_STORE_ENABLED 이고 panel_store 저장소가 구간을 덮으면 스냅샷 대신 저장소의 메모리 맵 배열을 그대로 쓴다.
+    (메모리 맵은 필요한 페이지만 읽으므로 compact 여도 float32 로 복사하지 않는다)
+    """
+    if PANEL_STORE_ENABLED and tuple(markets) == PANEL_MARKETS:
+        # panel_store 가 이 모듈을 import 하므로 순환 import 를 피하려고 여기서 import
+        from panel_store import get_panel_store
+
+        store = get_panel_store()
+        if store.covers(start, end):
+            panel = store.panel(start, end)
+            print(f"[INFO] 가격 패널: 저장소에서 열기 {start} ~ {end} ({len(panel.dates)} 거래일)")
+            return panel
+
+    sessions = get_calendar().sessions_between(start, end)
+    print(f"[INFO] 가격 패널 구성 중: {start} ~ {end} ({len(sessions)} 거래일)")
+
+    def _snapshot(ds):
+        snaps = []
+        for market in markets:
+            try:
+                snap = fetch_market_cap(ds, market=market)
+            except Exception as e:
+                print(f"[WARN] {ds} {market} 스냅샷 조회 실패: {e}")
+                continue
+            # 장 시작 전 등 종가가 전부 0인 스냅샷은 아직 유효한 데이터가 아니다.
+            if snap is None or snap.empty or not (snap["종가"] > 0).any():
+                continue
+            snaps.append(snap[list(PANEL_FIELDS.values())])
+        return pd.concat(snaps, axis=0) if snaps else None
+
+    # 거래일별 스냅샷은 서로 독립이므로 공용 조회 풀에서 동시에 받는다. (캐시에 있으면 파일만 읽음)
+    snapshots = run_concurrently(*[(lambda ds=ds: _snapshot(ds)) for ds in sessions])
+    frames = [snap for snap in snapshots if snap is not None]
+    keys = [ds for ds, snap in zip(sessions, snapshots) if snap is not None]
+
+    if not frames:
+        empty = {name: np.empty((0, 0)) for name in PANEL_FIELDS}
+        return PricePanel([], [], empty)
+
+    long = pd.concat(frames, axis=0, keys=keys, names=["날짜", "티커"])
+    long = long[~long.index.duplicated(keep="first")]
+
+    fields = {}
+    dates = None
+    tickers = None
+    for name, col in PANEL_FIELDS.items():
+        wide = long[col].astype(float).unstack("티커")
+        if tickers is None:
+            dates, tickers = wide.index, wide.columns
+        else:
+            wide = wide.reindex(index=dates, columns=tickers)
+        fields[name] = wide.to_numpy(dtype=np.float32 if compact and name in COMPACT_FIELDS else np.float64)
+
+    return PricePanel(list(dates), list(tickers), fields)
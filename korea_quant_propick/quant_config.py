@@ -3,6 +3,8 @@
 
 # 유니버스: 코스피 / 코스닥 각각 시총 상위 N개
 UNIVERSE_SIZE_PER_MARKET = 500
+# 지난 거래일 유니버스 구성을 universe_index 에 저장해 두고 재사용 (백테스트 리밸런싱 날짜마다 다시 정렬하지 않음)
+UNIVERSE_INDEX_ENABLED = True
 
 # 랭킹 출력 시 상위 N개
 TOP_N_TO_SHOW = 30
@@ -34,3 +36,108 @@ MAX_PRICE_PER_SHARE = 70_000  # 7만원 초과 종목 제외
 
 # 시가총액 필터: 최소 시가총액 기준 (원) - 3,000억 미만 제외
 MIN_MARKET_CAP_WON = 3000 * 100_000_000  # 3000억
+
+# pykrx 응답 로컬 캐시 (Parquet)
+# - 지난 영업일(확정 데이터)은 만료 없이 재사용
+# - 당일 데이터는 아래 TTL(초)이 지나면 다시 조회
+CACHE_ENABLED = True
+CACHE_DIR = ".krx_cache"
+CACHE_TODAY_TTL_SECONDS = 10 * 60
+
+# KRX 거래일 캘린더: 처음 만들 때 조회 시작일, 기준 지수(코스피 종합)
+CALENDAR_START_DATE = "20160101"
+CALENDAR_INDEX_TICKER = "1001"
+
+# KRX 호출 속도 제한 (토큰 버킷): 초당 최대 호출 수 / 순간 허용 호출 수
+# 백테스트 병렬 모드에서는 모든 워커 프로세스가 이 한도를 나눠 쓴다.
+KRX_MAX_CALLS_PER_SEC = 10.0
+KRX_RATE_BURST = 5
+
+# 백테스트 병렬 워커 수 (1 이면 기존처럼 순차 실행)
+BACKTEST_WORKERS = 1
+
+# KRX 동시 조회 / 재시도 / 회로 차단기
+KRX_FETCH_WORKERS = 8            # 독립 요청 동시 실행 스레드 수 (1 이면 순차)
+KRX_MAX_RETRIES = 3              # 네트워크·응답 형식 오류 시 재시도 횟수
+KRX_BACKOFF_BASE_SEC = 0.5       # 재시도 대기: 0.5s, 1s, 2s ... (지수 백오프)
+KRX_CIRCUIT_FAIL_THRESHOLD = 8   # 연속 실패가 이 횟수 이상이면 호출 차단
+KRX_CIRCUIT_COOLDOWN_SEC = 60    # 차단 유지 시간(초)
+
+# rank_main 결과를 strategies/ 폴더에 CSV로도 저장할지 여부
+# (업로드는 CSV 파일을 거치지 않고 메모리의 랭킹 결과를 바로 사용)
+SAVE_STRATEGY_CSV = True
+
+# rank_main 결과 캐시 (result_cache.py)
+# - 같은 기준일 + 같은 설정/전략 정의/코드면 팩터 테이블과 전략별 랭킹을 CACHE_DIR/RESULT_CACHE_DIR 에서 꺼내 KRX 조회 없이 끝낸다.
+# - 오늘 기준일 결과는 RESULT_CACHE_CLOSE_HHMM(장 마감 후) 이후에 만든 것만 저장, 기준일 폴더는 최근 RESULT_CACHE_KEEP_DAYS 개만 보관
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_DIR = "results"
+RESULT_CACHE_CLOSE_HHMM = "1600"
+RESULT_CACHE_KEEP_DAYS = 20
+
+# 모멘텀 계산 방식
+# - "krx"  : 기존 방식 (KRX 기간 등락률, 30일 × 개월 수 달력 기준, 날짜마다 4번 전종목 조회) - 기본값
+# - "panel": 로컬 일별 가격 패널(거래일별 전종목 스냅샷 캐시)에서 정확한 거래일 수 기준으로 계산
+#            (처음 한 번은 최장 기간만큼의 스냅샷을 받아야 하고, 이후에는 하루치씩만 추가)
+#            MOMENTUM_LOOKBACKS 의 추가 기간 컬럼(mom_1m, mom_6m, mom_12_1 등)은 이 방식에서만 생긴다.
+MOMENTUM_SOURCE = "krx"
+
+# 모멘텀 기간 (MOMENTUM_SOURCE = "panel" 일 때): 컬럼명 -> (몇 거래일 전부터, 최근 몇 거래일 제외)
+# 예: "mom_12_1" 은 252거래일 전 ~ 21거래일 전 수익률 (최근 1개월 제외 12개월 모멘텀)
+MOMENTUM_LOOKBACKS = {
+    "mom_1m": (21, 0),
+    "mom_3m": (63, 0),
+    "mom_6m": (126, 0),
+    "mom_12m": (252, 0),
+    "mom_12_1": (252, 21),
+}
+
+# 가중치 스윕 / 워크포워드 (weight_sweep.py)
+SWEEP_WEIGHT_STEP = 0.05        # 가중치 격자 간격 (0.05 -> 합이 1인 4개 가중치 조합 1,771개)
+WALKFORWARD_IN_SAMPLE = 24      # in-sample 리밸런싱 횟수 (월간 기준 2년)
+WALKFORWARD_OUT_SAMPLE = 6      # out-of-sample 리밸런싱 횟수 (다음 6개월에 적용)
+WALKFORWARD_METRIC = "cagr"     # in-sample 최적 가중치 선택 기준: cagr / mdd / winrate
+
+# 일별 포트폴리오 시뮬레이터 (portfolio_sim.py)
+SIM_REBALANCE_FREQ = "monthly"   # daily / weekly / monthly
+SIM_WEIGHTING = "equal"          # equal(동일비중) / score(total_score 비례) / inverse_vol(변동성 역수)
+SIM_COMMISSION_RATE = 0.00015    # 매매 수수료 (매수·매도 각각, 거래금액 대비)
+SIM_SELL_TAX_RATE = 0.0018       # 증권거래세 (매도 금액 대비)
+SIM_VOL_LOOKBACK = 60            # inverse_vol 가중치용 변동성 계산 기간 (거래일)
+# 리밸런싱 날짜별 total_score 캐시: CACHE_DIR/SIM_SCORE_CACHE_DIR/{지문}.parquet
+# (한 번 계산한 날짜는 주기/가중 방식을 바꿔 다시 돌려도 팩터 테이블을 새로 만들지 않는다)
+SIM_SCORE_CACHE_ENABLED = True
+SIM_SCORE_CACHE_DIR = "sim_scores"
+
+# 파이프라인 계측 (instrumentation.py)
+# - 단계별 실행/CPU 시간, 최대 메모리(RSS), pykrx·Supabase 엔드포인트별 호출 수·바이트·지연시간을
+#   실행마다 TRACE_DIR/trace_*.json 으로 저장 (비용이 작아 운영에서도 켜 둔다)
+INSTRUMENTATION_ENABLED = True
+TRACE_DIR = "traces"
+TRACE_PYTHON_MEMORY = False     # True 면 tracemalloc 으로 단계별 Python 메모리 최대치도 측정 (느려짐)
+
+# 메모리 절약 dtype (compact.py / price_panel.py)
+# - True 면 백테스트·모멘텀·시뮬레이션용 가격 패널의 종가/거래량을 float32 로 보관 (패널 메모리 1/3 감소)
+#   수익률·모멘텀이 float32 정밀도(유효숫자 7자리)로 계산되므로 결과가 기본 모드와 소수점 아래에서 다를 수 있다.
+#   (패널 저장소 메모리 맵 패널은 복사하지 않으므로 float64 그대로 쓴다)
+# - True 면 compact_table() 팩터 테이블과 weight_sweep / portfolio_sim 날짜별 점수도 float32 로 보관
+#   (False 여도 티커는 int32 코드, 라벨은 category 로 보관하고 출력 직전에 expand_table() 로 되돌린다)
+COMPACT_DTYPES = False
+
+# 로컬 랭킹 서비스 (rank_service.py)
+# - 오늘 팩터 테이블을 메모리에 들고 HTTP 로 전략 질의에 응답, RANK_SERVICE_CHECK_SEC 마다 영업일 변경을 확인해 다시 만든다.
+RANK_SERVICE_HOST = "127.0.0.1"
+RANK_SERVICE_PORT = 8765
+RANK_SERVICE_CHECK_SEC = 300
+# 기준일이 오늘이면 장중(RANK_SERVICE_INTRADAY_UNTIL 시각 HHMM 전까지)에는 확인할 때마다
+# factor_model.refresh_factor_table 로 가격 의존 팩터(종가/거래량/거래대금/시가총액/모멘텀)만 증분 갱신
+RANK_SERVICE_INTRADAY_REFRESH = True
+RANK_SERVICE_INTRADAY_UNTIL = "1540"
+
+# 과거 시장 패널 저장소 (panel_store.py)
+# - CACHE_DIR/PANEL_STORE_DIR 에 일자 × 종목 메모리 맵 배열로 보관, `python panel_store.py` 로 하루 한 번 덧붙인다.
+# - PANEL_STORE_ENABLED 면 가격 패널 구간이 저장소 안에 있을 때 스냅샷을 다시 읽지 않고 저장소에서 바로 연다.
+PANEL_STORE_ENABLED = True
+PANEL_STORE_DIR = "panel_store"
+PANEL_STORE_START = "20170101"        # 저장소를 처음 만들 때 시작일 (BACKTEST_START_DATE 의 12개월 모멘텀 기간 포함)
+PANEL_STORE_CLOSE_HHMM = "1600"       # 이 시각 이후에만 오늘 거래일을 덧붙인다 (장중 값이 저장되지 않도록)
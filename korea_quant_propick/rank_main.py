@@ -4,20 +4,26 @@
 # 모든 전략: total_score 기준 내림차순 정렬
 # CSV/콘솔에서 종목명 바로 옆에 종목코드 위치
 # CSV는 ./strategies 폴더에 저장, 파일명은 초단위 타임스탬프까지 포함
+#
+# 실행: python rank_main.py [--strategies 1,5,14] [--as-of YYYYMMDD] [--no-upload] [--output-format csv|json|parquet|none] [--refresh]
+# (인자 없이 실행하면 기존처럼 최근 영업일 기준 1~14번 전체 + 업로드)
+# 같은 기준일·설정·코드로 다시 실행하면 result_cache 에 저장된 팩터 테이블/전략 랭킹을 그대로 쓴다. (--refresh 면 다시 계산)
 
+import argparse
 import os
 from datetime import datetime
-from pathlib import Path
 import warnings
 
 # pykrx 쪽에서 나오는 pkg_resources / FutureWarning 노이즈 제거
 warnings.filterwarnings("ignore", category=UserWarning, module="pykrx")
 warnings.filterwarnings("ignore", category=FutureWarning, module="pykrx")
 
+import numpy as np
 import pandas as pd
 
-from quant_config import UNIVERSE_SIZE_PER_MARKET, TOP_N_TO_SHOW, MIN_TRADING_VALUE, MIN_VOLUME_SHARES, MAX_PRICE_PER_SHARE, MIN_MARKET_CAP_WON
-from upload_to_supabase import upload_and_insert
+from quant_config import TOP_N_TO_SHOW, MIN_VOLUME_SHARES, MAX_PRICE_PER_SHARE, MIN_MARKET_CAP_WON, SAVE_STRATEGY_CSV, RESULT_CACHE_ENABLED
+from instrumentation import annotate, finish_run, stage, start_run
+from compact import compact_table, for_output
 
 # 방어 코드: 구버전 설정 파일에서 상수가 없을 수 있어 기본값을 둔다.
 try:
@@ -32,29 +38,15 @@ try:
     MIN_MARKET_CAP_WON  # noqa: F401
 except NameError:
     MIN_MARKET_CAP_WON = 3000 * 100_000_000
-from data_loader import get_recent_trading_date
-from factor_model import build_factor_table, make_stock_comment
 
-
-RESULT_DIR = "strategies"
+# data_loader(pykrx) / factor_model / upload_to_supabase(supabase, dotenv) 는 무거워서 실제로 쓰는 함수 안에서 import 한다.
+# (enrich_table 등만 가져다 쓰는 모듈과 --help, 업로드 없는 실행이 빨리 뜨도록)
+from strategy_engine import STRATEGY_INFO, COMPOSITE_STRATEGY, COMPOSITE_SAVE_TOP, StrategyEngine
 
 
-STRATEGY_INFO: dict[str, tuple[str, str]] = {
-    "1": ("전략 1 멀티팩터 균형형 추천", "멀티팩터 균형형 추천주"),
-    "2": ("전략 2 가치주 중심 추천", "가치주 중심 추천주"),
-    "3": ("전략 3 퀄리티 배당주 추천", "퀄리티/배당주 추천주"),
-    "4": ("전략 4 모멘텀 추세 추종 추천", "모멘텀 추세 추종 추천주"),
-    "5": ("전략 5 저위험 대형주 방어형 추천", "저위험 대형주 방어형 추천주"),
-    "6": ("전략 6 소형주 하이모멘텀 스윙 추천", "소형주 하이모멘텀 스윙 추천주"),
-    "7": ("전략 7 고배당 방어형 추천", "고배당 방어형 추천주"),
-    "8": ("전략 8 딥밸류 리레이팅 기대주", "딥밸류 리레이팅 기대주"),
-    "9": ("전략 9 우상향 단기조정 매수후보", "우상향 중 단기조정 매수候보"),
-    "10": ("전략 10 퀄리티 성장 모멘텀주", "퀄리티 성장 모멘텀주"),
-    "11": ("전략 11 단기 스캘핑 1% 타겟", "단기 스캘핑 1% 타겟候보"),
-    "12": ("전략 12 단기 스캘핑 고확률", "단기 스캘핑 고확률候보"),
-    "13": ("전략 13 단기 눌림목 매수", "단기 눌림목 매수候보"),
-    "14": ("전략 14 오늘 최적 종합 추천", "오늘 최적 종합 추천주"),
-}
+RESULT_DIR = "strategies"
+OUTPUT_FORMATS = ("csv", "json", "parquet", "none")
+DEFAULT_OUTPUT_FORMAT = "csv" if SAVE_STRATEGY_CSV else "none"
 
 
 def classify_market_cap(marcap: float) -> str:
@@ -92,14 +84,57 @@ def classify_style(row: pd.Series) -> str:
     return "퀄리티/배당주" if q >= 70 else "퀄리티/균형형"
 
 
+# ---------------------------------------------------------------------------
+# 위 분류 함수들의 배열 버전 (enrich_table 에서 사용, 결과 라벨은 동일)
+# ---------------------------------------------------------------------------
+
+def classify_market_cap_array(marcap: pd.Series) -> np.ndarray:
+    v = marcap.to_numpy(dtype=float, na_value=np.nan)
+    return np.select(
+        [np.isnan(v), v >= 10_000_000_000_000, v >= 5_000_000_000_000, v >= 1_000_000_000_000],
+        ["알수없음", "초대형주(10조↑)", "대형주(5~10조)", "중형주(1~5조)"],
+        "소형주(1조↓)",
+    ).astype(object)
+
+
+def classify_risk_array(risk_score: pd.Series) -> np.ndarray:
+    v = risk_score.to_numpy(dtype=float, na_value=np.nan)
+    return np.select(
+        [np.isnan(v), v <= 33, v <= 66],
+        ["알수없음", "저위험", "중위험"],
+        "고위험",
+    ).astype(object)
+
+
+def classify_style_array(df: pd.DataFrame) -> np.ndarray:
+    def col(name):
+        if name in df.columns:
+            return df[name].to_numpy(dtype=float, na_value=np.nan)
+        return np.zeros(len(df))
+
+    v, q, m = col("value_score"), col("quality_score"), col("momentum_score")
+    # 파이썬 max(v, q, m) 과 같은 규칙: 앞에서부터 '더 큰 값'일 때만 교체 (NaN 비교는 모두 거짓)
+    max_score = np.where(q > v, q, v)
+    max_score = np.where(m > max_score, m, max_score)
+    return np.select(
+        [max_score == v, max_score == m],
+        [np.where(v >= 70, "가치주", "밸류/균형형"), np.where(m >= 70, "모멘텀주", "모멘텀/균형형")],
+        np.where(q >= 70, "퀄리티/배당주", "퀄리티/균형형"),
+    ).astype(object)
+
+
+
+# enrich_table 이 읽는 팩터 테이블 컬럼
+ENRICH_COLUMNS = ["시가총액", "risk_score", "value_score", "quality_score", "momentum_score"]
+
 
 def enrich_table(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
     # 종목코드: 항상 6자리 0패딩 (예: 270 -> '000270'), 엑셀에서 0이 안날아가도록 문자열로 저장
     df["종목코드"] = df.index.astype(str).str.zfill(6)
-    df["시총구간"] = df["시가총액"].apply(classify_market_cap)
-    df["리스크구간"] = df["risk_score"].apply(classify_risk)
-    df["스타일"] = df.apply(classify_style, axis=1)
+    df["시총구간"] = classify_market_cap_array(df["시가총액"])
+    df["리스크구간"] = classify_risk_array(df["risk_score"])
+    df["스타일"] = classify_style_array(df)
     return df
 
 
@@ -113,135 +148,34 @@ def reorder_columns_for_output(df: pd.DataFrame) -> pd.DataFrame:
     other_cols = [c for c in df.columns if c not in first_cols]
     return df[first_cols + other_cols]
 def apply_strategy(df: pd.DataFrame, choice: str):
+    """전략 하나의 (prefix, title, total_score 기준 정렬된 DataFrame).
+    전략 조건은 strategy_engine.STRATEGY_RULES 에 선언되어 있다.
+    여러 전략을 돌릴 때는 StrategyEngine 하나를 만들어 재사용하는 편이 빠르다.
+    """
     if choice not in STRATEGY_INFO:
         raise ValueError("지원하지 않는 전략 코드")
-
-    prefix, title = STRATEGY_INFO[choice]
-    # 기본 베이스: 유동성(거래대금) + 거래량(10만주 이상) + 1주당 가격(7만원 이하) + 시총(3000억 이상) 필터
-    base = df[(df["거래대금"] >= MIN_TRADING_VALUE) & (df["거래량"] >= MIN_VOLUME_SHARES) & (df["종가"] <= MAX_PRICE_PER_SHARE) & (df["시가총액"] >= MIN_MARKET_CAP_WON)].copy()
-    if base.empty:
-        # 유동성 기준을 통과하는 종목이 전혀 없으면, 거래대금 필터만 제거하고
-        # 최소 거래량(10만주) + 1주당 가격(7만원 이하) + 시총(3000억 이상) 조건만 적용해서 베이스를 구성한다.
-        print("[WARN] 유동성 필터 통과 종목이 없어 거래대금 필터를 제거하고 거래량+가격+시총 필터만 적용합니다.")
-        base = df[(df["거래량"] >= MIN_VOLUME_SHARES) & (df["종가"] <= MAX_PRICE_PER_SHARE) & (df["시가총액"] >= MIN_MARKET_CAP_WON)].copy()
-
-    if choice == "1":
-        filt = base
-
-    elif choice == "2":
-        filt = base[base["value_score"] >= 60]
-
-    elif choice == "3":
-        filt = base[base["quality_score"] >= 60]
-
-    elif choice == "4":
-        filt = base[base["mom_12m"] > 0]
-
-    elif choice == "5":
-        filt = base[
-            (base["시가총액"] >= 5_000_000_000_000) &
-            (base["risk_score"] <= 40)
-        ]
-
-    elif choice == "6":
-        filt = base[
-            (base["시가총액"] < 5_000_000_000_000) &
-            (base["momentum_score"] >= 60)
-        ]
-
-    elif choice == "7":
-        filt = base[
-            (base["DIV"] >= 3.0) &
-            (base["risk_score"] <= 60) &
-            (base["시가총액"] >= 1_000_000_000_000)
-        ]
-
-    elif choice == "8":
-        filt = base[
-            (base["value_score"] >= 60) &
-            (base["mom_12m"] >= 0)
-        ]
-
-    elif choice == "9":
-        filt = base[
-            (base["mom_12m"] >= 20) &
-            (base["mom_3m"] <= 0)
-        ]
-
-    elif choice == "10":
-        filt = base[
-            (base["quality_score"] >= 70) &
-            (base["momentum_score"] >= 60)
-        ]
-
-    elif choice == "11":
-        high_liq = MIN_TRADING_VALUE * 3
-        filt = base[
-            (base["거래대금"] >= high_liq) &
-            (base["mom_3m"] >= 5) &
-            (base["mom_3m"] <= 40) &
-            (base["risk_score"] >= 40) &
-            (base["risk_score"] <= 80)
-        ]
-
-    elif choice == "12":
-        super_liq = MIN_TRADING_VALUE * 5
-        filt = base[
-            (base["거래대금"] >= super_liq) &
-            (base["mom_12m"] >= 10) &
-            (base["mom_12m"] <= 60) &
-            (base["mom_3m"] >= 3) &
-            (base["mom_3m"] <= 25) &
-            (base["risk_score"] >= 20) &
-            (base["risk_score"] <= 60) &
-            (base["quality_score"] >= 50)
-        ]
-
-
-    elif choice == "13":
-        # 단기 눌림목 매수 전략:
-        # - 최근 12개월은 상승 추세 (15%~80%)
-        # - 최근 3개월은 과도한 급등은 아니고, -15% ~ +5% 구간의 적당한 조정
-        # - 거래대금은 기본 유동성 기준보다 2배 이상
-        # - 리스크는 너무 낮지도/높지도 않은 중간 구간
-        strong_liq = MIN_TRADING_VALUE * 2
-        filt = base[
-            (base["거래대금"] >= strong_liq) &
-            (base["mom_12m"] >= 15) & (base["mom_12m"] <= 80) &
-            (base["mom_3m"] >= -15) & (base["mom_3m"] <= 5) &
-            (base["risk_score"] >= 20) & (base["risk_score"] <= 70)
-        ]
-
-    elif choice == "14":
-        # 전략 14: 2~13번 전략(특히 팩터 전략들)의 후보군 중에서
-        # total_score 기준 최적 50개를 뽑는 최종 종합 전략.
-        # 여기서는 2~13번 전략 각각의 상위 종목들을 모아 합집합을 만들고,
-        # 중복 제거 후 total_score로 다시 정렬한다.
-        candidates = []
-        for sub in [str(i) for i in range(2, 14)]:  # 2~13번 전략만 활용 (14 자신은 제외)
-            _, _, sub_ranked = apply_strategy(df, sub)
-            if sub_ranked is not None and not sub_ranked.empty:
-                # 각 전략에서 상위 일부만 사용 (예: 상위 80개)
-                candidates.append(sub_ranked.head(80))
-
-        if candidates:
-            combined = pd.concat(candidates, axis=0)
-            # 동일 종목(티커)은 처음 등장한 전략에서의 점수를 사용
-            combined = combined[~combined.index.duplicated(keep="first")]
-            filt = combined
-        else:
-            # 만약 어떤 전략도 후보를 내지 못한 극단적 상황이면 전체 유니버스를 사용
-            filt = df.copy()
-
-    # 정렬 기준: 기본은 total_score, 전략 14는 "거래량" 많은 순(동률 시 total_score 순)
-    if choice == "14" and "거래량" in filt.columns:
-        ranked = filt.sort_values(["거래량", "total_score"], ascending=[False, False]).copy()
+    return StrategyEngine(df).ranked(choice)
+
+
+def write_ranking(df: pd.DataFrame, prefix: str, timestamp: str, output_format: str) -> str:
+    """전략 랭킹 한 개를 RESULT_DIR/{prefix}_{timestamp}.{csv|json|parquet} 로 저장하고 경로를 돌려준다.
+    compact 표현이면 여기서 원래 스키마로 되돌려 저장한다."""
+    df = for_output(df)
+    outfile = os.path.join(RESULT_DIR, f"{prefix}_{timestamp}.{output_format}")
+    if output_format == "csv":
+        df.to_csv(outfile, encoding="utf-8-sig", index=False)
+    elif output_format == "json":
+        df.to_json(outfile, orient="records", force_ascii=False, indent=1)
+    elif output_format == "parquet":
+        df.to_parquet(outfile, index=False)
     else:
-        ranked = filt.sort_values("total_score", ascending=False).copy()
-    return prefix, title, ranked
+        raise ValueError(f"지원하지 않는 출력 형식: {output_format}")
+    return outfile
 
 
 def run_single_strategy(df: pd.DataFrame, as_of: str, timestamp: str, choice: str):
+    from factor_model import make_stock_comments
+
     prefix, title, df_ranked = apply_strategy(df, choice)
 
     if df_ranked.empty:
@@ -273,48 +207,80 @@ def run_single_strategy(df: pd.DataFrame, as_of: str, timestamp: str, choice: st
     print(f"=== {title} 상위 종목 애널리스트 코멘트 ===")
     print("============================================================\n")
 
-    for i, (ticker, row) in enumerate(top.iterrows(), start=1):
+    for i, comment in enumerate(make_stock_comments(top), start=1):
         print(f"[{i}] ------------------------------------------")
-        print(make_stock_comment(row))
+        print(comment)
         print()
 
     os.makedirs(RESULT_DIR, exist_ok=True)
     outfile = os.path.join(RESULT_DIR, f"{prefix}_{timestamp}.csv")
     # 전략 14는 최종 요약본 50개만 저장, 나머지는 전체 저장
-    if choice == "14":
-        df_to_save = df_ranked.head(50).copy()
+    if choice == COMPOSITE_STRATEGY:
+        df_to_save = df_ranked.head(COMPOSITE_SAVE_TOP).copy()
     else:
         df_to_save = df_ranked
     df_to_save.to_csv(outfile, encoding="utf-8-sig", index=False)
     print(f"[INFO] 선택한 전략 '{title}' 리스트를 {outfile} 로 저장했습니다.")
 
 
-def run_all_strategies(df: pd.DataFrame, as_of: str, timestamp: str):
-    os.makedirs(RESULT_DIR, exist_ok=True)
-    for choice in [str(i) for i in range(1, 15)]:
-        prefix, title, df_ranked = apply_strategy(df, choice)
-
-        if df_ranked.empty:
+@stage("strategies")
+def run_all_strategies(df: pd.DataFrame, as_of: str, timestamp: str, save_csv: bool = SAVE_STRATEGY_CSV,
+                       choices=None, output_format: str | None = None, cache=None):
+    """1~14번(choices 를 주면 그 전략만) 전략 랭킹을 계산해 [(파일명, DataFrame)] 으로 돌려준다.
+    output_format(csv / json / parquet) 이면 RESULT_DIR 에 파일도 저장한다. None 이면 save_csv 에 따라 csv / none.
+    (반환값의 파일명은 업로드용 CSV 이름, upload_frames 에 그대로 넘긴다)
+    반환하는 랭킹은 compact_table 표현이고, write_ranking / upload_frames 가 출력 직전에 원래 스키마로 되돌린다.
+    cache(result_cache.ResultCache) 를 주면 저장된 전략 랭킹은 꺼내 쓰고, 새로 계산한 랭킹은 저장한다.
+    """
+    if output_format is None:
+        output_format = "csv" if save_csv else "none"
+    save = output_format != "none"
+    if save:
+        os.makedirs(RESULT_DIR, exist_ok=True)
+    results = []
+    # 베이스 필터/정렬은 한 번만, 전략 랭킹은 마스크 행렬 한 번으로 계산 (캐시에 없는 전략이 있을 때만 엔진 생성)
+    engine = None
+    for choice in (list(STRATEGY_INFO) if choices is None else choices):
+        prefix, title = STRATEGY_INFO[choice]
+        df_to_save = cache.ranking(choice) if cache is not None else None
+        if df_to_save is None:
+            if engine is None:
+                engine = StrategyEngine(df, choices=choices)
+            with stage("strategy_filter"):
+                _, _, df_ranked = engine.ranked(choice)
+            df_ranked = reorder_columns_for_output(df_ranked)
+            if choice == COMPOSITE_STRATEGY:
+                df_to_save = df_ranked.head(COMPOSITE_SAVE_TOP).copy()
+            else:
+                df_to_save = df_ranked
+            if cache is not None:
+                cache.save_ranking(choice, df_to_save)
+
+        if df_to_save.empty:
             print(f"[WARN] '{title}' 조건을 만족하는 종목이 없습니다. (전략 {choice})")
             continue
 
-        df_ranked = reorder_columns_for_output(df_ranked)
-
         # 기존 프로젝트
-        outfile = os.path.join(RESULT_DIR, f"{prefix}_{timestamp}.csv")
+        filename = f"{prefix}_{timestamp}.csv"
 
         # 자동화에 사용할 경로
         # outfile = Path(rf'C:\Users\ok\Desktop\BlogAlmighty\data\stock_propick\{datetime.today().strftime("%Y%m%d")}\{prefix}.csv')
         # outfile.parent.mkdir(parents=True, exist_ok=True)
 
-        if choice == "14":
-            df_to_save = df_ranked.head(50).copy()
+        # 업로드 때까지 들고 있는 랭킹만 compact 표현으로 보관 (CSV 는 지금 있는 원래 스키마 그대로 쓴다)
+        results.append((filename, compact_table(df_to_save)))
+
+        if save:
+            with stage("csv_write"):
+                outfile = write_ranking(df_to_save, prefix, timestamp, output_format)
+            print(f"[INFO] 전략 {choice} '{title}' 리스트를 {outfile} 로 저장했습니다.")
         else:
-            df_to_save = df_ranked
-        df_to_save.to_csv(outfile, encoding="utf-8-sig", index=False)
-        print(f"[INFO] 전략 {choice} '{title}' 리스트를 {outfile} 로 저장했습니다.")
+            print(f"[INFO] 전략 {choice} '{title}' 랭킹 완료 ({len(df_to_save)}종목)")
 
-    print("\n[INFO] 1~14번 모든 전략 CSV 저장을 완료했습니다.")
+    if save:
+        target = "1~14번 모든 전략" if choices is None else f"전략 {', '.join(choices)}"
+        print(f"\n[INFO] {target} {output_format.upper()} 저장을 완료했습니다.")
+    return results
 
 
 def select_strategy(df: pd.DataFrame, as_of: str, timestamp: str):
@@ -347,19 +313,85 @@ def select_strategy(df: pd.DataFrame, as_of: str, timestamp: str):
         print("잘못된 입력입니다. 0~14 중에서 선택해주세요.")
 
 
-def main():
-    as_of = get_recent_trading_date()
-    print(f"[INFO] 기준일(최근 영업일): {as_of}")
-
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-
-    df_raw = build_factor_table(as_of)
-    df = enrich_table(df_raw)
-
-    run_all_strategies(df, as_of, timestamp)
-    upload_and_insert()
-    # select_strategy(df, as_of, timestamp)
+def _strategy_list(value: str) -> list[str]:
+    choices = [c.strip() for c in value.split(",") if c.strip()]
+    unknown = [c for c in choices if c not in STRATEGY_INFO]
+    if not choices or unknown:
+        raise argparse.ArgumentTypeError(f"전략 번호는 1~14 입니다: {value}")
+    return choices
+
+
+def _yyyymmdd(value: str) -> str:
+    try:
+        datetime.strptime(value, "%Y%m%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"날짜는 YYYYMMDD 형식이어야 합니다: {value}") from None
+    return value
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Korea Quant ProPick 전략 랭킹 (1~14번 전략 계산 + 저장/업로드)")
+    parser.add_argument("--strategies", type=_strategy_list, default=None,
+                        help="실행할 전략 번호, 쉼표로 구분 (예: 1,5,14 / 기본: 1~14 전체)")
+    parser.add_argument("--as-of", type=_yyyymmdd, default=None,
+                        help="기준일 YYYYMMDD, 휴장일이면 직전 영업일 (기본: 최근 영업일)")
+    parser.add_argument("--no-upload", action="store_true", help="Supabase 업로드를 건너뛴다")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default=DEFAULT_OUTPUT_FORMAT,
+                        help=f"{RESULT_DIR}/ 에 저장할 형식 (기본: {DEFAULT_OUTPUT_FORMAT}, none 이면 저장 안 함)")
+    parser.add_argument("--refresh", action="store_true",
+                        help="결과 캐시를 쓰지 않고 다시 계산한다 (새 결과는 캐시에 덮어씀)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from data_loader import get_recent_trading_date, get_trading_date_on_or_before
+
+    # 단계별 시간/메모리/외부 호출 기록 -> traces/trace_rank_main_*.json
+    start_run("rank_main")
+    try:
+        if args.as_of:
+            as_of = get_trading_date_on_or_before(args.as_of)
+            print(f"[INFO] 기준일(지정 {args.as_of}): {as_of}")
+        else:
+            as_of = get_recent_trading_date()
+            print(f"[INFO] 기준일(최근 영업일): {as_of}")
+        annotate(as_of=as_of, strategies=args.strategies or list(STRATEGY_INFO))
+
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+
+        cache = None
+        if RESULT_CACHE_ENABLED:
+            from result_cache import ResultCache
+            cache = ResultCache(as_of, read=not args.refresh)
+        df = cache.table() if cache is not None else None
+        if df is not None:
+            print(f"[INFO] 결과 캐시 사용: 기준일 {as_of} 팩터 테이블 {len(df)}종목 (지문 {cache.fingerprint}, KRX 조회 생략)")
+            annotate(result_cache="hit")
+        else:
+            from factor_model import build_factor_table
+
+            df_raw = build_factor_table(as_of)
+            with stage("enrich"):
+                df = enrich_table(df_raw)
+            if cache is not None:
+                cache.save_table(df)
+                annotate(result_cache="miss")
+        annotate(universe_size=len(df))
+
+        results = run_all_strategies(df, as_of, timestamp, choices=args.strategies,
+                                     output_format=args.output_format, cache=cache)
+        if args.no_upload:
+            print("[INFO] --no-upload: 업로드를 건너뜁니다.")
+        else:
+            from upload_to_supabase import upload_frames
+            with stage("upload"):
+                # 기준일을 지정한 실행은 그 날짜로 올린다. (기본은 기존처럼 실행 당일)
+                upload_frames(results, ref_date=as_of if args.as_of else None)
+        # select_strategy(df, as_of, timestamp)
+    finally:
+        finish_run()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
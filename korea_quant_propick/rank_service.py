@@ -0,0 +1,309 @@
+# rank_service.py
+# 오늘 팩터 테이블을 메모리에 들고 있는 로컬 랭킹 서비스 (HTTP, 표준 라이브러리만 사용)
+# - 시작할 때 최근 영업일 기준 build_factor_table -> enrich_table 을 한 번 만들고,
+#   이후 질의는 StrategyEngine 으로 메모리에서만 계산한다. (기준값을 바꾼 엔진은 조합별로 캐시)
+# - 백그라운드 스레드가 RANK_SERVICE_CHECK_SEC 마다 최근 영업일을 확인해 날짜가 바뀌면 새 테이블로 교체한다.
+#   기준일이 그대로인 장중에는 가격 스냅샷만 다시 받아 가격 의존 팩터/점수만 갱신한다. (refresh_factor_table)
+#   (교체 중에도 이전 테이블로 계속 응답)
+#
+# 실행: python rank_service.py [--host 127.0.0.1] [--port 8765]
+#
+# GET /health                 기준일, 테이블 생성 시각, 종목 수
+# GET /strategies             전략 목록 + 기본 기준값(파라미터)
+# GET /rank?strategy=9        전략 랭킹 (기본 상위 TOP_N_TO_SHOW 개)
+#     &max_price=50000        기준값 변경: max_price / min_trading_value / min_volume / min_market_cap
+#                             (또는 MAX_PRICE_PER_SHARE 처럼 quant_config 이름 그대로)
+#     &filter=PER<=10         추가 조건 (컬럼 연산자 숫자, 여러 개 가능, 연산자: >= > <= < ==)
+#     &limit=50               반환할 종목 수
+# POST /refresh               기준일 확인 후 필요하면 즉시 다시 만들기 (?force=1 이면 무조건 전체,
+#                             ?intraday=1 이면 기준일이 그대로일 때 가격 의존 팩터만 증분 갱신)
+
+import argparse
+import json
+import math
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from quant_config import (
+    TOP_N_TO_SHOW,
+    RANK_SERVICE_HOST,
+    RANK_SERVICE_PORT,
+    RANK_SERVICE_CHECK_SEC,
+    RANK_SERVICE_INTRADAY_REFRESH,
+    RANK_SERVICE_INTRADAY_UNTIL,
+)
+from data_loader import get_recent_trading_date, to_yyyymmdd
+from factor_model import build_factor_table, refresh_factor_table
+from rank_main import enrich_table, reorder_columns_for_output
+from strategy_engine import STRATEGY_INFO, DEFAULT_PARAMS, StrategyEngine
+
+
+# 질의 문자열 이름 -> StrategyEngine 파라미터 이름
+PARAM_ALIASES = {
+    "max_price": "MAX_PRICE_PER_SHARE",
+    "min_trading_value": "MIN_TRADING_VALUE",
+    "min_volume": "MIN_VOLUME_SHARES",
+    "min_market_cap": "MIN_MARKET_CAP_WON",
+}
+MAX_LIMIT = 1000
+ENGINE_CACHE_SIZE = 64
+
+_FILTER_RE = re.compile(r"^\s*(.+?)\s*(>=|<=|==|>|<)\s*(-?[0-9.]+(?:[eE][-+]?[0-9]+)?)\s*$")
+
+
+class QueryError(ValueError):
+    """잘못된 질의 (HTTP 400)."""
+
+
+def _parse_number(key: str, raw: str) -> float:
+    """질의 숫자 값 -> float. nan / inf 는 조건이 전부 거짓이 되어 결과가 비므로 받지 않는다."""
+    try:
+        value = float(raw)
+    except ValueError:
+        raise QueryError(f"{key} 값은 숫자여야 합니다: {raw}") from None
+    if not math.isfinite(value):
+        raise QueryError(f"{key} 값은 유한한 숫자여야 합니다: {raw}")
+    return value
+
+
+def _json_safe(value):
+    """JSON 응답용 값: nan / inf 실수는 null 로 바꾼다. (json.dumps 는 표준이 아닌 NaN / Infinity 를 쓴다)"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    return value
+
+
+class Snapshot:
+    """한 기준일의 팩터 테이블 + 기준값 조합별 StrategyEngine 캐시."""
+
+    def __init__(self, as_of: str, df: pd.DataFrame, mode: str = "full"):
+        self.as_of = as_of
+        self.df = df
+        self.mode = mode            # full: 전체 생성 / intraday: 가격 의존 팩터만 증분 갱신
+        self.built_at = datetime.now()
+        self._engines: dict[tuple, StrategyEngine] = {}
+        self._lock = threading.Lock()
+
+    def engine(self, params: dict[str, float]) -> StrategyEngine:
+        key = tuple(sorted(params.items()))
+        with self._lock:
+            engine = self._engines.get(key)
+        if engine is None:
+            engine = StrategyEngine(self.df, params)
+            with self._lock:
+                if len(self._engines) >= ENGINE_CACHE_SIZE:
+                    self._engines.clear()
+                engine = self._engines.setdefault(key, engine)
+        return engine
+
+
+class RankingService:
+    def __init__(self, check_sec: float = RANK_SERVICE_CHECK_SEC):
+        self.check_sec = check_sec
+        self.snapshot: Snapshot | None = None
+        self._build_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # 테이블 생성 / 교체
+    # ------------------------------------------------------------------
+    def refresh(self, force: bool = False, intraday: bool = False) -> bool:
+        """최근 영업일이 바뀌었으면(또는 force) 테이블을 새로 만들어 교체한다. 교체했으면 True.
+        intraday 면 기준일이 그대로일 때 가격 의존 팩터만 증분 갱신해 교체한다.
+        """
+        with self._build_lock:
+            as_of = get_recent_trading_date()
+            current = self.snapshot
+            t0 = time.perf_counter()
+            if current is not None and current.as_of == as_of and not force:
+                if not intraday:
+                    return False
+                df = enrich_table(refresh_factor_table(current.df, as_of))
+                self.snapshot = Snapshot(as_of, df, mode="intraday")
+                print(f"[INFO] 랭킹 테이블 장중 갱신: 기준일 {as_of} ({time.perf_counter() - t0:.2f}초)")
+                return True
+            df = enrich_table(build_factor_table(as_of))
+            self.snapshot = Snapshot(as_of, df)
+            print(f"[INFO] 랭킹 테이블 준비 완료: 기준일 {as_of}, {len(df)}종목 ({time.perf_counter() - t0:.1f}초)")
+            return True
+
+    def _is_intraday(self) -> bool:
+        """기준일이 오늘이고 장 마감 갱신 시각 전이면 True."""
+        snap = self.snapshot
+        now = datetime.now()
+        return (RANK_SERVICE_INTRADAY_REFRESH and snap is not None
+                and snap.as_of == to_yyyymmdd(now) and now.strftime("%H%M") < RANK_SERVICE_INTRADAY_UNTIL)
+
+    def _watch(self):
+        while not self._stop.wait(self.check_sec):
+            try:
+                self.refresh(intraday=self._is_intraday())
+            except Exception as e:
+                print(f"[WARN] 기준일 확인/테이블 갱신 실패, 기존 테이블로 계속 응답합니다: {e}")
+
+    def start_watcher(self):
+        threading.Thread(target=self._watch, name="rank-refresh", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # 질의
+    # ------------------------------------------------------------------
+    def health(self) -> dict:
+        snap = self.snapshot
+        return {
+            "as_of": snap.as_of if snap else None,
+            "built_at": snap.built_at.isoformat(timespec="seconds") if snap else None,
+            "mode": snap.mode if snap else None,
+            "rows": len(snap.df) if snap else 0,
+        }
+
+    def strategies(self) -> dict:
+        return {
+            "strategies": [{"strategy": k, "prefix": prefix, "title": title}
+                           for k, (prefix, title) in STRATEGY_INFO.items()],
+            "params": DEFAULT_PARAMS,
+            "param_aliases": PARAM_ALIASES,
+        }
+
+    def rank(self, choice: str, params: dict[str, float] | None = None,
+             filters: list[tuple] | None = None, limit: int = TOP_N_TO_SHOW) -> dict:
+        snap = self.snapshot
+        if snap is None:
+            raise RuntimeError("랭킹 테이블이 아직 준비되지 않았습니다.")
+        if choice not in STRATEGY_INFO:
+            raise QueryError(f"지원하지 않는 전략: {choice}")
+
+        engine = snap.engine(params or {})
+        positions = engine.positions(choice)
+        if filters:
+            try:
+                extra = engine.where(filters)
+            except ValueError as e:
+                raise QueryError(str(e)) from None
+            positions = positions[extra[positions]]
+
+        prefix, title = STRATEGY_INFO[choice]
+        top = reorder_columns_for_output(snap.df.iloc[positions[:limit]])
+        return {
+            "as_of": snap.as_of,
+            "strategy": choice,
+            "title": title,
+            "params": {**DEFAULT_PARAMS, **(params or {})},
+            "filters": [f"{c}{op}{v}" for c, op, v in (filters or [])],
+            "matched": int(len(positions)),
+            "rows": json.loads(top.to_json(orient="records", force_ascii=False)),
+        }
+
+
+def parse_rank_query(query: dict[str, list[str]]) -> tuple[str, dict, list, int]:
+    """/rank 질의 문자열 -> (전략, 기준값, 추가 조건, limit)."""
+    choice = (query.get("strategy") or ["1"])[-1]
+
+    params = {}
+    for key, values in query.items():
+        name = PARAM_ALIASES.get(key, key if key in DEFAULT_PARAMS else None)
+        if name is None:
+            continue
+        params[name] = _parse_number(key, values[-1])
+
+    filters = []
+    for raw in query.get("filter", []):
+        m = _FILTER_RE.match(raw)
+        if not m:
+            raise QueryError(f"filter 형식은 '컬럼 연산자 숫자' 입니다 (예: PER<=10): {raw}")
+        filters.append((m.group(1), m.group(2), _parse_number(m.group(1), m.group(3))))
+
+    try:
+        limit = int((query.get("limit") or [TOP_N_TO_SHOW])[-1])
+    except ValueError:
+        raise QueryError("limit 값은 정수여야 합니다.") from None
+    return choice, params, filters, max(0, min(limit, MAX_LIMIT))
+
+
+def make_handler(service: RankingService):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: dict):
+            data = json.dumps(_json_safe(body), ensure_ascii=False, allow_nan=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _handle(self, fn):
+            t0 = time.perf_counter()
+            try:
+                body = fn()
+                status = 200
+            except QueryError as e:
+                body, status = {"error": str(e)}, 400
+            except Exception as e:
+                body, status = {"error": str(e)}, 503
+            body["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            self._send(status, body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/health":
+                self._handle(service.health)
+            elif url.path == "/strategies":
+                self._handle(service.strategies)
+            elif url.path == "/rank":
+                self._handle(lambda: service.rank(*parse_rank_query(query)))
+            else:
+                self._send(404, {"error": f"없는 경로: {url.path}"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path == "/refresh":
+                query = parse_qs(url.query)
+                force = (query.get("force") or ["0"])[-1] == "1"
+                intraday = (query.get("intraday") or ["0"])[-1] == "1"
+                self._handle(lambda: {"rebuilt": service.refresh(force=force, intraday=intraday),
+                                      **service.health()})
+            else:
+                self._send(404, {"error": f"없는 경로: {url.path}"})
+
+        def log_message(self, format, *args):
+            # 요청마다 찍히는 기본 접근 로그는 생략
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Korea Quant ProPick 로컬 랭킹 서비스")
+    parser.add_argument("--host", default=RANK_SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=RANK_SERVICE_PORT)
+    args = parser.parse_args()
+
+    service = RankingService()
+    service.refresh()
+    service.start_watcher()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"[INFO] 랭킹 서비스 시작: http://{args.host}:{args.port}/rank?strategy=1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
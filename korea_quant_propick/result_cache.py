@@ -0,0 +1,140 @@
+# result_cache.py
+# rank_main 결과 캐시 (같은 날 재시도 / 수동 재실행용)
+# - 키: 기준일(as_of) + 지문(quant_config 상수 전체, 전략 정의, 이 폴더의 .py 소스, pandas/numpy 버전)
+#   설정·전략·코드 중 하나라도 바뀌면 지문이 달라져 저장된 결과는 쓰지 않고 새로 계산한다.
+# - 내용: enrich_table 까지 마친 팩터 테이블 + 전략별 최종 랭킹(저장/업로드하는 DataFrame), Parquet
+#   CACHE_DIR/RESULT_CACHE_DIR/{as_of}/{지문}/table.parquet, strategy_{번호}.parquet
+# - 오늘 기준일 결과는 RESULT_CACHE_CLOSE_HHMM 이후에 만든 것만 저장한다. (장중 값은 계속 바뀌므로)
+# - 기준일 폴더는 최근 RESULT_CACHE_KEEP_DAYS 개만 남기고, 같은 기준일의 다른 지문 결과는 지운다.
+
+import hashlib
+import os
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import quant_config
+from quant_config import (
+    CACHE_DIR,
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_CLOSE_HHMM,
+    RESULT_CACHE_KEEP_DAYS,
+)
+import strategy_engine
+
+
+# 지문에 넣는 strategy_engine 의 전략 정의
+STRATEGY_DEFINITIONS = (
+    "STRATEGY_INFO",
+    "DEFAULT_PARAMS",
+    "BASE_RULES",
+    "BASE_FALLBACK_RULES",
+    "STRATEGY_RULES",
+    "COMPOSITE_STRATEGY",
+    "COMPOSITE_SOURCES",
+    "COMPOSITE_TOP_PER_SOURCE",
+    "COMPOSITE_SAVE_TOP",
+    "SORT_COLUMN",
+)
+SOURCE_DIR = Path(__file__).resolve().parent
+
+
+def result_fingerprint(ignore: tuple[str, ...] = ()) -> str:
+    """설정 상수 / 전략 정의 / 소스 코드 / 라이브러리 버전의 해시 (16자리).
+    ignore 로 시작하는 이름의 설정 상수는 빼고 계산한다. (결과에 영향이 없는 설정용)"""
+    h = hashlib.sha256()
+    for name in sorted(n for n in vars(quant_config) if n.isupper() and not n.startswith(ignore)):
+        h.update(f"{name}={getattr(quant_config, name)!r}\n".encode())
+    for name in STRATEGY_DEFINITIONS:
+        h.update(f"{name}={getattr(strategy_engine, name)!r}\n".encode())
+    for path in sorted(SOURCE_DIR.glob("*.py")):
+        h.update(path.name.encode())
+        h.update(path.read_bytes())
+    h.update(f"python={sys.version_info[:2]} pandas={pd.__version__} numpy={np.__version__}".encode())
+    return h.hexdigest()[:16]
+
+
+def is_final(as_of: str) -> bool:
+    """as_of 의 결과가 확정됐는지: 지난 기준일이거나, 오늘 기준일이면 RESULT_CACHE_CLOSE_HHMM 이후."""
+    now = datetime.now()
+    return as_of < now.strftime("%Y%m%d") or now.strftime("%H%M") >= RESULT_CACHE_CLOSE_HHMM
+
+
+class ResultCache:
+    """기준일 하나의 결과 캐시. read=False 면 읽지 않고 새로 계산한 결과로 덮어쓰기만 한다."""
+
+    def __init__(self, as_of: str, read: bool = True, root: str | Path | None = None):
+        self.as_of = as_of
+        self.read = read
+        self.fingerprint = result_fingerprint()
+        self.root = Path(root) if root is not None else Path(CACHE_DIR) / RESULT_CACHE_DIR
+        self.dir = self.root / as_of / self.fingerprint
+        self._warned = False
+
+    @property
+    def writable(self) -> bool:
+        """확정된 결과인지 (is_final)."""
+        return is_final(self.as_of)
+
+    # ------------------------------------------------------------------
+    # 읽기 / 쓰기
+    # ------------------------------------------------------------------
+    def _load(self, name: str) -> pd.DataFrame | None:
+        path = self.dir / f"{name}.parquet"
+        if not self.read or not path.exists():
+            return None
+        try:
+            return pd.read_parquet(path)
+        except Exception as e:
+            print(f"[WARN] 결과 캐시를 읽지 못해 다시 계산합니다 ({path}): {e}")
+            return None
+
+    def _save(self, name: str, df: pd.DataFrame):
+        if not self.writable:
+            if not self._warned:
+                print(f"[INFO] 장 마감({RESULT_CACHE_CLOSE_HHMM}) 전 오늘 기준일 결과라 결과 캐시에 저장하지 않습니다.")
+                self._warned = True
+            return
+        self.dir.mkdir(parents=True, exist_ok=True)
+        path = self.dir / f"{name}.parquet"
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            df.to_parquet(tmp)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"[WARN] 결과 캐시 저장 실패 ({path}): {e}")
+            if tmp.exists():
+                tmp.unlink()
+
+    def table(self) -> pd.DataFrame | None:
+        """enrich_table 까지 마친 팩터 테이블 (없으면 None)."""
+        return self._load("table")
+
+    def save_table(self, df: pd.DataFrame):
+        self._save("table", df)
+        if self.writable:
+            self._prune()
+
+    def ranking(self, choice: str) -> pd.DataFrame | None:
+        """전략 choice 의 최종 랭킹 (없으면 None, 조건 통과 종목이 없던 전략은 빈 DataFrame)."""
+        return self._load(f"strategy_{choice}")
+
+    def save_ranking(self, choice: str, df: pd.DataFrame):
+        self._save(f"strategy_{choice}", df)
+
+    # ------------------------------------------------------------------
+    # 정리
+    # ------------------------------------------------------------------
+    def _prune(self):
+        """같은 기준일의 다른 지문 결과와 오래된 기준일 폴더를 지운다."""
+        for old in (self.root / self.as_of).iterdir():
+            if old.is_dir() and old.name != self.fingerprint:
+                shutil.rmtree(old, ignore_errors=True)
+        days = sorted(p for p in self.root.iterdir() if p.is_dir())
+        for old in days[:-RESULT_CACHE_KEEP_DAYS]:
+            if old.name != self.as_of:
+                shutil.rmtree(old, ignore_errors=True)
@@ -0,0 +1,141 @@
+# strategy_backtest.py
+# rank_main 1~14번 전략 동시 백테스트
+# - 리밸런싱 날짜마다 팩터 테이블은 한 번만 만들고, StrategyEngine 하나로 14개 전략 + 기본 포트폴리오
+#   (backtest.run_backtest 와 같은 '유동성 필터 + total_score 상위 N')를 모두 고른다.
+# - 모든 포트폴리오 종목의 합집합에 대해 구간 수익률을 한 번만 계산하고(같은 가격 패널),
+#   전략별 동일비중 수익률 / 자산 곡선 / 성과 요약을 한 표로 출력한다.
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from quant_config import (
+    BACKTEST_START_DATE,
+    BACKTEST_END_DATE,
+    BACKTEST_TOP_N,
+    BACKTEST_WORKERS,
+    INITIAL_CAPITAL,
+)
+from data_loader import make_shared_rate_state
+from factor_model import build_factor_table
+from backtest import (
+    SELECT_COLUMNS,
+    build_rebalance_dates,
+    load_backtest_panel,
+    period_returns,
+    select_from_factors,
+    _init_worker,
+)
+from rank_main import ENRICH_COLUMNS, enrich_table
+from strategy_engine import STRATEGY_INFO, StrategyEngine, required_columns
+from weight_sweep import sweep_metrics
+
+
+BASELINE = "기본"
+ALL_STRATEGIES = list(STRATEGY_INFO)
+
+
+def _label(choice: str) -> str:
+    return BASELINE if choice == BASELINE else f"전략{choice}"
+
+
+def select_strategy_portfolios(reb_date: str, choices=None) -> dict[str, list[str]]:
+    """리밸런싱 날짜의 전략별 편입 종목 (각 전략 랭킹 상위 BACKTEST_TOP_N, 기본 포트폴리오 포함)."""
+    if choices is None:
+        choices = ALL_STRATEGIES
+    factors = build_factor_table(reb_date, columns=SELECT_COLUMNS + ENRICH_COLUMNS + required_columns(choices))
+    portfolios = {BASELINE: select_from_factors(factors) or []}
+
+    df = enrich_table(factors)
+    engine = StrategyEngine(df)
+    for choice in choices:
+        portfolios[choice] = list(df.index[engine.top_k(choice, BACKTEST_TOP_N)])
+    return portfolios
+
+
+def _select_all(reb_dates: list[str], choices, workers: int, panel_range) -> list[dict[str, list[str]]]:
+    if workers <= 1:
+        return [select_strategy_portfolios(d, choices) for d in reb_dates]
+    print(f"[INFO] 병렬 모드: 워커 {workers}개로 리밸런싱 시점별 전략 종목 선택")
+    shared_rate_state = make_shared_rate_state()
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(shared_rate_state, panel_range)) as pool:
+        return list(pool.map(select_strategy_portfolios, reb_dates, [choices] * len(reb_dates)))
+
+
+def run_strategy_backtest(choices=None, workers: int | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """전략별 월간 리밸런싱 백테스트를 한 번에 실행한다.
+
+    반환값: (리밸런싱별 전략 자산 곡선 표, 전략별 성과 요약 표)
+    기본 포트폴리오 열은 run_backtest 결과와 같다.
+    """
+    if choices is None:
+        choices = ALL_STRATEGIES
+    if workers is None:
+        workers = BACKTEST_WORKERS
+
+    rebalance_dates = build_rebalance_dates(BACKTEST_START_DATE, BACKTEST_END_DATE)
+    if len(rebalance_dates) < 2:
+        raise RuntimeError("백테스트 결과가 없습니다.")
+    print("[INFO] 리밸런싱 날짜 목록:")
+    print(rebalance_dates)
+
+    panel, panel_range = load_backtest_panel(rebalance_dates)
+    selections = _select_all(rebalance_dates[:-1], choices, workers, panel_range)
+
+    keys = [BASELINE] + list(choices)
+    n_periods = len(rebalance_dates) - 1
+    returns = np.zeros((n_periods, len(keys)))
+    positions = np.zeros((n_periods, len(keys)), dtype=int)
+
+    for i, portfolios in enumerate(selections):
+        reb_date, next_date = rebalance_dates[i], rebalance_dates[i + 1]
+        # 모든 전략 종목의 합집합에 대해 구간 수익률을 한 번만 계산
+        union = list(dict.fromkeys(t for key in keys for t in portfolios[key]))
+        rets = pd.Series(period_returns(union, reb_date, next_date, panel), index=union, dtype=float)
+        for j, key in enumerate(keys):
+            r = rets.reindex(portfolios[key]).dropna()
+            positions[i, j] = len(r)
+            returns[i, j] = float(r.mean()) if len(r) else 0.0
+
+    labels = [_label(k) for k in keys]
+    equity = INITIAL_CAPITAL * np.cumprod(1.0 + returns, axis=0)
+    curve = pd.DataFrame(equity, columns=labels)
+    curve.insert(0, "next_date", rebalance_dates[1:])
+    curve.insert(0, "rebalance_date", rebalance_dates[:-1])
+
+    metrics = sweep_metrics(returns, rebalance_dates[0], rebalance_dates[-1])
+    summary = pd.DataFrame({
+        "전략": labels,
+        "전략명": [BASELINE + "(유동성+total_score)" if k == BASELINE else STRATEGY_INFO[k][1] for k in keys],
+        "final_equity": equity[-1],
+        **metrics,
+        "avg_positions": positions.mean(axis=0),
+    })
+
+    _print_summary(summary, rebalance_dates[0], rebalance_dates[-1])
+
+    end_label = BACKTEST_END_DATE or "LATEST"
+    outfile = f"strategy_backtest_{BACKTEST_START_DATE}_{end_label}.csv"
+    curve.to_csv(outfile, encoding="utf-8-sig", index=False)
+    summary_file = f"strategy_backtest_summary_{BACKTEST_START_DATE}_{end_label}.csv"
+    summary.to_csv(summary_file, encoding="utf-8-sig", index=False)
+    print(f"[INFO] 전략별 자산 곡선을 {outfile}, 요약을 {summary_file} 로 저장했습니다.")
+    return curve, summary
+
+
+def _print_summary(summary: pd.DataFrame, start_date: str, end_date: str):
+    print("\n==============================")
+    print("=== 전략별 백테스트 결과 요약 ===")
+    print("==============================\n")
+    print(f"백테스트 기간: {start_date} ~ {end_date}, 전략별 상위 {BACKTEST_TOP_N}종목 동일비중\n")
+    for row in summary.itertuples(index=False):
+        print(f"{row.전략:>6} {row.전략명:<22} | 총수익률 {row.total_return*100:8.2f}% | "
+              f"CAGR {row.cagr*100:7.2f}% | MDD {row.mdd*100:7.2f}% | 승률 {row.winrate*100:5.1f}% | "
+              f"평균 {row.avg_positions:4.1f}종목")
+
+
+if __name__ == "__main__":
+    run_strategy_backtest()
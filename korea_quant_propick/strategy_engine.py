@@ -0,0 +1,332 @@
+# strategy_engine.py
+# 1~14번 전략을 '데이터'로 선언하고, 팩터 테이블 한 번에 대해 한꺼번에 평가하는 엔진
+# - 공통 베이스(유동성/거래량/가격/시총) 마스크는 한 번만 계산
+# - 전략별 조건은 (컬럼, 연산자, 기준값) 목록으로 선언 → 같은 조건은 한 번만 계산해
+#   (종목 수 × 전략 수) 불리언 마스크 행렬로 컴파일
+# - total_score 정렬은 베이스 전체에 대해 한 번만 하고, 전략별 랭킹은 마스크로 걸러서 얻는다
+# - 상위 k개만 필요하면 부분 정렬(argpartition) 사용, 전략 결과는 메모이즈
+
+import operator
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from quant_config import (
+    MIN_TRADING_VALUE,
+    MIN_VOLUME_SHARES,
+    MAX_PRICE_PER_SHARE,
+    MIN_MARKET_CAP_WON,
+)
+
+
+STRATEGY_INFO: dict[str, tuple[str, str]] = {
+    "1": ("전략 1 멀티팩터 균형형 추천", "멀티팩터 균형형 추천주"),
+    "2": ("전략 2 가치주 중심 추천", "가치주 중심 추천주"),
+    "3": ("전략 3 퀄리티 배당주 추천", "퀄리티/배당주 추천주"),
+    "4": ("전략 4 모멘텀 추세 추종 추천", "모멘텀 추세 추종 추천주"),
+    "5": ("전략 5 저위험 대형주 방어형 추천", "저위험 대형주 방어형 추천주"),
+    "6": ("전략 6 소형주 하이모멘텀 스윙 추천", "소형주 하이모멘텀 스윙 추천주"),
+    "7": ("전략 7 고배당 방어형 추천", "고배당 방어형 추천주"),
+    "8": ("전략 8 딥밸류 리레이팅 기대주", "딥밸류 리레이팅 기대주"),
+    "9": ("전략 9 우상향 단기조정 매수후보", "우상향 중 단기조정 매수候보"),
+    "10": ("전략 10 퀄리티 성장 모멘텀주", "퀄리티 성장 모멘텀주"),
+    "11": ("전략 11 단기 스캘핑 1% 타겟", "단기 스캘핑 1% 타겟候보"),
+    "12": ("전략 12 단기 스캘핑 고확률", "단기 스캘핑 고확률候보"),
+    "13": ("전략 13 단기 눌림목 매수", "단기 눌림목 매수候보"),
+    "14": ("전략 14 오늘 최적 종합 추천", "오늘 최적 종합 추천주"),
+}
+
+
+class Param(NamedTuple):
+    """기준값을 상수 대신 파라미터(기본값: quant_config)로 지정할 때 사용. 값 = params[name] * mult"""
+    name: str
+    mult: float = 1
+
+
+DEFAULT_PARAMS: dict[str, float] = {
+    "MIN_TRADING_VALUE": MIN_TRADING_VALUE,
+    "MIN_VOLUME_SHARES": MIN_VOLUME_SHARES,
+    "MAX_PRICE_PER_SHARE": MAX_PRICE_PER_SHARE,
+    "MIN_MARKET_CAP_WON": MIN_MARKET_CAP_WON,
+}
+
+# 기본 베이스: 유동성(거래대금) + 거래량(10만주 이상) + 1주당 가격(7만원 이하) + 시총(3000억 이상) 필터
+BASE_RULES = [
+    ("거래대금", ">=", Param("MIN_TRADING_VALUE")),
+    ("거래량", ">=", Param("MIN_VOLUME_SHARES")),
+    ("종가", "<=", Param("MAX_PRICE_PER_SHARE")),
+    ("시가총액", ">=", Param("MIN_MARKET_CAP_WON")),
+]
+# 유동성 기준을 통과하는 종목이 전혀 없을 때: 거래대금 필터만 제거
+BASE_FALLBACK_RULES = BASE_RULES[1:]
+
+# 전략별 추가 조건 (베이스 위에 AND)
+STRATEGY_RULES: dict[str, list[tuple]] = {
+    "1": [],
+    "2": [("value_score", ">=", 60)],
+    "3": [("quality_score", ">=", 60)],
+    "4": [("mom_12m", ">", 0)],
+    "5": [
+        ("시가총액", ">=", 5_000_000_000_000),
+        ("risk_score", "<=", 40),
+    ],
+    "6": [
+        ("시가총액", "<", 5_000_000_000_000),
+        ("momentum_score", ">=", 60),
+    ],
+    "7": [
+        ("DIV", ">=", 3.0),
+        ("risk_score", "<=", 60),
+        ("시가총액", ">=", 1_000_000_000_000),
+    ],
+    "8": [
+        ("value_score", ">=", 60),
+        ("mom_12m", ">=", 0),
+    ],
+    "9": [
+        ("mom_12m", ">=", 20),
+        ("mom_3m", "<=", 0),
+    ],
+    "10": [
+        ("quality_score", ">=", 70),
+        ("momentum_score", ">=", 60),
+    ],
+    # 11: 초고유동성 + 단기 모멘텀 5~40% + 리스크 40~80
+    "11": [
+        ("거래대금", ">=", Param("MIN_TRADING_VALUE", 3)),
+        ("mom_3m", ">=", 5),
+        ("mom_3m", "<=", 40),
+        ("risk_score", ">=", 40),
+        ("risk_score", "<=", 80),
+    ],
+    # 12: 슈퍼유동성 + 완만한 우상향 + 중저위험 + 퀄리티 필터
+    "12": [
+        ("거래대금", ">=", Param("MIN_TRADING_VALUE", 5)),
+        ("mom_12m", ">=", 10),
+        ("mom_12m", "<=", 60),
+        ("mom_3m", ">=", 3),
+        ("mom_3m", "<=", 25),
+        ("risk_score", ">=", 20),
+        ("risk_score", "<=", 60),
+        ("quality_score", ">=", 50),
+    ],
+    # 13: 단기 눌림목 매수
+    # - 최근 12개월은 상승 추세 (15%~80%)
+    # - 최근 3개월은 과도한 급등은 아니고, -15% ~ +5% 구간의 적당한 조정
+    # - 거래대금은 기본 유동성 기준보다 2배 이상
+    # - 리스크는 너무 낮지도/높지도 않은 중간 구간
+    "13": [
+        ("거래대금", ">=", Param("MIN_TRADING_VALUE", 2)),
+        ("mom_12m", ">=", 15),
+        ("mom_12m", "<=", 80),
+        ("mom_3m", ">=", -15),
+        ("mom_3m", "<=", 5),
+        ("risk_score", ">=", 20),
+        ("risk_score", "<=", 70),
+    ],
+}
+
+# 전략 14: 2~13번 전략 각각의 상위 후보를 모아 합집합(중복 제거)을 만들고
+# 거래량 많은 순(동률 시 total_score 순)으로 정렬하는 최종 종합 전략
+COMPOSITE_STRATEGY = "14"
+COMPOSITE_SOURCES = [str(i) for i in range(2, 14)]
+COMPOSITE_TOP_PER_SOURCE = 80
+COMPOSITE_SAVE_TOP = 50
+
+SORT_COLUMN = "total_score"
+
+
+def strategy_columns(choice: str, ranked: bool = True) -> list[str]:
+    """전략이 읽는 팩터 테이블 컬럼 (베이스 조건 + 전략 조건 [+ 정렬 기준]).
+    factor_model.build_factor_table(as_of, columns=...) 에 넘기면 이 전략에 필요한 것만 수집/계산한다.
+    ranked=False 면 마스크(조건 통과 여부)만 필요한 경우로, 정렬 기준(total_score)을 빼고 돌려준다.
+    """
+    if choice not in STRATEGY_INFO:
+        raise ValueError("지원하지 않는 전략 코드")
+    if choice == COMPOSITE_STRATEGY:
+        cols = [c for sub in COMPOSITE_SOURCES for c in strategy_columns(sub, ranked)]
+        return list(dict.fromkeys(cols + ["거래량", SORT_COLUMN]))
+    cols = [col for col, _, _ in BASE_RULES + STRATEGY_RULES[choice]]
+    if ranked:
+        cols.append(SORT_COLUMN)
+    return list(dict.fromkeys(cols))
+
+
+def required_columns(choices=None, ranked: bool = True) -> list[str]:
+    """여러 전략이 읽는 컬럼의 합집합 (choices 가 None 이면 1~14 전체)."""
+    if choices is None:
+        choices = list(STRATEGY_INFO)
+    return list(dict.fromkeys(c for choice in choices for c in strategy_columns(choice, ranked)))
+
+
+def _compile_targets(choices) -> list[str]:
+    targets = set()
+    for choice in choices:
+        if choice not in STRATEGY_INFO:
+            raise ValueError("지원하지 않는 전략 코드")
+        targets.update(COMPOSITE_SOURCES if choice == COMPOSITE_STRATEGY else [choice])
+    return [choice for choice in STRATEGY_RULES if choice in targets]
+
+
+_OPS = {
+    ">=": operator.ge,
+    ">": operator.gt,
+    "<=": operator.le,
+    "<": operator.lt,
+    "==": operator.eq,
+}
+
+
+class StrategyEngine:
+    """팩터 테이블 하나에 대해 모든 전략을 한 번에 평가한다.
+
+    - masks: (종목 수 × len(strategies)) 불리언 행렬, 베이스 마스크까지 AND 된 상태
+    - ranked(choice): 기존 apply_strategy 와 같은 (prefix, title, 정렬된 DataFrame)
+    """
+
+    def __init__(self, df: pd.DataFrame, params: dict | None = None, choices=None):
+        self.df = df
+        self.params = {**DEFAULT_PARAMS, **(params or {})}
+        self._arrays: dict[str, np.ndarray] = {}
+        self._conds: dict[tuple, np.ndarray] = {}
+        self._positions: dict[str, np.ndarray] = {}
+        self._order: np.ndarray | None = None
+        self._key: np.ndarray | None = None
+
+        self.base = self._all(BASE_RULES)
+        if not self.base.any():
+            print("[WARN] 유동성 필터 통과 종목이 없어 거래대금 필터를 제거하고 거래량+가격+시총 필터만 적용합니다.")
+            self.base = self._all(BASE_FALLBACK_RULES)
+
+        # choices 를 주면 그 전략(전략 14 는 2~13 포함)만 컴파일한다. (strategy_columns 컬럼만 있는 테이블용)
+        self.strategies = list(STRATEGY_RULES) if choices is None else _compile_targets(choices)
+        self.masks = np.empty((len(df), len(self.strategies)), dtype=bool)
+        for j, choice in enumerate(self.strategies):
+            self.masks[:, j] = self.base & self._all(STRATEGY_RULES[choice])
+
+    # ------------------------------------------------------------------
+    # 마스크 컴파일
+    # ------------------------------------------------------------------
+    def _array(self, col: str) -> np.ndarray:
+        arr = self._arrays.get(col)
+        if arr is None:
+            arr = self.df[col].to_numpy(dtype=float, na_value=np.nan)
+            self._arrays[col] = arr
+        return arr
+
+    def _value(self, value) -> float:
+        if isinstance(value, Param):
+            return self.params[value.name] * value.mult
+        return value
+
+    def _cond(self, rule: tuple) -> np.ndarray:
+        col, op, value = rule
+        key = (col, op, self._value(value))
+        mask = self._conds.get(key)
+        if mask is None:
+            with np.errstate(invalid="ignore"):
+                mask = _OPS[op](self._array(col), key[2])
+            self._conds[key] = mask
+        return mask
+
+    def _all(self, rules: list[tuple]) -> np.ndarray:
+        mask = np.ones(len(self.df), dtype=bool)
+        for rule in rules:
+            mask &= self._cond(rule)
+        return mask
+
+    def mask(self, choice: str) -> np.ndarray:
+        return self.masks[:, self.strategies.index(choice)]
+
+    def where(self, rules: list[tuple]) -> np.ndarray:
+        """추가 조건 목록 [(컬럼, 연산자, 기준값)] 의 AND 마스크 (전략 마스크에 더 걸러낼 때 사용)."""
+        for col, op, _ in rules:
+            if op not in _OPS:
+                raise ValueError(f"지원하지 않는 연산자: {op}")
+            if col not in self.df.columns:
+                raise ValueError(f"팩터 테이블에 없는 컬럼: {col}")
+            if not pd.api.types.is_numeric_dtype(self.df[col]):
+                raise ValueError(f"숫자 컬럼이 아닙니다: {col}")
+        return self._all(rules)
+
+    # ------------------------------------------------------------------
+    # 정렬 / 선택
+    # ------------------------------------------------------------------
+    def _sort_key(self) -> np.ndarray:
+        # 내림차순 정렬용 키. NaN 은 맨 뒤로 (pandas sort_values 와 동일)
+        if self._key is None:
+            key = -self._array(SORT_COLUMN)
+            self._key = np.where(np.isnan(key), np.inf, key)
+        return self._key
+
+    def _global_order(self) -> np.ndarray:
+        """베이스 종목 전체를 total_score 내림차순으로 한 번만 정렬 (동점은 원래 순서 유지)."""
+        if self._order is None:
+            key = self._sort_key()
+            order = np.argsort(key, kind="stable")
+            self._order = order[self.base[order]]
+        return self._order
+
+    def positions(self, choice: str) -> np.ndarray:
+        """전략 랭킹 순서대로의 행 번호 (메모이즈)."""
+        pos = self._positions.get(choice)
+        if pos is not None:
+            return pos
+        if choice == COMPOSITE_STRATEGY:
+            pos = self._composite_positions()
+        else:
+            order = self._global_order()
+            pos = order[self.mask(choice)[order]]
+        self._positions[choice] = pos
+        return pos
+
+    def top_k(self, choice: str, k: int) -> np.ndarray:
+        """전략 상위 k개 행 번호. 전체 랭킹이 아직 없으면 부분 정렬로 k개만 정렬한다."""
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
+        pos = self._positions.get(choice)
+        if pos is not None or choice == COMPOSITE_STRATEGY:
+            return self.positions(choice)[:k]
+
+        cand = np.flatnonzero(self.mask(choice))
+        if len(cand) <= k:
+            return self.positions(choice)[:k]
+        key = self._sort_key()[cand]
+        kth = np.partition(key, k - 1)[k - 1]
+        # 경계값과 같은 종목은 원래 순서대로 채워 전체 정렬 후 head(k) 와 같은 결과를 만든다.
+        above = cand[key < kth]
+        ties = cand[key == kth][: k - len(above)]
+        top = np.concatenate([above, ties])
+        return top[np.lexsort((top, self._sort_key()[top]))]
+
+    def _composite_positions(self) -> np.ndarray:
+        candidates = [self.top_k(sub, COMPOSITE_TOP_PER_SOURCE) for sub in COMPOSITE_SOURCES]
+        candidates = [c for c in candidates if len(c)]
+        if candidates:
+            combined = np.concatenate(candidates)
+            # 동일 종목(티커)은 처음 등장한 위치만 사용
+            _, first = np.unique(combined, return_index=True)
+            pos = combined[np.sort(first)]
+        else:
+            # 어떤 전략도 후보를 내지 못한 극단적 상황이면 전체 유니버스를 사용
+            pos = np.arange(len(self.df))
+
+        if "거래량" not in self.df.columns:
+            key = self._sort_key()[pos]
+            return pos[np.argsort(key, kind="stable")]
+        volume = -self._array("거래량")[pos]
+        volume = np.where(np.isnan(volume), np.inf, volume)
+        # np.lexsort 는 마지막 키가 1순위: 거래량 내림차순, 동률 시 total_score 내림차순
+        return pos[np.lexsort((self._sort_key()[pos], volume))]
+
+    def ranked(self, choice: str) -> tuple[str, str, pd.DataFrame]:
+        if choice not in STRATEGY_INFO:
+            raise ValueError("지원하지 않는 전략 코드")
+        prefix, title = STRATEGY_INFO[choice]
+        return prefix, title, self.df.iloc[self.positions(choice)]
+
+    def rank_all(self, choices=None) -> dict[str, tuple[str, str, pd.DataFrame]]:
+        if choices is None:
+            choices = list(STRATEGY_INFO)
+        return {choice: self.ranked(choice) for choice in choices}
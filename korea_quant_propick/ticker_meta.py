@@ -0,0 +1,191 @@
+# ticker_meta.py
+# 종목 메타데이터 저장소 (종목명 / 시장 / 업종 / 상장주식수 / 최초·최종 확인일 / 정수 코드)
+# - 거래일 단위로 코스피/코스닥 업종분류 + 시가총액 스냅샷을 시장별 1회씩 받아 한 번에 갱신
+# - CACHE_DIR 아래 Parquet 한 파일로 저장, 이후 실행에서는 네트워크 호출 없이 재사용
+# - 티커 배열을 받아 한 번에 조회(names_for / lookup / codes_for)
+
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from quant_config import CACHE_DIR
+from data_loader import (
+    fetch_market_cap,
+    fetch_sector_classifications,
+    fetch_ticker_name,
+    run_concurrently,
+)
+
+
+META_FILE = "ticker_meta.parquet"
+META_MARKETS = ("KOSPI", "KOSDAQ")
+META_COLUMNS = ["code", "종목명", "시장", "업종명", "상장주식수", "최초확인일", "최종확인일"]
+
+
+def _as_index(tickers) -> pd.Index:
+    """티커 배열 -> pd.Index (이미 Index 면 그대로, 문자열 배열을 파이썬 리스트로 풀지 않는다)."""
+    return tickers if isinstance(tickers, pd.Index) else pd.Index(list(tickers))
+
+
+class TickerMetaStore:
+    """티커(index) -> 메타데이터 테이블.
+
+    code 는 처음 본 순서대로 0부터 붙는 int32 이며, 한 번 붙은 코드는 바뀌지 않는다.
+    (종목 배열을 정수 배열로 압축해 들고 다닐 때 사용, compact.py)
+    assign_codes 로 코드만 붙인 행은 최초확인일이 비어 있고, 다음 일괄 갱신에서 메타데이터가 채워진다.
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path) if path is not None else Path(CACHE_DIR) / META_FILE
+        self.table = self._load()
+        self._lock = threading.Lock()
+
+    def _load(self) -> pd.DataFrame:
+        if self.path.exists():
+            try:
+                return pd.read_parquet(self.path)
+            except Exception as e:
+                print(f"[WARN] 종목 메타데이터 파일을 읽지 못해 새로 만듭니다: {e}")
+        empty = pd.DataFrame(columns=META_COLUMNS)
+        empty.index.name = "티커"
+        return empty
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        self.table.to_parquet(tmp)
+        os.replace(tmp, self.path)
+
+    @property
+    def updated_through(self) -> str:
+        checked = self.table["최종확인일"].dropna()
+        return str(checked.max()) if len(checked) else ""
+
+    # ------------------------------------------------------------------
+    # 갱신
+    # ------------------------------------------------------------------
+    def _fetch_sector(self, as_of: str, market: str) -> pd.DataFrame:
+        try:
+            return fetch_sector_classifications(as_of, market=market)
+        except Exception as e:
+            print(f"[WARN] {as_of} {market} 업종분류 조회 실패: {e}")
+            return pd.DataFrame()
+
+    def _fetch_bulk(self, as_of: str) -> pd.DataFrame:
+        results = run_concurrently(*[
+            (lambda m=market: (fetch_market_cap(as_of, market=m), self._fetch_sector(as_of, m)))
+            for market in META_MARKETS
+        ])
+        frames = []
+        for market, (cap, sector) in zip(META_MARKETS, results):
+            if cap is None or cap.empty:
+                continue
+            df = pd.DataFrame(index=cap.index)
+            df["종목명"] = sector["종목명"].reindex(cap.index) if "종목명" in sector.columns else np.nan
+            df["시장"] = market
+            df["업종명"] = sector["업종명"].reindex(cap.index) if "업종명" in sector.columns else np.nan
+            df["상장주식수"] = cap["상장주식수"] if "상장주식수" in cap.columns else np.nan
+            frames.append(df)
+        if not frames:
+            return pd.DataFrame(columns=META_COLUMNS[1:4] + ["상장주식수"])
+        bulk = pd.concat(frames, axis=0)
+        bulk = bulk[~bulk.index.duplicated(keep="first")]
+        bulk.index.name = "티커"
+        return bulk
+
+    def refresh(self, as_of: str):
+        """as_of 거래일 기준 전종목 메타데이터를 일괄 조회해 테이블에 반영한다."""
+        bulk = self._fetch_bulk(as_of)
+        if bulk.empty:
+            return
+
+        table = self._with_codes(self.table, bulk.index)
+
+        # 더 최신 날짜 기준 정보로만 덮어쓴다. (과거 날짜로 갱신할 때는 새 종목(코드만 있던 종목 포함)만 채움)
+        rows = bulk.index
+        last = table.loc[rows, "최종확인일"]
+        newer = last.isna() | (last.astype(str) <= as_of)
+        target = rows[newer.to_numpy()]
+        for col in ["종목명", "시장", "업종명", "상장주식수"]:
+            values = bulk.loc[target, col]
+            keep = values.notna()
+            table.loc[target[keep.to_numpy()], col] = values[keep]
+        table.loc[target, "최종확인일"] = as_of
+        first = table.loc[rows, "최초확인일"]
+        older = first.isna() | (first.astype(str) > as_of)
+        table.loc[rows[older.to_numpy()], "최초확인일"] = as_of
+
+        table["상장주식수"] = pd.to_numeric(table["상장주식수"], errors="coerce")
+        self.table = table
+        self._save()
+
+    @staticmethod
+    def _with_codes(table: pd.DataFrame, tickers) -> pd.DataFrame:
+        """table 에 없는 티커를 다음 코드 번호로 추가한 테이블 (메타데이터 컬럼은 비어 있음)."""
+        new = pd.Index(tickers).difference(table.index)
+        if len(new):
+            start_code = int(table["code"].max()) + 1 if not table.empty else 0
+            added = pd.DataFrame(index=new, columns=META_COLUMNS)
+            added["code"] = np.arange(start_code, start_code + len(new))
+            table = added if table.empty else pd.concat([table, added], axis=0)
+        table["code"] = table["code"].astype("int32")
+        table.index.name = "티커"
+        return table
+
+    def ensure(self, tickers, as_of: str):
+        """as_of 가 마지막 갱신일보다 최신이거나 메타데이터가 없는 티커가 있으면 그 날짜로 한 번 일괄 갱신한다."""
+        with self._lock:
+            known = self.table.index[self.table["최초확인일"].notna().to_numpy()]
+            missing = pd.Index(list(tickers)).difference(known)
+            if as_of > self.updated_through or len(missing):
+                self.refresh(as_of)
+
+    def assign_codes(self, tickers) -> np.ndarray:
+        """티커 배열 -> int32 코드 배열. 처음 보는 티커는 조회 없이 새 코드만 붙인다. (메모리에서만, 다음 refresh 때 저장)"""
+        with self._lock:
+            tickers = _as_index(tickers)
+            if len(tickers.difference(self.table.index)):
+                self.table = self._with_codes(self.table, tickers)
+            return self.codes_for(tickers)
+
+    # ------------------------------------------------------------------
+    # 조회
+    # ------------------------------------------------------------------
+    def lookup(self, tickers, column: str) -> np.ndarray:
+        """티커 배열 순서대로 column 값을 돌려준다. (없는 티커는 NaN)"""
+        return self.table[column].reindex(pd.Index(list(tickers))).to_numpy(dtype=object)
+
+    def codes_for(self, tickers) -> np.ndarray:
+        """티커 배열 -> int32 코드 배열 (없는 티커는 -1)."""
+        codes = self.table["code"].reindex(_as_index(tickers))
+        return codes.fillna(-1).to_numpy().astype(np.int32)
+
+    def tickers_for(self, codes) -> np.ndarray:
+        """int32 코드 배열 -> 티커 배열."""
+        by_code = pd.Series(self.table.index.to_numpy(), index=self.table["code"].to_numpy())
+        return by_code.reindex(np.asarray(codes)).to_numpy(dtype=object)
+
+    def names_for(self, tickers, as_of: str) -> np.ndarray:
+        """티커 배열의 종목명. 일괄 조회로도 못 찾은 종목만 종목별 조회로 보충한다."""
+        tickers = list(tickers)
+        self.ensure(tickers, as_of)
+        names = self.lookup(tickers, "종목명")
+        for i in np.flatnonzero(pd.isna(names)):
+            try:
+                names[i] = fetch_ticker_name(tickers[i])
+            except Exception:
+                continue
+        return names
+
+
+_store: TickerMetaStore | None = None
+
+
+def get_ticker_meta() -> TickerMetaStore:
+    global _store
+    if _store is None:
+        _store = TickerMetaStore()
+    return _store
@@ -0,0 +1,182 @@
+# trading_calendar.py
+# KRX 거래일 캘린더 인덱스
+# - 코스피 종합지수 일별 시세를 한 번의 기간 조회로 받아 거래일 목록을 만든다.
+# - CACHE_DIR 아래 JSON으로 저장해두고, 이후에는 부족한 구간만 이어서 조회한다.
+# - 모든 조회(on_or_before / next / n번째 영업일 / 구간 목록)는 정렬된 목록에 대한
+#   이진 탐색이라 O(log n), 이미 확보된 구간에서는 네트워크 호출이 없다.
+
+import bisect
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from quant_config import CACHE_DIR, CALENDAR_START_DATE, CALENDAR_INDEX_TICKER
+from data_loader import to_yyyymmdd, fetch_index_ohlcv_by_date
+
+
+CALENDAR_FILE = "trading_calendar.json"
+
+# on_or_before 조회 시 과거 방향으로 최소한 확보해둘 여유 구간(일)
+_LOOKBACK_MARGIN_DAYS = 31
+
+
+def _shift(date_str: str, days: int) -> str:
+    return to_yyyymmdd(datetime.strptime(date_str, "%Y%m%d") + timedelta(days=days))
+
+
+class TradingCalendar:
+    """정렬된 'YYYYMMDD' 거래일 목록 + 확보된 구간(covered_from ~ covered_through).
+
+    covered_through 는 항상 '어제' 이전까지만 올라간다.
+    오늘은 장 시작 전/장중에 상태가 바뀔 수 있으므로, 오늘이 포함된 조회는
+    매번 오늘 구간만 다시 확인한다(응답 자체는 data_loader 캐시의 TTL을 따른다).
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path) if path is not None else Path(CACHE_DIR) / CALENDAR_FILE
+        self.sessions: list[str] = []
+        self.covered_from: str | None = None
+        self.covered_through: str | None = None
+        self._load()
+
+    # ------------------------------------------------------------------
+    # 저장 / 로드
+    # ------------------------------------------------------------------
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.sessions = sorted(data["sessions"])
+            self.covered_from = data["covered_from"]
+            self.covered_through = data["covered_through"]
+        except Exception as e:
+            print(f"[WARN] 거래일 캘린더 파일을 읽지 못해 새로 만듭니다: {e}")
+            self.sessions = []
+            self.covered_from = None
+            self.covered_through = None
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 오늘 거래일 여부는 아직 확정이 아니므로 저장하지 않는다.
+        sessions = [s for s in self.sessions if s <= self.covered_through]
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "covered_from": self.covered_from,
+                "covered_through": self.covered_through,
+                "sessions": sessions,
+            }, f)
+        os.replace(tmp, self.path)
+
+    # ------------------------------------------------------------------
+    # 구간 확장
+    # ------------------------------------------------------------------
+    def _fetch_sessions(self, start: str, end: str) -> list[str]:
+        df = fetch_index_ohlcv_by_date(start, end, CALENDAR_INDEX_TICKER)
+        if df is None or df.empty:
+            return []
+        # 장 시작 전에는 오늘 행이 0으로 채워져 오는 경우가 있어 거래가 있었던 날만 남긴다.
+        col = "거래량" if "거래량" in df.columns else "종가"
+        df = df[df[col] > 0]
+        return [to_yyyymmdd(d) for d in df.index]
+
+    def _merge(self, start: str, end: str, fetched: list[str]):
+        lo = bisect.bisect_left(self.sessions, start)
+        hi = bisect.bisect_right(self.sessions, end)
+        self.sessions[lo:hi] = sorted(fetched)
+
+    def ensure_range(self, start: str, end: str):
+        """start ~ end 구간의 거래일이 확보되도록 부족한 앞/뒤 구간만 조회한다."""
+        today = to_yyyymmdd(datetime.today())
+        yesterday = _shift(today, -1)
+        end = min(end, today)
+        changed = False
+
+        if self.covered_from is None:
+            start = min(start, CALENDAR_START_DATE)
+            self._merge(start, today, self._fetch_sessions(start, today))
+            self.covered_from = start
+            self.covered_through = yesterday
+            self._save()
+            return
+
+        if start < self.covered_from:
+            until = _shift(self.covered_from, -1)
+            self._merge(start, until, self._fetch_sessions(start, until))
+            self.covered_from = start
+            changed = True
+
+        if end > self.covered_through:
+            # 뒤쪽은 요청 구간과 상관없이 오늘까지 한 번에 이어 붙인다.
+            since = _shift(self.covered_through, 1)
+            self._merge(since, today, self._fetch_sessions(since, today))
+            if yesterday > self.covered_through:
+                self.covered_through = yesterday
+                changed = True
+
+        if changed:
+            self._save()
+
+    # ------------------------------------------------------------------
+    # 조회
+    # ------------------------------------------------------------------
+    def is_session(self, date_str: str) -> bool:
+        self.ensure_range(date_str, date_str)
+        i = bisect.bisect_left(self.sessions, date_str)
+        return i < len(self.sessions) and self.sessions[i] == date_str
+
+    def on_or_before(self, date_str: str) -> str | None:
+        """date_str 당일 또는 그 이전의 마지막 거래일."""
+        self.ensure_range(_shift(date_str, -_LOOKBACK_MARGIN_DAYS), date_str)
+        i = bisect.bisect_right(self.sessions, date_str)
+        return self.sessions[i - 1] if i > 0 else None
+
+    def next_session(self, date_str: str) -> str | None:
+        """date_str 이후(당일 제외)의 첫 거래일. 아직 오지 않았으면 None."""
+        self.ensure_range(date_str, _shift(date_str, _LOOKBACK_MARGIN_DAYS))
+        i = bisect.bisect_right(self.sessions, date_str)
+        return self.sessions[i] if i < len(self.sessions) else None
+
+    def sessions_between(self, start: str, end: str) -> list[str]:
+        """start ~ end (양끝 포함) 사이의 거래일 목록."""
+        self.ensure_range(start, end)
+        lo = bisect.bisect_left(self.sessions, start)
+        hi = bisect.bisect_right(self.sessions, end)
+        return self.sessions[lo:hi]
+
+    def nth_session_of_month(self, year: int, month: int, n: int = 1) -> str | None:
+        """해당 월의 n번째 거래일 (1부터 시작, -1 이면 마지막 거래일)."""
+        start = f"{year:04d}{month:02d}01"
+        end = f"{year + 1:04d}0101" if month == 12 else f"{year:04d}{month + 1:02d}01"
+        end = _shift(end, -1)
+        self.ensure_range(start, end)
+        lo = bisect.bisect_left(self.sessions, start)
+        hi = bisect.bisect_right(self.sessions, end)
+        count = hi - lo
+        if n == 0 or abs(n) > count:
+            return None
+        return self.sessions[lo + n - 1] if n > 0 else self.sessions[hi + n]
+
+    def offset(self, date_str: str, n: int) -> str | None:
+        """date_str 당일 또는 직전 거래일에서 n 거래일 이동한 날 (음수면 과거)."""
+        base = self.on_or_before(date_str)
+        if base is None:
+            return None
+        i = bisect.bisect_left(self.sessions, base) + n
+        if i < 0:
+            self.ensure_range(_shift(base, -(abs(n) * 2 + _LOOKBACK_MARGIN_DAYS)), base)
+            i = bisect.bisect_left(self.sessions, base) + n
+        return self.sessions[i] if 0 <= i < len(self.sessions) else None
+
+
+_calendar: TradingCalendar | None = None
+
+
+def get_calendar() -> TradingCalendar:
+    global _calendar
+    if _calendar is None:
+        _calendar = TradingCalendar()
+    return _calendar
@@ -0,0 +1,175 @@
+# universe_index.py
+# 시점별(point-in-time) 유니버스 구성 인덱스
+# - 날짜마다 코스피/코스닥 시가총액 상위 UNIVERSE_SIZE_PER_MARKET 종목(get_universe 와 같은 규칙)을
+#   (날짜 × 티커) 비트맵 + 시장 내 순위로 한 번만 계산해 CACHE_DIR 아래 .npz 한 파일로 저장한다.
+# - 이후 get_universe 는 인덱스에 있는 날짜면 다시 정렬하지 않고 저장된 구성 종목을 그대로 쓰고,
+#   "그 날짜의 유니버스" / "종목 X 가 유니버스에 있던 날짜" 질의는 네트워크·정렬 없이 바로 답한다.
+# - 장중에 구성이 바뀔 수 있는 오늘 날짜는 저장하지 않는다. (지난 거래일만)
+# - UNIVERSE_SIZE_PER_MARKET 을 바꾸면 저장된 인덱스는 버리고 새로 만든다.
+
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from quant_config import CACHE_DIR, UNIVERSE_SIZE_PER_MARKET
+from data_loader import fetch_market_cap, run_concurrently, to_yyyymmdd, top_by_market_cap
+
+
+INDEX_FILE = "universe_index.npz"
+UNIVERSE_MARKETS = ("KOSPI", "KOSDAQ")
+MARKET_CODES = {market: i + 1 for i, market in enumerate(UNIVERSE_MARKETS)}   # 0 = 유니버스 밖
+
+
+class UniverseIndex:
+    """dates × tickers 유니버스 구성 인덱스.
+
+    - rank[d, t]   : 시장 내 시가총액 순위 (1부터), 유니버스 밖이면 0
+    - market[d, t] : MARKET_CODES (유니버스 밖이면 0)
+    - bitmap[d]    : rank > 0 을 np.packbits 로 묶은 행 (티커 8개당 1바이트)
+    티커 열은 처음 본 순서로 붙고, 날짜 행은 정렬 상태를 유지한다.
+    """
+
+    def __init__(self, path: str | Path | None = None, size: int = UNIVERSE_SIZE_PER_MARKET):
+        self.path = Path(path) if path is not None else Path(CACHE_DIR) / INDEX_FILE
+        self.size = size
+        self._lock = threading.Lock()
+        self._load()
+
+    # ------------------------------------------------------------------
+    # 저장 / 읽기
+    # ------------------------------------------------------------------
+    def _reset(self):
+        self.dates = np.array([], dtype="U8")
+        self.tickers = np.array([], dtype=object)
+        self.rank = np.zeros((0, 0), dtype=np.int16)
+        self.market = np.zeros((0, 0), dtype=np.int8)
+        self._rebuild_lookup()
+
+    def _rebuild_lookup(self):
+        self._ticker_index = pd.Index(self.tickers)
+        self._row_of = {d: i for i, d in enumerate(self.dates)}
+        self.bitmap = np.packbits(self.rank > 0, axis=1)
+
+    def _load(self):
+        self._reset()
+        if not self.path.exists():
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if int(data["size"]) != self.size:
+                    print(f"[INFO] 유니버스 크기가 바뀌어({int(data['size'])} -> {self.size}) 유니버스 인덱스를 새로 만듭니다.")
+                    return
+                self.dates = data["dates"]
+                self.tickers = data["tickers"].astype(object)
+                self.rank = data["rank"]
+                self.market = data["market"]
+        except Exception as e:
+            print(f"[WARN] 유니버스 인덱스 파일을 읽지 못해 새로 만듭니다: {e}")
+            self._reset()
+            return
+        self._rebuild_lookup()
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp.npz")
+        np.savez(tmp, size=self.size, dates=self.dates, tickers=self.tickers.astype(str),
+                 rank=self.rank, market=self.market, bitmap=self.bitmap)
+        os.replace(tmp, self.path)
+
+    # ------------------------------------------------------------------
+    # 생성
+    # ------------------------------------------------------------------
+    def _compute(self, date: str) -> list[pd.Index] | None:
+        """date 의 시장별 유니버스 티커 (시가총액 순). 시가총액 데이터가 하나도 없으면 None."""
+        caps = [fetch_market_cap(date, market=market) for market in UNIVERSE_MARKETS]
+        if all(cap is None or cap.empty for cap in caps):
+            return None
+        return [top_by_market_cap(cap, self.size).index if cap is not None else pd.Index([]) for cap in caps]
+
+    def ensure(self, dates) -> int:
+        """인덱스에 없는 지난 거래일들의 유니버스를 계산해 저장한다. 새로 넣은 날짜 수를 돌려준다.
+        (시가총액 스냅샷은 data_loader 캐시를 쓰므로 이미 받아둔 날짜는 파일만 읽는다)
+        """
+        today = to_yyyymmdd(datetime.now())
+        with self._lock:
+            missing = sorted({d for d in dates if d < today and d not in self._row_of})
+            if not missing:
+                return 0
+            results = run_concurrently(*[(lambda d=d: self._compute(d)) for d in missing])
+
+            added = {d: members for d, members in zip(missing, results) if members is not None}
+            if not added:
+                return 0
+            new = pd.Index([t for members in added.values() for idx in members for t in idx]).unique()
+            new = new.difference(self._ticker_index, sort=False)
+            tickers = np.concatenate([self.tickers, np.asarray(new, dtype=object)])
+            ticker_index = pd.Index(tickers)
+
+            dates = np.concatenate([self.dates, np.array(list(added), dtype="U8")])
+            rank = np.zeros((len(dates), len(tickers)), dtype=np.int16)
+            market = np.zeros((len(dates), len(tickers)), dtype=np.int8)
+            rank[:len(self.dates), :len(self.tickers)] = self.rank
+            market[:len(self.dates), :len(self.tickers)] = self.market
+            for row, members in enumerate(added.values(), start=len(self.dates)):
+                for code, idx in zip(MARKET_CODES.values(), members):
+                    cols = ticker_index.get_indexer(idx)
+                    rank[row, cols] = np.arange(1, len(cols) + 1)
+                    market[row, cols] = code
+
+            order = np.argsort(dates, kind="stable")
+            self.dates, self.tickers = dates[order], tickers
+            self.rank, self.market = rank[order], market[order]
+            self._rebuild_lookup()
+            self._save()
+            return len(added)
+
+    # ------------------------------------------------------------------
+    # 조회
+    # ------------------------------------------------------------------
+    def __contains__(self, date: str) -> bool:
+        return date in self._row_of
+
+    def members(self, date: str) -> pd.DataFrame | None:
+        """date 의 유니버스 (index=티커, 컬럼 시장 / 순위). get_universe 와 같은 순서
+        (코스피 순위순 -> 코스닥 순위순). 인덱스에 없는 날짜면 None."""
+        row = self._row_of.get(date)
+        if row is None:
+            return None
+        frames = []
+        for market, code in MARKET_CODES.items():
+            cols = np.flatnonzero(self.market[row] == code)
+            cols = cols[np.argsort(self.rank[row, cols], kind="stable")]
+            frames.append(pd.DataFrame({"시장": market, "순위": self.rank[row, cols].astype(int)},
+                                       index=pd.Index(self.tickers[cols], name="티커")))
+        return pd.concat(frames, axis=0)
+
+    def contains(self, date: str, tickers) -> np.ndarray:
+        """tickers 가 date 의 유니버스에 있었는지 (bool 배열, 인덱스에 없는 날짜면 예외)."""
+        row = self._row_of.get(date)
+        if row is None:
+            raise RuntimeError(f"유니버스 인덱스에 없는 날짜입니다: {date}")
+        cols = self._ticker_index.get_indexer(pd.Index(list(tickers)))
+        bits = np.unpackbits(self.bitmap[row], count=len(self.tickers)).astype(bool)
+        return np.where(cols >= 0, bits[np.maximum(cols, 0)], False)
+
+    def dates_for(self, ticker: str) -> list[str]:
+        """ticker 가 유니버스에 있던 (인덱스에 있는) 날짜 목록."""
+        col = self._ticker_index.get_indexer([ticker])[0]
+        if col < 0:
+            return []
+        bits = (self.bitmap[:, col // 8] >> (7 - col % 8)) & 1
+        return list(self.dates[bits.astype(bool)])
+
+
+_index: UniverseIndex | None = None
+
+
+def get_universe_index() -> UniverseIndex:
+    global _index
+    if _index is None:
+        _index = UniverseIndex()
+    return _index
@@ -4,11 +4,15 @@ import datetime
 import re
 import math
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
+from instrumentation import bind_stage, json_nbytes, stage, track_call
+from compact import for_output
+
 # .env 로드
 load_dotenv()
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
@@ -17,39 +21,65 @@ SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 # 설정
 BUCKET_NAME = "stock-data"
 TARGET_DIR = "strategies"
+UPLOAD_WORKERS = 4          # Storage 동시 업로드 수
+UPSERT_CHUNK_SIZE = 500     # DB upsert 한 번에 보낼 행 수
+UPSERT_CONFLICT_COLUMNS = "strategy_number,ref_date,ticker"  # idx_stock_rankings_unique_strategy_date
 
-def get_file_hash(file_path):
-    """파일의 MD5 해시값을 계산합니다."""
-    hash_md5 = hashlib.md5()
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
-
-def check_storage_exists(supabase, bucket_name, storage_path):
-    """Storage에 파일이 이미 존재하는지 확인합니다."""
+def list_storage_names(supabase, bucket_name, folder):
+    """Storage 폴더의 파일명 목록을 한 번에 가져온다."""
     try:
-        response = supabase.storage.from_(bucket_name).list(path=os.path.dirname(storage_path))
-        filename = os.path.basename(storage_path)
-        return any(file['name'] == filename for file in response)
+        with track_call("supabase.storage.list") as call:
+            response = supabase.storage.from_(bucket_name).list(path=folder)
+            call.bytes = json_nbytes(response)
+        return {file['name'] for file in response}
     except Exception:
-        return False
+        return set()
 
-def check_db_exists(supabase, strategy_number, ref_date):
-    """DB에 같은 전략/날짜 데이터가 이미 존재하는지 확인합니다."""
+def fetch_existing_strategies(supabase, ref_date):
+    """해당 날짜에 이미 저장된 전략 번호 목록을 한 번에 가져온다.
+    get_distinct_strategies RPC를 우선 사용하고, 없으면 일반 조회로 대체한다."""
     try:
-        response = supabase.table("stock_rankings").select("id").eq("strategy_number", strategy_number).eq("ref_date", ref_date).execute()
-        return len(response.data) > 0
+        with track_call("supabase.rpc.get_distinct_strategies") as call:
+            response = supabase.rpc("get_distinct_strategies", {"query_date": ref_date}).execute()
+            call.bytes = json_nbytes(response.data)
     except Exception:
-        return False
-
-def check_file_hash_exists(supabase, file_hash):
-    """DB에 같은 해시값의 파일이 이미 업로드되었는지 확인합니다."""
+        try:
+            with track_call("supabase.select") as call:
+                response = supabase.table("stock_rankings").select("strategy_number").eq("ref_date", ref_date).execute()
+                call.bytes = json_nbytes(response.data)
+        except Exception:
+            return set()
+    return {str(r["strategy_number"]) for r in (response.data or [])}
+
+def fetch_existing_hashes(supabase, file_hashes):
+    """이번에 올릴 파일 해시 중 이미 DB에 있는 것들을 한 번에 가져온다.
+    (응답 행 수 제한으로 일부가 빠지더라도 upsert 라서 중복 행은 생기지 않는다)"""
+    if not file_hashes:
+        return set()
     try:
-        response = supabase.table("stock_rankings").select("id").eq("file_hash", file_hash).limit(1).execute()
-        return len(response.data) > 0
+        with track_call("supabase.select") as call:
+            response = supabase.table("stock_rankings").select("file_hash").in_("file_hash", list(file_hashes)).execute()
+            call.bytes = json_nbytes(response.data)
+        return {r["file_hash"] for r in (response.data or [])}
     except Exception:
-        return False
+        return set()
+
+def upload_storage_file(supabase, data, storage_path):
+    with track_call("supabase.storage.upload") as call:
+        call.bytes = len(data)
+        supabase.storage.from_(BUCKET_NAME).upload(
+            path=storage_path,
+            file=data,
+            file_options={"content-type": "text/csv", "x-upsert": "true"}
+        )
+
+def upsert_records(supabase, records, chunk_size=UPSERT_CHUNK_SIZE):
+    """(strategy_number, ref_date, ticker) 유니크 인덱스 기준으로 나눠서 upsert 한다."""
+    for i in range(0, len(records), chunk_size):
+        chunk = records[i:i + chunk_size]
+        with track_call("supabase.upsert") as call:
+            call.bytes = json_nbytes(chunk)
+            supabase.table("stock_rankings").upsert(chunk, on_conflict=UPSERT_CONFLICT_COLUMNS).execute()
 
 def get_today_str():
     return datetime.datetime.now().strftime("%Y%m%d")
@@ -87,126 +117,200 @@ def clean_record_for_json(record):
             new_record[k] = v
     return new_record
 
-def upload_and_insert():
-    if is_weekend():
-        print("[INFO] 주말이라 실행하지 않습니다.")
-        return
-
+NUMERIC_COLS = [
+    "market_cap_bil", "trading_val_won", "total_score",
+    "value_score", "quality_score", "momentum_score", "risk_score",
+    "per", "pbr", "div_yield", "mom_3m", "mom_12m"
+]
+
+def make_storage_path(ref_date, filename):
+    return f"{ref_date}/{make_safe_storage_name(filename)}"[:-8]
+
+def build_db_frame(df):
+    """랭킹 DataFrame -> stock_rankings 컬럼 구조로 변환."""
+    # 컬럼 매핑
+    rename_map = {
+        "종목코드": "ticker", "종목명": "name", "시장": "market",
+        "시총구간": "sector", "스타일": "style",
+        "시가총액": "market_cap_bil", "거래대금": "trading_val_won",
+        "total_score": "total_score", "value_score": "value_score",
+        "quality_score": "quality_score", "momentum_score": "momentum_score",
+        "risk_score": "risk_score",
+        "PER": "per", "PBR": "pbr", "DIV": "div_yield",
+        "mom_3m": "mom_3m", "mom_12m": "mom_12m"
+    }
+
+    # 필요한 컬럼만 추출 및 이름 변경
+    available_cols = [c for c in rename_map.keys() if c in df.columns]
+    db_df = df[available_cols].rename(columns=rename_map)
+
+    # 종목코드를 6자리로 패딩
+    if 'ticker' in db_df.columns:
+        db_df['ticker'] = db_df['ticker'].astype(str).str.zfill(6)
+
+    # 숫자형 컬럼 강제 변환 (문자 'inf' 등을 float inf로 변환)
+    for col in NUMERIC_COLS:
+        if col in db_df.columns:
+            db_df[col] = pd.to_numeric(db_df[col], errors='coerce')
+    return db_df
+
+def frame_to_csv_bytes(df):
+    """to_csv(encoding='utf-8-sig', index=False) 로 저장한 파일과 같은 바이트."""
+    return ("\ufeff" + df.to_csv(index=False)).encode("utf-8")
+
+def connect():
     try:
-        supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        return create_client(SUPABASE_URL, SUPABASE_KEY)
     except Exception as e:
         print(f"[ERROR] Supabase 연결 실패: {e}")
-        return
+        return None
+
+def publish(supabase: Client, items, today_str):
+    """items: [{original_filename, df, read_bytes}] -> Storage 업로드 + DB upsert.
+    read_bytes 는 Storage 에 올릴 CSV 바이트를 돌려주는 함수."""
+    with stage("prepare"):
+        for item in items:
+            original_filename = item["original_filename"]
+            item["db_df"] = build_db_frame(item["df"])
+            item["storage_path"] = make_storage_path(today_str, original_filename)
+            # 파일 해시 (Storage 에 올릴 CSV 바이트 기준, 기존 get_file_hash 와 같은 값)
+            item["csv_bytes"] = item["read_bytes"]()
+            item["file_hash"] = hashlib.md5(item["csv_bytes"]).hexdigest()
+            # 전략 번호 추출
+            item["strategy_number"] = original_filename.split('_')[0].split()[1] if '전략' in original_filename else "unknown"
+
+    # 중복 체크: Storage 목록 1번 + DB 조회(전략 목록 1번, 해시 1번)로 모든 파일을 한 번에 판단
+    with stage("duplicate_check"):
+        storage_names = list_storage_names(supabase, BUCKET_NAME, today_str)
+        existing_strategies = fetch_existing_strategies(supabase, today_str)
+        existing_hashes = fetch_existing_hashes(supabase, {item["file_hash"] for item in items})
+
+    pending = []
+    for item in items:
+        item["storage_exists"] = os.path.basename(item["storage_path"]) in storage_names
+        item["db_exists"] = item["strategy_number"] in existing_strategies
+
+        if item["file_hash"] in existing_hashes:
+            print(f"[SKIP] 동일한 파일이 이미 업로드됨 (해시 일치): {item['original_filename']}")
+            continue
 
-    today_str = get_today_str()
-    file_pattern = os.path.join(TARGET_DIR, f"*{today_str}*.csv")
-    files = glob.glob(file_pattern)
+        if item["storage_exists"] and item["db_exists"]:
+            print(f"[SKIP] 이미 업로드됨: {item['original_filename']}")
+            continue
 
-    if not files:
-        print(f"[WARN] 오늘({today_str}) 생성된 파일이 없습니다.")
-        return
+        pending.append(item)
 
-    print(f"[INFO] 발견된 파일: {len(files)}개")
+    # A. Storage 업로드 (동시 실행)
+    def _upload(item):
+        if item["storage_exists"]:
+            print(f"[Storage] 이미 존재함: {item['original_filename']}")
+            return True
+        try:
+            upload_storage_file(supabase, item["csv_bytes"], item["storage_path"])
+            print(f"[Storage] 업로드 성공: {item['original_filename']}")
+            return True
+        except Exception as e:
+            # 403 에러가 나면 SQL 실행 여부를 확인하세요.
+            print(f"[Storage] 에러 (SQL 권한 설정을 확인하세요): {e}")
+            return False
+
+    with stage("storage_upload"), ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+        uploaded = list(pool.map(bind_stage(_upload), pending))
 
-    for file_path in files:
-        original_filename = os.path.basename(file_path)
-        safe_filename = make_safe_storage_name(original_filename)
-        storage_path = f"{today_str}/{safe_filename}"[:-8]
+    # B. DB upsert (파일별로 묶어서 청크 단위 전송)
+    with stage("db_upsert"):
+        for item, ok in zip(pending, uploaded):
+            if not ok:
+                continue
+            original_filename = item["original_filename"]
+            try:
+                if item["db_exists"]:
+                    print(f"[DB] 이미 존재함: {original_filename}")
+                    continue
+
+                db_df = item["db_df"].copy()
+
+                # 메타데이터 추가
+                db_df['strategy_number'] = item["strategy_number"]
+                db_df['strategy_name'] = ''.join(original_filename.split('_')[0].split()[2:])
+                db_df['ref_date'] = today_str
+                db_df['storage_path'] = item["storage_path"]
+                db_df['file_hash'] = item["file_hash"]
+
+                # [수정] Dictionary 변환 후 정밀 세탁 (Sanitize)
+                raw_records = db_df.to_dict(orient='records')
+                cleaned_records = [clean_record_for_json(r) for r in raw_records]
+
+                # Supabase 전송
+                upsert_records(supabase, cleaned_records)
+                print(f"[DB] 저장 성공: {db_df['strategy_name'].iloc[0]} ({len(cleaned_records)}행)")
+
+            except Exception as e:
+                print(f"[DB] 저장 에러 ({original_filename}): {e}")
+                continue
 
-        # 파일 해시 계산
-        file_hash = get_file_hash(file_path)
+    print("[INFO] 모든 작업 완료")
+
+def upload_frames(frames, ref_date=None):
+    """rank_main 에서 만든 랭킹 DataFrame 을 CSV 파일을 거치지 않고 바로 업로드한다.
+    frames: [(파일명, DataFrame)]  (파일명은 CSV로 저장했다면 쓰였을 이름, 예: '전략 9 ..._20251219093000.csv')
+    DataFrame 이 compact_table 표현이면 여기서 원래 스키마로 되돌려 올린다.
+    """
+    if is_weekend():
+        print("[INFO] 주말이라 실행하지 않습니다.")
+        return
 
-        # 전략 번호 추출
-        strategy_number = original_filename.split('_')[0].split()[1] if '전략' in original_filename else "unknown"
+    frames = [(filename, for_output(df)) for filename, df in frames]
+    if not frames:
+        print("[WARN] 업로드할 랭킹 결과가 없습니다.")
+        return
 
-        # 중복 체크
-        storage_exists = check_storage_exists(supabase, BUCKET_NAME, storage_path)
-        db_exists = check_db_exists(supabase, strategy_number, today_str)
-        hash_exists = check_file_hash_exists(supabase, file_hash)
+    supabase = connect()
+    if supabase is None:
+        return
 
-        if hash_exists:
-            print(f"[SKIP] 동일한 파일이 이미 업로드됨 (해시 일치): {original_filename}")
-            continue
+    print(f"[INFO] 업로드할 랭킹: {len(frames)}개")
+    items = [
+        {
+            "original_filename": filename,
+            "df": df,
+            "read_bytes": (lambda df=df: frame_to_csv_bytes(df)),
+        }
+        for filename, df in frames
+    ]
+    publish(supabase, items, ref_date or get_today_str())
 
-        if storage_exists and db_exists:
-            print(f"[SKIP] 이미 업로드됨: {original_filename}")
-            continue
+def upload_and_insert():
+    """strategies 폴더에 오늘 저장된 CSV 파일들을 업로드한다. (파일만 따로 올릴 때 사용)"""
+    if is_weekend():
+        print("[INFO] 주말이라 실행하지 않습니다.")
+        return
 
-        # A. Storage 업로드
-        try:
-            if not storage_exists:
-                with open(file_path, 'rb') as f:
-                    supabase.storage.from_(BUCKET_NAME).upload(
-                        path=storage_path,
-                        file=f,
-                        file_options={"content-type": "text/csv", "x-upsert": "true"}
-                    )
-                print(f"[Storage] 업로드 성공: {original_filename}")
-            else:
-                print(f"[Storage] 이미 존재함: {original_filename}")
-        except Exception as e:
-            # 403 에러가 나면 SQL 실행 여부를 확인하세요.
-            print(f"[Storage] 에러 (SQL 권한 설정을 확인하세요): {e}")
-            continue
+    supabase = connect()
+    if supabase is None:
+        return
 
-        # B. DB Insert
-        try:
-            if db_exists:
-                print(f"[DB] 이미 존재함: {original_filename}")
-                continue
+    today_str = get_today_str()
+    file_pattern = os.path.join(TARGET_DIR, f"*{today_str}*.csv")
+    files = glob.glob(file_pattern)
 
-            df = pd.read_csv(file_path)
-
-            # 컬럼 매핑
-            rename_map = {
-                "종목코드": "ticker", "종목명": "name", "시장": "market",
-                "시총구간": "sector", "스타일": "style",
-                "시가총액": "market_cap_bil", "거래대금": "trading_val_won",
-                "total_score": "total_score", "value_score": "value_score",
-                "quality_score": "quality_score", "momentum_score": "momentum_score",
-                "risk_score": "risk_score",
-                "PER": "per", "PBR": "pbr", "DIV": "div_yield",
-                "mom_3m": "mom_3m", "mom_12m": "mom_12m"
-            }
-
-            # 필요한 컬럼만 추출 및 이름 변경
-            available_cols = [c for c in rename_map.keys() if c in df.columns]
-            db_df = df[available_cols].rename(columns=rename_map)
-
-            # 종목코드를 6자리로 패딩
-            if 'ticker' in db_df.columns:
-                db_df['ticker'] = db_df['ticker'].astype(str).str.zfill(6)
-
-            # 숫자형 컬럼 강제 변환 (문자 'inf' 등을 float inf로 변환)
-            numeric_cols = [
-                "market_cap_bil", "trading_val_won", "total_score",
-                "value_score", "quality_score", "momentum_score", "risk_score",
-                "per", "pbr", "div_yield", "mom_3m", "mom_12m"
-            ]
-            for col in numeric_cols:
-                if col in db_df.columns:
-                    db_df[col] = pd.to_numeric(db_df[col], errors='coerce')
-
-            # 메타데이터 추가
-            db_df['strategy_number'] = strategy_number
-            db_df['strategy_name'] = ''.join(original_filename.split('_')[0].split()[2:])
-            db_df['ref_date'] = today_str
-            db_df['storage_path'] = storage_path
-            db_df['file_hash'] = file_hash
-
-            # [수정] Dictionary 변환 후 정밀 세탁 (Sanitize)
-            raw_records = db_df.to_dict(orient='records')
-            cleaned_records = [clean_record_for_json(r) for r in raw_records]
-
-            # Supabase 전송
-            _ = supabase.table("stock_rankings").insert(cleaned_records).execute()
-            print(f"[DB] 저장 성공: {db_df['strategy_name'].iloc[0]} ({len(cleaned_records)}행)")
+    if not files:
+        print(f"[WARN] 오늘({today_str}) 생성된 파일이 없습니다.")
+        return
 
-        except Exception as e:
-            print(f"[DB] 저장 에러 ({original_filename}): {e}")
-            continue
+    print(f"[INFO] 발견된 파일: {len(files)}개")
 
-    print("[INFO] 모든 작업 완료")
+    items = []
+    for file_path in sorted(files):
+        def read_bytes(file_path=file_path):
+            with open(file_path, 'rb') as f:
+                return f.read()
+        items.append({
+            "original_filename": os.path.basename(file_path),
+            "df": pd.read_csv(file_path),
+            "read_bytes": read_bytes,
+        })
+    publish(supabase, items, today_str)
 
 if __name__ == "__main__":
     upload_and_insert()
\ No newline at end of file
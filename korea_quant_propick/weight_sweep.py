@@ -0,0 +1,330 @@
+# weight_sweep.py
+# 팩터 가중치 스윕 + 워크포워드 최적화
+# - 리밸런싱 날짜별 팩터 점수 행렬(종목 × [value, quality, momentum, low_risk])과
+#   다음 리밸런싱까지의 종목별 수익률을 한 번만 모아 Parquet 으로 저장해둔다.
+# - 가중치 조합 K개는 날짜마다 (종목 × 4) @ (4 × K) 행렬곱 한 번 + 부분 정렬로 상위 N 종목을 골라
+#   run_backtest 와 같은 규칙(동일비중, 유동성 필터, total_score 상위 BACKTEST_TOP_N)으로 평가한다.
+# - 조합별 CAGR / MDD / 승률과 워크포워드(in-sample 최적 -> out-of-sample 적용) 결과를 출력한다.
+
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from quant_config import (
+    BACKTEST_START_DATE,
+    BACKTEST_END_DATE,
+    BACKTEST_TOP_N,
+    BACKTEST_WORKERS,
+    MIN_TRADING_VALUE,
+    WEIGHT_VALUE,
+    WEIGHT_QUALITY,
+    WEIGHT_MOMENTUM,
+    WEIGHT_LOW_RISK,
+    SWEEP_WEIGHT_STEP,
+    WALKFORWARD_IN_SAMPLE,
+    WALKFORWARD_OUT_SAMPLE,
+    WALKFORWARD_METRIC,
+    COMPACT_DTYPES,
+)
+from data_loader import get_recent_trading_date, make_shared_rate_state
+from factor_model import build_factor_table
+from backtest import build_rebalance_dates, load_backtest_panel, period_returns, _init_worker
+from result_cache import result_fingerprint
+from compact import decode_tickers, encode_tickers
+
+
+# total_score = 점수 행렬 @ 가중치 (low_risk_score = 100 - risk_score)
+FACTOR_COLUMNS = ["value_score", "quality_score", "momentum_score", "low_risk_score"]
+WEIGHT_COLUMNS = ["w_value", "w_quality", "w_momentum", "w_low_risk"]
+CURRENT_WEIGHTS = (WEIGHT_VALUE, WEIGHT_QUALITY, WEIGHT_MOMENTUM, WEIGHT_LOW_RISK)
+
+# 보관하는 점수 행렬 dtype (COMPACT_DTYPES 면 float32)
+SCORE_DTYPE = np.float32 if COMPACT_DTYPES else np.float64
+
+# 한 번에 평가할 가중치 조합 수 (날짜별 종목 수 × 이 값 크기의 배열을 만든다)
+_EVAL_CHUNK = 2000
+
+
+class SweepData:
+    """리밸런싱 구간별 (종목 코드, 점수 행렬, 다음 구간 종목별 수익률).
+
+    rebalance_dates 는 구간 경계 날짜 목록이라 구간 수는 len(rebalance_dates) - 1.
+    종목은 티커 문자열 대신 ticker_meta int32 코드로 들고 있고 (compact.encode_tickers),
+    COMPACT_DTYPES 면 점수 행렬도 float32 로 보관한다. 파일에는 티커 문자열로 저장한다.
+    """
+
+    def __init__(self, rebalance_dates: list[str], codes: list[np.ndarray],
+                 scores: list[np.ndarray], returns: list[np.ndarray]):
+        self.rebalance_dates = list(rebalance_dates)
+        self.codes = codes
+        self.scores = [np.asarray(s, dtype=SCORE_DTYPE) for s in scores]
+        self.returns = returns
+
+    def tickers(self, i: int) -> np.ndarray:
+        """i 번째 구간 종목 티커 배열."""
+        return decode_tickers(self.codes[i])
+
+    @property
+    def periods(self) -> int:
+        return len(self.scores)
+
+    def to_frame(self) -> pd.DataFrame:
+        frames = []
+        for i in range(self.periods):
+            df = pd.DataFrame(self.scores[i], columns=FACTOR_COLUMNS)
+            df.insert(0, "티커", self.tickers(i))
+            df.insert(0, "next_date", self.rebalance_dates[i + 1])
+            df.insert(0, "rebalance_date", self.rebalance_dates[i])
+            df["fwd_return"] = self.returns[i]
+            frames.append(df)
+        return pd.concat(frames, ignore_index=True)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "SweepData":
+        pairs = df[["rebalance_date", "next_date"]].drop_duplicates().sort_values("rebalance_date")
+        dates = list(pairs["rebalance_date"]) + [pairs["next_date"].iloc[-1]]
+        codes, scores, returns = [], [], []
+        groups = dict(tuple(df.groupby("rebalance_date", sort=False)))
+        for reb in dates[:-1]:
+            g = groups[reb]
+            codes.append(encode_tickers(g["티커"]))
+            scores.append(g[FACTOR_COLUMNS].to_numpy(dtype=SCORE_DTYPE))
+            returns.append(g["fwd_return"].to_numpy(dtype=float))
+        return cls(dates, codes, scores, returns)
+
+
+# ---------------------------------------------------------------------------
+# 데이터 수집 (한 번만)
+# ---------------------------------------------------------------------------
+
+# _period_scores 가 읽는 팩터 테이블 컬럼
+SCORE_COLUMNS = ["거래대금", "value_score", "quality_score", "momentum_score", "risk_score"]
+
+
+def _period_scores(reb_date: str) -> pd.DataFrame:
+    """리밸런싱 날짜의 유동성 필터 통과 종목 점수 행렬. (select_portfolio 와 같은 필터)"""
+    factors = build_factor_table(reb_date, columns=SCORE_COLUMNS)
+    liquid = factors[factors["거래대금"] >= MIN_TRADING_VALUE]
+    scores = pd.DataFrame({
+        "value_score": liquid["value_score"],
+        "quality_score": liquid["quality_score"],
+        "momentum_score": liquid["momentum_score"],
+        "low_risk_score": 100 - liquid["risk_score"],
+    }, index=liquid.index)
+    return scores.astype(float)
+
+
+def collect_sweep_data(start_date: str = BACKTEST_START_DATE, end_date: str | None = BACKTEST_END_DATE,
+                       workers: int = BACKTEST_WORKERS) -> SweepData:
+    rebalance_dates = build_rebalance_dates(start_date, end_date)
+    panel, panel_range = load_backtest_panel(rebalance_dates)
+
+    if workers > 1:
+        print(f"[INFO] 병렬 모드: 워커 {workers}개로 리밸런싱 시점별 팩터 점수 수집")
+        shared_rate_state = make_shared_rate_state()
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(shared_rate_state, panel_range)) as pool:
+            score_frames = list(pool.map(_period_scores, rebalance_dates[:-1]))
+    else:
+        score_frames = [_period_scores(d) for d in rebalance_dates[:-1]]
+
+    codes, scores, returns = [], [], []
+    for i, frame in enumerate(score_frames):
+        symbols = list(frame.index)
+        codes.append(encode_tickers(symbols))
+        scores.append(frame.to_numpy(dtype=SCORE_DTYPE))
+        returns.append(period_returns(symbols, rebalance_dates[i], rebalance_dates[i + 1], panel))
+    return SweepData(rebalance_dates, codes, scores, returns)
+
+
+def load_or_collect(start_date: str = BACKTEST_START_DATE, end_date: str | None = BACKTEST_END_DATE,
+                    path: str | None = None) -> SweepData:
+    """저장된 점수 파일이 있으면 읽고, 없으면 모아서 저장한다.
+    기본 파일명에는 실제 종료일(end_date 가 None 이면 최근 거래일)과 result_cache 의 지문
+    (설정 상수 / 전략 정의 / 소스 코드 / 라이브러리 버전)이 들어가므로, 하나라도 바뀌면 새로 모으고
+    같은 시작일의 이전 파일은 지운다.
+    """
+    end_date = end_date or get_recent_trading_date()
+    if path is None:
+        prefix = f"weight_sweep_data_{start_date}_"
+        path = f"{prefix}{end_date}_{result_fingerprint()}.parquet"
+    else:
+        prefix = None
+    if os.path.exists(path):
+        print(f"[INFO] 저장된 팩터 점수 사용: {path}")
+        return SweepData.from_frame(pd.read_parquet(path))
+    data = collect_sweep_data(start_date, end_date)
+    data.to_frame().to_parquet(path, index=False)
+    print(f"[INFO] 팩터 점수를 {path} 로 저장했습니다.")
+    if prefix is not None:
+        for old in glob.glob(f"{prefix}*.parquet"):
+            if old != path:
+                os.remove(old)
+                print(f"[INFO] 이전 팩터 점수 파일을 지웠습니다: {old}")
+    return data
+
+
+# ---------------------------------------------------------------------------
+# 평가
+# ---------------------------------------------------------------------------
+
+def weight_grid(step: float = SWEEP_WEIGHT_STEP) -> np.ndarray:
+    """합이 1이고 step 간격인 4개 가중치 조합 전부 (K × 4)."""
+    units = int(round(1 / step))
+    rows = [(a, b, c, units - a - b - c)
+            for a, b, c in product(range(units + 1), repeat=3) if a + b + c <= units]
+    return np.array(rows, dtype=float) / units
+
+
+def evaluate_weights(data: SweepData, weights, top_n: int = BACKTEST_TOP_N) -> np.ndarray:
+    """가중치 조합별 구간 수익률 행렬 (구간 수 × K).
+
+    조합마다 total_score 상위 top_n 종목을 동일비중으로 담고, 수익률을 계산할 수 없는 종목은 빼고 평균한다.
+    (점수가 NaN 인 종목은 가장 뒤로, 담을 종목이 하나도 없으면 0)
+    """
+    W = np.atleast_2d(np.asarray(weights, dtype=float))
+    K = len(W)
+    out = np.zeros((data.periods, K))
+    for d in range(data.periods):
+        S, r = data.scores[d], data.returns[d]
+        n = len(S)
+        if n == 0:
+            continue
+        k = min(top_n, n)
+        valid_r = ~np.isnan(r)
+        r0 = np.where(valid_r, r, 0.0)
+        for lo in range(0, K, _EVAL_CHUNK):
+            total = S @ W[lo:lo + _EVAL_CHUNK].T                     # (n × k')
+            total = np.where(np.isnan(total), -np.inf, total)
+            top = np.argpartition(-total, k - 1, axis=0)[:k]          # (k × k') 상위 k 종목 위치
+            used = valid_r[top].sum(axis=0)
+            summed = r0[top].sum(axis=0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out[d, lo:lo + _EVAL_CHUNK] = np.where(used > 0, summed / used, 0.0)
+    return out
+
+
+def sweep_metrics(period_returns: np.ndarray, start_date: str, end_date: str) -> dict[str, np.ndarray]:
+    """구간 수익률 행렬(구간 수 × K) -> 조합별 총수익률 / CAGR / MDD / 승률. (backtest 요약과 같은 정의)"""
+    R = np.asarray(period_returns, dtype=float)
+    equity = np.cumprod(1.0 + R, axis=0)
+    final = equity[-1]
+
+    days = (datetime.strptime(end_date, "%Y%m%d") - datetime.strptime(start_date, "%Y%m%d")).days
+    years = days / 365.0 if days > 0 else 0.0
+    with np.errstate(invalid="ignore"):
+        cagr = final ** (1.0 / years) - 1.0 if years > 0 else np.full(R.shape[1], np.nan)
+
+    peak = np.maximum.accumulate(equity, axis=0)
+    mdd = (equity / peak - 1.0).min(axis=0)
+    winrate = (R > 0).mean(axis=0)
+    return {"total_return": final - 1.0, "cagr": cagr, "mdd": mdd, "winrate": winrate}
+
+
+def run_sweep(data: SweepData, weights=None) -> pd.DataFrame:
+    """가중치 조합별 성과표 (CAGR 내림차순)."""
+    if weights is None:
+        weights = weight_grid()
+    W = np.atleast_2d(np.asarray(weights, dtype=float))
+    R = evaluate_weights(data, W)
+    metrics = sweep_metrics(R, data.rebalance_dates[0], data.rebalance_dates[-1])
+    result = pd.DataFrame(W, columns=WEIGHT_COLUMNS)
+    for name, values in metrics.items():
+        result[name] = values
+    return result.sort_values("cagr", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def walk_forward(data: SweepData, weights=None,
+                 in_sample: int = WALKFORWARD_IN_SAMPLE,
+                 out_sample: int = WALKFORWARD_OUT_SAMPLE,
+                 metric: str = WALKFORWARD_METRIC) -> tuple[pd.DataFrame, dict[str, float]]:
+    """in_sample 구간에서 metric 이 가장 좋은 가중치를 골라 다음 out_sample 구간에 적용하는 것을 반복한다.
+
+    반환값: (fold 별 선택 가중치/성과표, 이어붙인 out-of-sample 구간 전체 성과)
+    """
+    if weights is None:
+        weights = weight_grid()
+    W = np.atleast_2d(np.asarray(weights, dtype=float))
+    R = evaluate_weights(data, W)
+    dates = data.rebalance_dates
+
+    folds = []
+    oos_returns = []
+    for s in range(0, data.periods - in_sample, out_sample):
+        e = s + in_sample
+        oos_end = min(e + out_sample, data.periods)
+        is_metrics = sweep_metrics(R[s:e], dates[s], dates[e])
+        score = np.nan_to_num(is_metrics[metric], nan=-np.inf)
+        best = int(np.argmax(score))
+        oos = R[e:oos_end, best]
+        oos_metrics = sweep_metrics(oos[:, None], dates[e], dates[oos_end])
+        oos_returns.append(oos)
+
+        fold = {
+            "in_sample_start": dates[s], "in_sample_end": dates[e],
+            "out_sample_start": dates[e], "out_sample_end": dates[oos_end],
+        }
+        fold.update(dict(zip(WEIGHT_COLUMNS, W[best])))
+        fold[f"is_{metric}"] = float(is_metrics[metric][best])
+        fold["oos_return"] = float(oos_metrics["total_return"][0])
+        folds.append(fold)
+
+    if not folds:
+        raise RuntimeError(f"워크포워드 구간이 부족합니다. (구간 {data.periods}개, in-sample {in_sample}개 필요)")
+
+    oos_all = np.concatenate(oos_returns)[:, None]
+    summary = sweep_metrics(oos_all, dates[in_sample], folds[-1]["out_sample_end"])
+    return pd.DataFrame(folds), {k: float(v[0]) for k, v in summary.items()}
+
+
+def _print_row(label: str, row):
+    w = " / ".join(f"{row[c]:.2f}" for c in WEIGHT_COLUMNS)
+    print(f"{label} 가중치(V/Q/M/LR) {w} | CAGR {row['cagr']*100:6.2f}% | "
+          f"MDD {row['mdd']*100:6.2f}% | 승률 {row['winrate']*100:5.1f}%")
+
+
+def main():
+    data = load_or_collect()
+    start, end = data.rebalance_dates[0], data.rebalance_dates[-1]
+    grid = weight_grid()
+    print(f"[INFO] 가중치 조합 {len(grid):,}개 × 리밸런싱 {data.periods}회 평가")
+
+    result = run_sweep(data, grid)
+    outfile = f"weight_sweep_{BACKTEST_START_DATE}_{BACKTEST_END_DATE or 'LATEST'}.csv"
+    result.to_csv(outfile, encoding="utf-8-sig", index=False)
+
+    print("\n==============================")
+    print("=== 가중치 스윕 결과 (CAGR 상위 10) ===")
+    print("==============================\n")
+    print(f"기간: {start} ~ {end}")
+    for i, row in result.head(10).iterrows():
+        _print_row(f"[{i+1:>2}]", row)
+    current = run_sweep(data, [CURRENT_WEIGHTS]).iloc[0]
+    _print_row("[현재]", current)
+    print(f"\n[INFO] 전체 조합 결과를 {outfile} 로 저장했습니다.")
+
+    try:
+        folds, summary = walk_forward(data, grid)
+    except RuntimeError as e:
+        print(f"[WARN] {e}")
+        return
+
+    print("\n==============================")
+    print(f"=== 워크포워드 (in-sample {WALKFORWARD_IN_SAMPLE}회 -> out-of-sample {WALKFORWARD_OUT_SAMPLE}회, 기준 {WALKFORWARD_METRIC}) ===")
+    print("==============================\n")
+    print(folds)
+    print(f"\nout-of-sample 전체: 총수익률 {summary['total_return']*100:,.2f}% | CAGR {summary['cagr']*100:,.2f}% | "
+          f"MDD {summary['mdd']*100:,.2f}% | 승률 {summary['winrate']*100:,.1f}%")
+    wf_file = f"weight_walkforward_{BACKTEST_START_DATE}_{BACKTEST_END_DATE or 'LATEST'}.csv"
+    folds.to_csv(wf_file, encoding="utf-8-sig", index=False)
+    print(f"[INFO] 워크포워드 결과를 {wf_file} 로 저장했습니다.")
+
+
+if __name__ == "__main__":
+    main()